@@ -0,0 +1,115 @@
+"""
+Benchmark of the configuration handling of DependencyManager with large generated configurations.
+
+Run with: python benchmark.py [sizes...]
+
+For each configuration size, the time of each step is printed, with the time per module: it should stay roughly
+constant when the size grows (linear scaling).
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from flexidep import DependencyManager  # noqa: E402 pylint: disable=wrong-import-position
+from flexidep.config import ignored_packages_file  # noqa: E402 pylint: disable=wrong-import-position
+
+DEFAULT_SIZES = (1000, 2500, 5000, 10000)
+UNIQUE_ID = 'flexidep.benchmark'
+
+
+def generate_config(size, offset=0):
+    """
+    Generate a configuration string.
+
+    Every second module is optional, every third module is in the priority list (in reverse order), every fifth
+    module is checked in an isolated probe.
+
+    :param size: the number of modules
+    :param offset: the index of the first module, to generate overlapping configurations
+    :return: the configuration string
+    """
+    modules = [f'module{index}' for index in range(offset, offset + size)]
+    lines = [
+        '[Global]',
+        f'id = {UNIQUE_ID}',
+        'optional packages = ' + ', '.join(modules[::2]),
+        'priority = ' + ', '.join(modules[::-3]),
+        'isolated probes = ' + ', '.join(modules[::5]),
+        '[Packages]',
+    ]
+    for module in modules:
+        lines.append(f'{module} = {module}-a +{module}-extra\n    {module}-b; sys_platform == "linux"')
+    return '\n'.join(lines) + '\n'
+
+
+def write_ignored_packages(size):
+    """Write an ignore list with a quarter of the modules, half of them not optional any more."""
+    with open(ignored_packages_file(UNIQUE_ID), 'w', encoding='utf-8') as fd:
+        fd.write('\n'.join(f'module{index}' for index in range(0, size, 4)))
+
+
+def timed(function):
+    """Run a function and return its duration in seconds."""
+    start_time = time.perf_counter()
+    function()
+    return time.perf_counter() - start_time
+
+
+def run(size):
+    """
+    Run the benchmark for a configuration size.
+
+    :param size: the number of modules
+    :return: a dictionary (step: duration in seconds)
+    """
+    config = generate_config(size)
+    results = {}
+    dm = DependencyManager(interactive_initialization=False)
+    results['load config'] = timed(lambda: dm.load_string(config))
+    results['sorted packages'] = timed(dm.get_packages_to_install)
+
+    write_ignored_packages(size)
+    results['load ignored'] = timed(dm.load_ignored_packages)
+
+    pkg_to_install = dm.get_packages_to_install()
+
+    def lookups():
+        # the per-module checks of the installation loops
+        for package in pkg_to_install:
+            _ = package in dm.ignored_packages
+            _ = package in dm.optional_packages
+            _ = package in dm.isolated_probe_packages
+            _ = package in dm.relaxed_constraints_packages
+
+    results['module lookups'] = timed(lookups)
+
+    other = DependencyManager(config_string=generate_config(size, size // 2), interactive_initialization=False)
+    results['merge'] = timed(lambda: DependencyManager.merge([dm, other], strict=False))
+    return results
+
+
+def main(sizes):
+    """Run the benchmark for several sizes and print the results."""
+    try:
+        all_results = {size: run(size) for size in sizes}
+    finally:
+        try:
+            os.remove(ignored_packages_file(UNIQUE_ID))
+        except FileNotFoundError:
+            pass
+
+    steps = list(next(iter(all_results.values())))
+    print(f'{"step":16}' + ''.join(f'{size:>20}' for size in sizes))
+    for step in steps:
+        cells = ''.join(
+            f'{results[step] * 1000:>9.1f} ms {results[step] / size * 1e6:>5.1f} us'
+            for size, results in all_results.items()
+        )
+        print(f'{step:16}{cells}')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
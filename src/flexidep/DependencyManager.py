@@ -1,19 +1,103 @@
 """Definition of DependencyManager class."""
 
+import contextlib
+import hashlib
+import importlib
 import io
+import json
+import os
 import re
-from collections import OrderedDict
+import shlex
+import tempfile
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
 
-from .config import PackageManagers, ignored_packages_file
-from .core import get_package_managers_list, pkg_exists, process_alternatives
+from .bytecode import compile_distributions
+from .config import ALTERNATIVE_POLICIES, PackageManagers, ignored_packages_file
+from .core import (
+    base_package_name,
+    get_package_managers_list,
+    merge_alternatives,
+    merge_priority_lists,
+    PackageList,
+    pkg_exists,
+    pkg_spec_exists,
+    plan_alternatives_matrix,
+    process_alternatives,
+)
+from .constraints import build_constraints, constraints_file, pinned_requirements
+from .environment import (
+    environment_fingerprint,
+    installed_distributions,
+    is_current_interpreter,
+    requirement_closure,
+    resolve_python_executable,
+    target_marker_environment,
+)
 from .exceptions import ConfigurationError, SetupFailedError
-from .installers import install_package_with_deps, uninstall_package
+from .footprint import alternatives_footprint, format_size, order_alternatives_by_footprint
+from .history import order_alternatives_by_cost, record_install_outcome
+from .integrity import repair_distributions, verify_distributions
+from .ownership import environment_ownership, forget_distributions, record_installed
+from .probes import probe_modules
+from .profiling import profile_imports
+from .installers import (
+    get_backend,
+    get_registered_package_managers,
+    install_package_with_deps,
+    resolve_package_manager,
+    uninstall_package,
+)
+from .scheduler import build_install_graph, run_install_schedule
+from .transaction import InstallTransaction
+from .verified_state import VERIFIED_SCOPES, is_verified, publish_verified_state
+from .lockfile import (
+    LOCK_FORMAT_VERSION,
+    distribution_closure,
+    lock_mismatch_reason,
+    locked_requirements,
+    marker_environment,
+    read_lock_file,
+    write_lock_file,
+)
+
+
+def _package_manager_keys():
+    """Return the keys of the package lists: the common packages and the registered package managers."""
+    return [PackageManagers.common] + get_registered_package_managers()
+
+
+class _PackageListAttribute:
+    """An attribute holding a list of packages, stored as a PackageList so that assigned lists are indexed too."""
+
+    def __set_name__(self, owner, name):
+        """Store the value in a private attribute."""
+        self.attribute_name = f'_{name}'
+
+    def __get__(self, instance, owner=None):
+        """Get the list."""
+        if instance is None:
+            return self
+        return getattr(instance, self.attribute_name)
+
+    def __set__(self, instance, value):
+        """Set the list."""
+        setattr(instance, self.attribute_name, value if isinstance(value, PackageList) else PackageList(value))
 
 
 class DependencyManager:
     """Class managing a project's dependency information."""
 
+    # the package lists are checked for every package in the installation loops: they keep an index
+    optional_packages = _PackageListAttribute()
+    ignored_packages = _PackageListAttribute()
+    priority_list = _PackageListAttribute()
+    interchangeable_packages = _PackageListAttribute()
+    isolated_probe_packages = _PackageListAttribute()
+    relaxed_constraints_packages = _PackageListAttribute()
+
     def __init__(
         self,
         config_file=None,
@@ -24,6 +108,8 @@ class DependencyManager:
         install_local=False,
         package_manager=PackageManagers.pip,
         extra_command_line='',
+        wheelhouse=None,
+        python_executable=None,
     ):
         """
         Initialize the dependency manager.
@@ -36,24 +122,75 @@ class DependencyManager:
             Note: this does not influence the way the user is asked for alternatives.
         :param use_gui: Controls whether a gui is displayed, or if communication is done through the console
         :param install_local: --user option for pip
-        :param package_manager: pip or conda
+        :param package_manager: a PackageManagers member (pip, conda, uv, mamba) or its name
+        :param extra_command_line: extra command line parameters for the package manager
+        :param wheelhouse: if set, packages are only installed from the wheels in this directory (see build_wheelhouse)
+        :param python_executable: the python interpreter of the environment to manage, or the directory of the
+            environment (a virtual environment or a conda prefix). Default: the interpreter running flexidep
         :return:
         """
         self.unique_id = unique_id
         self.use_gui = use_gui
         self.install_local = install_local
+        if isinstance(package_manager, str):
+            try:
+                package_manager = resolve_package_manager(package_manager)
+            except KeyError:
+                raise ConfigurationError(f'Unknown package manager {package_manager}') from None
         self.package_manager = package_manager
         self.extra_command_line = extra_command_line
+        self.wheelhouse = wheelhouse
+        # the interpreter of the managed environment, None for the current one
+        self.python_executable = None
+        if python_executable is not None and not is_current_interpreter(resolve_python_executable(python_executable)):
+            self.python_executable = resolve_python_executable(python_executable)
+        # if set, the download cache directory of the package manager, e.g. shared by several environments
+        self.cache_dir = None
         self.initialized = not interactive_initialization
-        self.pkg_to_install = {}
-        self.pkg_to_uninstall = {}
-        for pkg_mgr in PackageManagers:
+        # the package lists of the package managers, also the ones registered later (see installers.register_backend)
+        self.pkg_to_install = defaultdict(dict)
+        self.pkg_to_uninstall = defaultdict(list)
+        # unprocessed alternatives strings (package: list of alternatives strings, one per merged configuration)
+        self.raw_pkg_to_install = defaultdict(OrderedDict)
+        for pkg_mgr in _package_manager_keys():
             self.pkg_to_install[pkg_mgr] = {}
             self.pkg_to_uninstall[pkg_mgr] = []
+            self.raw_pkg_to_install[pkg_mgr] = OrderedDict()
         self.optional_packages = []
         self.ignored_packages = []
         self.priority_list = []
+        # packages whose alternatives are equally acceptable, so that they can be reordered by the alternative policy
+        self.interchangeable_packages = []
+        self.alternative_policy = 'config'
+        # whether the outcomes of the installations are recorded in the local history
+        self.record_history = True
+        # whether the distributions installed for each module are recorded, so that they can be pruned
+        self.record_installed = True
+        # if True, a failed installation restores the distributions that were installed before it
+        self.transactional = False
+        # packages whose presence is checked by importing them in a child interpreter
+        self.isolated_probe_packages = []
+        # if True, the installations use a constraints file keeping the installed distributions at their versions
+        self.use_constraints = False
+        # packages installed without the constraints file
+        self.relaxed_constraints_packages = []
+        # whether the download size of the alternatives is shown when selecting them
+        self.show_footprint = True
+        # whether a successful run publishes a verified-state token, and runs with a matching token are skipped
+        self.use_verified_state = True
+        # if True, the installations do not compile the python files, which are compiled afterwards in parallel
+        self.deferred_compile = False
+        # if True, the deferred compilation runs in the background (see wait_for_compilation)
+        self.background_compile = True
+        # the deferred compilations started by this manager
+        self.compilations = []
         self.pkg_to_uninstall[PackageManagers.common] = []
+        # function accepting a package name and a status string, called when the status of a package changes
+        self.status_callback = None
+        # conflicts found when merging configurations
+        self.conflicts = []
+        # alternatives installed in this session (package: alternative)
+        self.selected_alternatives = OrderedDict()
         if config_file:
             self.load_file(config_file)
         elif config_string:
@@ -67,6 +204,8 @@ class DependencyManager:
         """
         if not self.unique_id and self.optional_packages:
             raise ConfigurationError('Cannot use optional packages without a unique id')
+        if self.alternative_policy not in ALTERNATIVE_POLICIES:
+            raise ConfigurationError(f'Invalid alternative policy {self.alternative_policy}')
 
     def load_file(self, config_file):
         """
@@ -124,14 +263,59 @@ class DependencyManager:
             if parser.has_option('Global', 'package manager'):
                 configured_manager = parser.get('Global', 'package manager')
                 try:
-                    self.package_manager = PackageManagers[configured_manager]
+                    self.package_manager = resolve_package_manager(configured_manager)
                 except KeyError:
                     print('Warning: invalid package manager in configuration file. Using pip')
                     self.package_manager = PackageManagers.pip
+                if not self._backend().is_available():
+                    print(f'Warning: package manager {configured_manager} not found. Using pip')
+                    self.package_manager = PackageManagers.pip
 
             if parser.has_option('Global', 'extra command line'):
                 self.extra_command_line = parser.get('Global', 'extra command line')
 
+            if parser.has_option('Global', 'interchangeable'):
+                interchangeable_str = parser.get('Global', 'interchangeable').strip()
+                # split the list at commas and newlines
+                self.interchangeable_packages = [x.strip() for x in re.split('[\n,]', interchangeable_str)]
+
+            if parser.has_option('Global', 'alternative policy'):
+                self.alternative_policy = parser.get('Global', 'alternative policy').strip().lower()
+
+            if parser.has_option('Global', 'isolated probes'):
+                isolated_str = parser.get('Global', 'isolated probes').strip()
+                # split the list at commas and newlines
+                self.isolated_probe_packages = [x.strip() for x in re.split('[\n,]', isolated_str)]
+
+            if parser.has_option('Global', 'show footprint'):
+                self.show_footprint = parser.getboolean('Global', 'show footprint')
+
+            if parser.has_option('Global', 'verified state'):
+                self.use_verified_state = parser.getboolean('Global', 'verified state')
+
+            if parser.has_option('Global', 'deferred compile'):
+                self.deferred_compile = parser.getboolean('Global', 'deferred compile')
+
+            if parser.has_option('Global', 'background compile'):
+                self.background_compile = parser.getboolean('Global', 'background compile')
+
+            if parser.has_option('Global', 'constraints'):
+                self.use_constraints = parser.getboolean('Global', 'constraints')
+
+            if parser.has_option('Global', 'relax constraints'):
+                relaxed_str = parser.get('Global', 'relax constraints').strip()
+                # split the list at commas and newlines
+                self.relaxed_constraints_packages = [x.strip() for x in re.split('[\n,]', relaxed_str)]
+
+            if parser.has_option('Global', 'transactional'):
+                self.transactional = parser.getboolean('Global', 'transactional')
+
+            if parser.has_option('Global', 'wheelhouse'):
+                self.wheelhouse = parser.get('Global', 'wheelhouse').strip() or None
+
+            if parser.has_option('Global', 'cache dir'):
+                self.cache_dir = parser.get('Global', 'cache dir').strip() or None
+
             if parser.has_option('Global', 'optional packages'):
                 opt_packages = parser.get('Global', 'optional packages').strip()
                 # split the list at commas and newlines
@@ -150,7 +334,7 @@ class DependencyManager:
                 if package_manager_suffix == '':
                     dict_key = PackageManagers.common
                 else:
-                    dict_key = PackageManagers[package_manager_suffix[1:]]
+                    dict_key = resolve_package_manager(package_manager_suffix[1:])
                 if parser.has_option('Global', 'uninstall' + package_manager_suffix):
                     uninstall_str = parser.get('Global', 'uninstall' + package_manager_suffix).strip()
                     # split the list at commas and newlines
@@ -158,20 +342,136 @@ class DependencyManager:
 
         if parser.has_section('Packages'):
             self.pkg_to_install[PackageManagers.common] = {}
+            self.raw_pkg_to_install[PackageManagers.common] = OrderedDict()
             for package, alternatives in parser.items('Packages'):
-                self.pkg_to_install[PackageManagers.common][package] = process_alternatives(alternatives)
+                self.pkg_to_install[PackageManagers.common][package] = process_alternatives(
+                    alternatives, target_marker_environment(self.python_executable)
+                )
+                self.raw_pkg_to_install[PackageManagers.common][package] = [alternatives]
         package_managers = get_package_managers_list()  # list of possible package managers
 
         for package_manager_name in package_managers:
             # sections are always capitalized
             section_name = package_manager_name.capitalize()
-            package_manager = PackageManagers[package_manager_name]
+            package_manager = resolve_package_manager(package_manager_name)
             self.pkg_to_install[package_manager] = {}
+            self.raw_pkg_to_install[package_manager] = OrderedDict()
             if parser.has_section(section_name):
                 for package, alternatives in parser.items(section_name):
-                    self.pkg_to_install[package_manager][package] = process_alternatives(alternatives)
+                    self.pkg_to_install[package_manager][package] = process_alternatives(
+                        alternatives, target_marker_environment(self.python_executable)
+                    )
+                    self.raw_pkg_to_install[package_manager][package] = [alternatives]
         self.validate_config()
 
+    @classmethod
+    def merge(cls, managers, strict=True):
+        """
+        Merge the configurations of several dependency managers into a single one.
+
+        The packages of all the configurations are joined. If a package is required by more than one configuration,
+        only the alternatives accepted by all of them are kept. A package is optional only if all the configurations
+        that require it mark it as optional. The priority lists are merged respecting the order of each of them, and
+        the uninstall lists are joined. The global options are taken from the first manager.
+
+        :param managers: a list of DependencyManager objects
+        :param strict: if True, raise a ConfigurationError if the configurations conflict. Otherwise, the conflicts are
+            stored in the conflicts attribute of the merged manager, and the conflicting entries are taken from the
+            first configuration that defines them
+        :return: a new DependencyManager
+        """
+        if not managers:
+            raise ValueError('No dependency manager to merge')
+
+        first = managers[0]
+        merged = cls(
+            unique_id=next((dm.unique_id for dm in managers if dm.unique_id), None),
+            interactive_initialization=not all(dm.initialized for dm in managers),
+            use_gui=any(dm.use_gui for dm in managers),
+            install_local=first.install_local,
+            package_manager=first.package_manager,
+            extra_command_line=' '.join(
+                dict.fromkeys(dm.extra_command_line.strip() for dm in managers if dm.extra_command_line.strip())
+            ),
+            python_executable=first.python_executable,
+        )
+        conflicts = []
+
+        for dm in managers[1:]:
+            if dm.package_manager != first.package_manager:
+                conflicts.append(f'package manager: {first.package_manager.name} vs {dm.package_manager.name}')
+            if dm.install_local != first.install_local:
+                conflicts.append('local install: the configurations use different values')
+            if dm.python_executable != first.python_executable:
+                conflicts.append('python executable: the configurations manage different environments')
+
+        for pkg_mgr in _package_manager_keys():
+            merged.pkg_to_uninstall[pkg_mgr] = list(
+                dict.fromkeys(pkg for dm in managers for pkg in dm.pkg_to_uninstall[pkg_mgr])
+            )
+
+        required_packages = set()
+        for pkg_mgr in _package_manager_keys():
+            uninstalled = {
+                base_package_name(pkg)
+                for pkg in merged.pkg_to_uninstall[PackageManagers.common] + merged.pkg_to_uninstall[pkg_mgr]
+            }
+            packages = OrderedDict()
+            for dm in managers:
+                for package, alternatives in dm.pkg_to_install[pkg_mgr].items():
+                    packages.setdefault(package, []).append(alternatives)
+                    if package not in dm.optional_packages:
+                        required_packages.add(package)
+
+            merged.pkg_to_install[pkg_mgr] = OrderedDict()
+            merged.raw_pkg_to_install[pkg_mgr] = OrderedDict()
+            for dm in managers:
+                for package, alternatives_strings in dm.raw_pkg_to_install[pkg_mgr].items():
+                    merged.raw_pkg_to_install[pkg_mgr].setdefault(package, []).extend(alternatives_strings)
+            for package, alternatives_list in packages.items():
+                merged_alternatives, package_conflicts = merge_alternatives(package, alternatives_list)
+                # an alternative that another configuration uninstalls would be removed right after being installed
+                for alternative in list(merged_alternatives):
+                    if base_package_name(alternative) in uninstalled:
+                        del merged_alternatives[alternative]
+                if not merged_alternatives and not package_conflicts:
+                    package_conflicts.append(f'{package}: all the alternatives are in the uninstall lists')
+                conflicts += package_conflicts
+                merged.pkg_to_install[pkg_mgr][package] = (
+                    merged_alternatives if merged_alternatives else OrderedDict(alternatives_list[0])
+                )
+
+        merged.optional_packages = list(
+            dict.fromkeys(pkg for dm in managers for pkg in dm.optional_packages if pkg not in required_packages)
+        )
+
+        merged.interchangeable_packages = list(
+            dict.fromkeys(pkg for dm in managers for pkg in dm.interchangeable_packages)
+        )
+        merged.alternative_policy = first.alternative_policy
+        merged.transactional = any(dm.transactional for dm in managers)
+        merged.isolated_probe_packages = list(
+            dict.fromkeys(pkg for dm in managers for pkg in dm.isolated_probe_packages)
+        )
+        merged.use_constraints = any(dm.use_constraints for dm in managers)
+        merged.show_footprint = first.show_footprint
+        merged.use_verified_state = all(dm.use_verified_state for dm in managers)
+        merged.deferred_compile = first.deferred_compile
+        merged.background_compile = first.background_compile
+        merged.cache_dir = first.cache_dir
+        merged.relaxed_constraints_packages = list(
+            dict.fromkeys(pkg for dm in managers for pkg in dm.relaxed_constraints_packages)
+        )
+
+        merged.priority_list, priority_conflicts = merge_priority_lists([dm.priority_list for dm in managers])
+        conflicts += priority_conflicts
+
+        merged.conflicts = conflicts
+        if conflicts and strict:
+            raise ConfigurationError('Conflicting configurations:\n' + '\n'.join(conflicts))
+        merged.validate_config()
+        return merged
+
     def load_ignored_packages(self):
         """
         Get the list of ignored packages.
@@ -185,9 +485,7 @@ class DependencyManager:
             self.ignored_packages = []
 
         # remove packages that are not optional anymore
-        for package in self.ignored_packages[:]:
-            if package not in self.optional_packages:
-                self.ignored_packages.remove(package)
+        self.ignored_packages = [package for package in self.ignored_packages if package in self.optional_packages]
 
         self.save_ignored_packages()
 
@@ -230,10 +528,539 @@ class DependencyManager:
         if not self.priority_list:
             return
 
+        # only the packages of pkg_dict are looked up in the priority list
+        priority_packages = sorted(
+            (package for package in pkg_dict if package in self.priority_list), key=self.priority_list.position
+        )
         # the first package in the priority list will end up as the first package in the ordered dict
-        for package in self.priority_list[::-1]:
-            if package in pkg_dict:
-                pkg_dict.move_to_end(package, last=False)  # move package to the beginning
+        for package in reversed(priority_packages):
+            pkg_dict.move_to_end(package, last=False)  # move package to the beginning
+
+    def get_packages_to_install(self):
+        """
+        Get the packages to install with the current package manager, sorted according to the priority list.
+
+        :return: an OrderedDict (package: alternatives), with copies of the alternatives dictionaries
+        """
+        # compatible with python 3.6
+        pkg_to_install = OrderedDict(
+            (package, OrderedDict(alternatives))
+            for package, alternatives in {
+                **self.pkg_to_install[PackageManagers.common],
+                **self.pkg_to_install[self.package_manager],
+            }.items()
+        )
+        self.sort_packages(pkg_to_install)
+        return pkg_to_install
+
+    def order_alternatives(self, pkg_to_install, policy=None):
+        """
+        Reorder the alternatives of the interchangeable packages according to a policy.
+
+        :param pkg_to_install: a dictionary (package: alternatives) as returned by get_packages_to_install. It is
+            modified in place
+        :param policy: one of flexidep.config.ALTERNATIVE_POLICIES. Default: the alternative_policy attribute
+        :return: Nothing
+        """
+        if policy is None:
+            policy = self.alternative_policy
+        if policy not in ALTERNATIVE_POLICIES:
+            raise ConfigurationError(f'Invalid alternative policy {policy}')
+        if policy == 'config':
+            return
+
+        for package in self.interchangeable_packages:
+            if package not in pkg_to_install:
+                continue
+            if policy == 'history':
+                pkg_to_install[package] = order_alternatives_by_cost(
+                    package, pkg_to_install[package], python_executable=self.python_executable
+                )
+            elif policy == 'footprint' and self._backend().uses_python_index:
+                pkg_to_install[package] = order_alternatives_by_footprint(
+                    pkg_to_install[package], python_executable=self.python_executable
+                )
+
+    def _backend(self):
+        """
+        Get the backend of the package manager for the managed environment.
+
+        :return: an InstallerBackend instance
+        """
+        return get_backend(self.package_manager, self.python_executable)
+
+    def probe_isolated_packages(self):
+        """
+        Check the presence of the packages in the isolated probes list, in parallel child interpreters.
+
+        When another environment is managed (python_executable), all the packages are probed with its interpreter.
+        The results are cached until the installed packages change, so that the following checks are immediate.
+
+        :return: a dictionary (package: True if it can be imported)
+        """
+        if self.python_executable is not None:
+            return probe_modules(list(self.get_packages_to_install()), python_executable=self.python_executable)
+        return probe_modules(
+            [package for package in self.get_packages_to_install() if package in self.isolated_probe_packages]
+        )
+
+    def _module_exists(self, package):
+        """
+        Check if a package (module) exists.
+
+        The packages in the isolated probes list, and all the packages of another managed environment, are imported in
+        a child interpreter, so that they are not loaded in the current process. The other ones are imported directly.
+
+        :param package: the package name
+        :return: True if the package exists
+        """
+        if self.python_executable is not None:
+            return probe_modules([package], python_executable=self.python_executable)[package]
+        if package in self.isolated_probe_packages:
+            return probe_modules([package])[package]
+        return pkg_exists(package)
+
+    def get_packages_to_uninstall(self):
+        """
+        Get the packages to uninstall with the current package manager.
+
+        :return: a list of packages
+        """
+        return self.pkg_to_uninstall[PackageManagers.common] + self.pkg_to_uninstall[self.package_manager]
+
+    def get_install_command_line(self, compile_options=True):
+        """
+        Get the extra command line parameters of the installations, including the wheelhouse, cache directory and
+        deferred compilation options if needed.
+
+        :param compile_options: if False, the option skipping the bytecode compilation is not included, e.g. for the
+            commands that only download or build packages
+        :return: a string
+        """
+        backend = self._backend()
+        options = []
+        if self.wheelhouse and backend.supports_wheelhouse:
+            options += backend.wheelhouse_options(self.wheelhouse)
+        if self.cache_dir and backend.supports_cache_dir:
+            options += backend.cache_options(self.cache_dir)
+        if compile_options and self._compilation_deferred():
+            options += backend.no_compile_options()
+        if not options:
+            return self.extra_command_line
+        return ' '.join([self.extra_command_line] + [shlex.quote(option) for option in options]).strip()
+
+    def _compilation_deferred(self):
+        """Return True if the installations skip the bytecode compilation, to compile afterwards."""
+        return self.deferred_compile and self._backend().supports_no_compile
+
+    def _compilation_snapshot(self):
+        """
+        Get the installed distributions before an installation, to compile the ones it installs or upgrades.
+
+        :return: a dictionary (canonical name: version), or None if the compilation is not deferred
+        """
+        if not self._compilation_deferred():
+            return None
+        return self._backend().query_installed()
+
+    def _compile_changes(self, installed_before):
+        """
+        Compile the distributions installed or upgraded since a snapshot, in the background or not depending on the
+        background_compile attribute.
+
+        :param installed_before: the result of _compilation_snapshot before the installation
+        :return: Nothing
+        """
+        if installed_before is None:
+            return
+        changed = [
+            name for name, version in self._backend().query_installed().items() if installed_before.get(name) != version
+        ]
+        if changed:
+            self.compile_distributions(changed, wait=not self.background_compile)
+
+    @contextlib.contextmanager
+    def _deferred_compilation(self):
+        """Compile the distributions installed or upgraded in the block, also if it fails, when this is deferred."""
+        installed_before = self._compilation_snapshot()
+        try:
+            yield
+        finally:
+            self._compile_changes(installed_before)
+
+    def compile_distributions(self, names, wait=False, max_workers=None):
+        """
+        Compile the python files (listed in their RECORD) of installed distributions to bytecode, with compileall in
+        parallel child interpreters of the managed environment.
+
+        :param names: canonical names of the distributions
+        :param wait: if True, wait for the end of the compilation. Otherwise it runs in the background, also after the
+            current process exits
+        :param max_workers: the maximum number of child interpreters. Default: the number of cores
+        :return: a flexidep.bytecode.BytecodeCompilation
+        """
+        compilation = compile_distributions(names, self.python_executable, max_workers)
+        self.compilations.append(compilation)
+        if wait:
+            compilation.wait()
+        return compilation
+
+    def wait_for_compilation(self, timeout=None):
+        """
+        Wait for the end of the background compilations, e.g. before importing the installed packages.
+
+        :param timeout: the maximum time to wait in seconds. Default: no limit
+        :return: True if all the compilations are finished
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for compilation in self.compilations:
+            if not compilation.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+                return False
+        self.compilations = []
+        return True
+
+    def get_constraints_file(self):
+        """
+        Get the constraints file of the installations, regenerating it only if the environment has changed.
+
+        The installed distributions are constrained to their current versions, except the ones that any alternative
+        of the configuration installs or uninstalls. The exact pins (==) of the selected alternatives are added.
+
+        :return: the path of the constraints file (in CONFIG_DIR), or None if the package manager does not support
+            constraints
+        """
+        backend = self._backend()
+        if not backend.supports_constraints:
+            return None
+
+        pkg_to_install = self.get_packages_to_install()
+        pins = {}
+        for package, alternative in self.selected_alternatives.items():
+            if alternative in pkg_to_install.get(package, {}):
+                dependencies = pkg_to_install[package][alternative]
+                pins.update(
+                    pinned_requirements(dependencies.install_before + [alternative] + dependencies.install_after)
+                )
+
+        excluded = {base_package_name(package) for package in self.get_packages_to_uninstall()}
+        for alternatives in pkg_to_install.values():
+            for alternative, dependencies in alternatives.items():
+                for package in [alternative] + list(dependencies.install_before) + list(dependencies.install_after):
+                    excluded.add(base_package_name(package))
+                for package in dependencies.uninstall_before + dependencies.uninstall_after:
+                    excluded.add(base_package_name(package))
+
+        config_hash = self.config_hash()
+        fingerprint = environment_fingerprint(self.python_executable)
+        state = '\n'.join([config_hash, fingerprint, json.dumps(sorted(pins.items()))])
+        # the environments managed with the same configuration have different constraints
+        name = config_hash[:16] if self.python_executable is None else f'{config_hash[:16]}-{fingerprint[:8]}'
+        return constraints_file(
+            name, state, lambda: build_constraints(backend.query_installed(), pins, excluded)
+        )
+
+    def _constraints_options(self, packages):
+        """
+        Get the command line options to install packages with the constraints file.
+
+        :param packages: the packages (modules) being installed
+        :return: a list of strings, empty if constraints are not used or one of the packages is relaxed
+        """
+        if not self.use_constraints or any(package in self.relaxed_constraints_packages for package in packages):
+            return []
+        path = self.get_constraints_file()
+        if path is None:
+            return []
+        return self._backend().constraints_options(path)
+
+    def plan_for_environments(self, environments):
+        """
+        Compute which alternatives apply to each package in several target environments.
+
+        The markers of all the alternatives are evaluated against all the targets in one pass, so that plans for other
+        platforms and python versions can be computed on a single machine.
+
+        :param environments: a dictionary (target name: marker environment). The environments can be built with
+            flexidep.core.target_environment, e.g. {'win-py310': target_environment(sys_platform='win32',
+            python_version='3.10')}
+        :return: a dictionary (target name: OrderedDict(package: alternatives)), with the packages sorted according to
+            the priority list. Each plan has the same format as get_packages_to_install and can be passed to
+            build_wheelhouse. Alternatives in the uninstall lists are dropped, as in merge
+        """
+        raw_packages = OrderedDict(
+            {**self.raw_pkg_to_install[PackageManagers.common], **self.raw_pkg_to_install[self.package_manager]}
+        )
+        matrix = plan_alternatives_matrix(raw_packages, environments, self.get_packages_to_uninstall())
+        for plan in matrix.values():
+            self.sort_packages(plan)
+        return matrix
+
+    def build_wheelhouse(self, directory, install_optional=True, max_workers=None, plan=None):
+        """
+        Build the wheels of all the packages into a directory, to install them without network access.
+
+        For each package, the wheels of the selected (or first) alternative and of its extra packages to install are
+        built together with all their dependencies. The packages are processed in parallel. If an alternative cannot
+        be built, the next one is tried. The nodes can then install from the directory by setting the wheelhouse
+        parameter (or the "wheelhouse" option in the Global section).
+
+        :param directory: the destination directory
+        :param install_optional: if True, the wheels of the optional packages are built too
+        :param max_workers: the maximum number of parallel builds. Default: as ThreadPoolExecutor
+        :param plan: the packages and alternatives to build, e.g. one of the plans of plan_for_environments.
+            Default: get_packages_to_install()
+        :return: a dictionary (package: alternative that was built)
+        """
+        backend = self._backend()
+        if not backend.supports_wheelhouse:
+            raise ConfigurationError(f'Wheelhouses are not supported with {self.package_manager.name}')
+        os.makedirs(directory, exist_ok=True)
+
+        if plan is None:
+            plan = self.get_packages_to_install()
+        pkg_to_install = OrderedDict(
+            (package, alternatives)
+            for package, alternatives in plan.items()
+            if alternatives and (install_optional or package not in self.optional_packages)
+        )
+
+        def build(package, alternatives):
+            alternative_names = list(alternatives)
+            selected = self.selected_alternatives.get(package)
+            if selected in alternatives:
+                alternative_names.remove(selected)
+                alternative_names.insert(0, selected)
+            for alternative in alternative_names:
+                dependencies = alternatives[alternative]
+                packages = dependencies.install_before + [alternative] + dependencies.install_after
+                # each package is built in its own directory, so that parallel builds do not write the same files
+                with tempfile.TemporaryDirectory(dir=directory) as build_dir:
+                    if not backend.build_wheels(packages, build_dir, self.extra_command_line):
+                        print(f'Error building the wheels of {alternative} for {package}')
+                        continue
+                    for file_name in os.listdir(build_dir):
+                        os.replace(os.path.join(build_dir, file_name), os.path.join(directory, file_name))
+                return alternative
+            return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = OrderedDict(
+                (package, executor.submit(build, package, alternatives))
+                for package, alternatives in pkg_to_install.items()
+            )
+            built = OrderedDict((package, future.result()) for package, future in futures.items())
+
+        failed = [
+            package
+            for package, alternative in built.items()
+            if alternative is None and package not in self.optional_packages
+        ]
+        if failed:
+            raise SetupFailedError(f'Failed to build the wheels of {", ".join(failed)}')
+        return built
+
+    def profile_imports(self, max_workers=None, timeout=120):
+        """
+        Measure the import cost of the installed packages of the configuration.
+
+        Each module is imported in a fresh interpreter, in parallel, measuring the wall time, the memory (RSS) increase
+        and the modules loaded by the import, to decide which packages should be optional or imported lazily.
+
+        :param max_workers: the maximum number of interpreters running at the same time. Default: the number of cores
+        :param timeout: the maximum duration of each measurement in seconds
+        :return: a list of dictionaries as returned by flexidep.profiling.profile_import, from the most to the least
+            expensive import. flexidep.profiling.format_import_report formats it as a table
+        """
+        if self.python_executable is not None:
+            modules = [package for package, exists in self.probe_isolated_packages().items() if exists]
+        else:
+            modules = [package for package in self.get_packages_to_install() if pkg_spec_exists(package)]
+        return profile_imports(modules, self.python_executable, max_workers, timeout)
+
+    def managed_distributions(self):
+        """
+        Get the installed distributions managed by the configuration.
+
+        These are the installed distributions named by the alternatives of the packages (with their extra packages to
+        install), and all the distributions they require.
+
+        :return: a set of canonical names
+        """
+        distributions = installed_distributions(self.python_executable)
+        names = set()
+        for alternatives in self.get_packages_to_install().values():
+            for alternative, dependencies in alternatives.items():
+                for package in dependencies.install_before + [alternative] + dependencies.install_after:
+                    names.add(base_package_name(package))
+        return requirement_closure(names, distributions, target_marker_environment(self.python_executable))
+
+    def verify_integrity(self, max_workers=None):
+        """
+        Verify the files of the managed distributions against the hashes in their RECORD, in parallel.
+
+        :param max_workers: the maximum number of files hashed at the same time
+        :return: a dictionary (distribution: list of problem descriptions) of the corrupt distributions
+        """
+        return verify_distributions(self.managed_distributions(), max_workers, self.python_executable)
+
+    def repair_integrity(self, problems=None):
+        """
+        Reinstall the corrupt distributions, without their dependencies, in a single transaction.
+
+        :param problems: the result of verify_integrity. Default: verify_integrity() is called
+        :return: True if all the corrupt distributions were reinstalled
+        """
+        if problems is None:
+            problems = self.verify_integrity()
+        if not problems:
+            return True
+        print(f'Reinstalling {", ".join(sorted(problems))}')
+        with self._deferred_compilation():
+            success = repair_distributions(
+                sorted(problems),
+                self.package_manager,
+                self.install_local,
+                self.get_install_command_line(),
+                self.python_executable,
+            )
+        importlib.invalidate_caches()
+        return success
+
+    def _installed_snapshot(self):
+        """
+        Get the installed distributions before an installation, to record the ones it adds.
+
+        :return: a set of canonical names, or None if the installations are not recorded (record_installed is False,
+            or the configuration has no unique id)
+        """
+        if not self.record_installed or not self.unique_id:
+            return None
+        return set(self._backend().query_installed())
+
+    def _record_installation(self, modules, installed_before):
+        """
+        Record the distributions added by an installation for the installed modules.
+
+        When several modules were installed together, each added distribution is attributed to the modules whose
+        alternative requires it (from the distribution metadata), or to all of them if none does.
+
+        :param modules: a dictionary (module: (alternative, list of the installed packages of the alternative))
+        :param installed_before: the result of _installed_snapshot before the installation
+        :return: Nothing
+        """
+        if installed_before is None:
+            return
+        added = set(self._backend().query_installed()) - installed_before
+        if not added:
+            return
+        if len(modules) == 1:
+            owned = {module: added for module in modules}
+        else:
+            distributions = installed_distributions(self.python_executable)
+            environment = target_marker_environment(self.python_executable)
+            owned = {
+                module: added
+                & requirement_closure({base_package_name(root) for root in roots}, distributions, environment)
+                for module, (_, roots) in modules.items()
+            }
+            unattributed = added.difference(*owned.values())
+            owned = {module: names | unattributed for module, names in owned.items()}
+        for module, (alternative, _) in modules.items():
+            record_installed(self.unique_id, module, alternative, sorted(owned[module]), self.python_executable)
+
+    def prune(self, dry_run=False):
+        """
+        Uninstall the distributions installed for modules that are no longer needed, in a single transaction.
+
+        A module is no longer needed when it was removed from the configuration or added to the ignore list. The
+        distributions recorded for it are removed, unless the installed dependency graph (from the distribution
+        metadata) shows that they are still required: by the alternatives of the remaining modules, by distributions
+        recorded for remaining modules (of this or other configurations), or by any other installed distribution.
+
+        :param dry_run: if True, nothing is uninstalled
+        :return: the sorted list of the canonical names of the distributions that were (or would be) uninstalled
+        """
+        if not self.unique_id:
+            raise ConfigurationError('Cannot prune without a unique id')
+        self.load_ignored_packages()
+        pkg_to_install = self.get_packages_to_install()
+        remaining = [package for package in pkg_to_install if package not in self.ignored_packages]
+
+        candidates = set()
+        still_owned = set()
+        for unique_id, modules in environment_ownership(self.python_executable).items():
+            for module, alternatives in modules.items():
+                names = {name for owned_names in alternatives.values() for name in owned_names}
+                stale = module not in pkg_to_install or module in self.ignored_packages
+                if unique_id == self.unique_id and stale:
+                    candidates |= names
+                else:
+                    still_owned |= names
+
+        distributions = installed_distributions(self.python_executable)
+        # distributions without metadata (e.g. non-python conda packages) cannot be checked, so they are kept
+        candidates = {name for name in candidates if name in distributions} - still_owned
+        if not candidates:
+            return []
+
+        roots = (set(distributions) - candidates) | still_owned
+        for package in remaining:
+            for alternative, dependencies in pkg_to_install[package].items():
+                for requirement in dependencies.install_before + [alternative] + dependencies.install_after:
+                    roots.add(base_package_name(requirement))
+        needed = requirement_closure(roots, distributions, target_marker_environment(self.python_executable))
+        pruned = sorted(candidates - needed)
+        if dry_run or not pruned:
+            return pruned
+
+        print(f'Pruning {", ".join(pruned)}')
+        success = self._backend().uninstall(pruned)
+        importlib.invalidate_caches()
+        if not success:
+            raise SetupFailedError(f'Failed to uninstall {", ".join(pruned)}')
+        forget_distributions(pruned, self.python_executable)
+        return pruned
+
+    def config_hash(self):
+        """
+        Compute a hash of the configuration used with the current package manager.
+
+        :return: a hexadecimal string
+        """
+        state = {
+            'package_manager': self.package_manager.name,
+            'extra_command_line': self.extra_command_line,
+            'optional': sorted(self.optional_packages),
+            'uninstall': self.get_packages_to_uninstall(),
+            'packages': [
+                [package, [[alternative, list(requirements)] for alternative, requirements in alternatives.items()]]
+                for package, alternatives in self.get_packages_to_install().items()
+            ],
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _is_verified_state(self, config_hash, scope):
+        """
+        Check if the configuration was verified in the current state of the environment, by this process or by a parent.
+
+        :param config_hash: the result of config_hash
+        :param scope: one of flexidep.verified_state.VERIFIED_SCOPES
+        :return: True if the run can be skipped
+        """
+        return self.use_verified_state and is_verified(config_hash, scope, self.python_executable)
+
+    def _publish_verified_state(self, config_hashes, scopes):
+        """
+        Publish the verified-state tokens of the configuration, inherited by the child processes started afterwards.
+
+        :param config_hashes: the hashes of the configuration (e.g. before and after the interactive initialization)
+        :param scopes: the scopes guaranteed by the run
+        :return: Nothing
+        """
+        if not self.use_verified_state:
+            return
+        for config_hash in dict.fromkeys(config_hashes):
+            publish_verified_state(config_hash, scopes, self.python_executable)
 
     def process_single_package(self, package, alternatives_str, interactive=True, force_optional=False, force_reinstall=False):
         """
@@ -246,7 +1073,7 @@ class DependencyManager:
         :param interactive: if True, the user will be asked to confirm the uninstallation
         :return: Nothing
         """
-        alternatives = process_alternatives(alternatives_str)
+        alternatives = process_alternatives(alternatives_str, target_marker_environment(self.python_executable))
 
         remove_force_reinstall_from_extra = False
         def cleanup_extra_command_line():
@@ -260,7 +1087,7 @@ class DependencyManager:
             self.ignored_packages = []
         if not force_optional and (package in self.ignored_packages):
             return
-        if not force_reinstall and pkg_exists(package):
+        if not force_reinstall and self._module_exists(package):
             return
 
         if force_reinstall:
@@ -278,12 +1105,10 @@ class DependencyManager:
             cleanup_extra_command_line()
             raise SetupFailedError(f'Failed to install {package}')
         # this is only reached if not interactive
-        while not install_package_with_deps(
-                self.package_manager,
+        while not self._install_alternative(
+                package,
                 next(iter(alternatives.keys())),
                 next(iter(alternatives.values())),
-                self.install_local,
-                self.extra_command_line,
         ):
             print(f'Error installing {package}. Trying a different alternative')
             alternatives.popitem(0)
@@ -299,6 +1124,36 @@ class DependencyManager:
         """
         Install the packages.
 
+        If the gui is used, the installation runs in a single gui session showing the progress.
+
+        :param force_optional: if True, the program will ask to install optional packages even if they were already
+            ignored once
+        :return: Nothing
+        """
+        # the hash before the interactive initialization, which can change the package manager
+        config_hash = self.config_hash()
+        if not force_optional and self._is_verified_state(config_hash, 'interactive'):
+            return
+
+        if not self.use_gui:
+            self._install_interactive(force_optional)
+        else:
+            # pylint: disable=import-outside-toplevel
+            from .gui import GuiSession
+
+            session = GuiSession()
+            previous_callback = self.status_callback
+            self.status_callback = session.set_package_status
+            try:
+                session.run(self._install_interactive, force_optional)
+            finally:
+                self.status_callback = previous_callback
+        self._publish_verified_state([config_hash, self.config_hash()], ('required', 'interactive'))
+
+    def _install_interactive(self, force_optional=False):
+        """
+        Install the packages interactively.
+
         :param force_optional: if True, the program will ask to install optional packages even if they were already
             ignored once
         :return: Nothing
@@ -307,70 +1162,401 @@ class DependencyManager:
             self.show_initialization()
 
         # uninstall packages
-        pkg_to_uninstall_list = (
-            self.pkg_to_uninstall[PackageManagers.common] + self.pkg_to_uninstall[self.package_manager]
-        )
+        pkg_to_uninstall_list = self.get_packages_to_uninstall()
         for pkg in pkg_to_uninstall_list:
             self.uninstall_package(pkg, interactive=True)
+            self._report_status(pkg, 'uninstalled')
 
-        # compatible with python 3.6
-        pkg_to_install = OrderedDict(
-            {**self.pkg_to_install[PackageManagers.common], **self.pkg_to_install[self.package_manager]}
-        )
-
-        self.sort_packages(pkg_to_install)
+        pkg_to_install = self.get_packages_to_install()
+        self.probe_isolated_packages()
 
         if force_optional:
             self.clear_ignored_packages()
 
         self.load_ignored_packages()
 
-        for package, alternatives in pkg_to_install.items():
-            if package in self.ignored_packages:
-                continue
-            # if the package is not installed, try to install it until it works or there are no more alternatives
-            if not pkg_exists(package):
-                while not self.install_package_interactive(package, alternatives, optional=package in self.optional_packages):
-                    print(f'Error installing {package}. Trying a different alternative')
+        for package in pkg_to_install:
+            self._report_status(package, 'pending')
+
+        with self._deferred_compilation():
+            for package, alternatives in pkg_to_install.items():
+                if package in self.ignored_packages:
+                    self._report_status(package, 'ignored')
+                    continue
+                # if the package is not installed, try to install it until it works or there are no more alternatives
+                if not self._module_exists(package):
+                    while not self.install_package_interactive(
+                        package, alternatives, optional=package in self.optional_packages
+                    ):
+                        print(f'Error installing {package}. Trying a different alternative')
+                else:
+                    self._report_status(package, 'already installed')
 
-    def install_auto(self, install_optional=False):
+    def install_auto(
+        self, install_optional=False, batch=False, lock_file=None, policy=None, parallel=False, max_workers=None
+    ):
         """
         Install the packages automatically.
 
         :param install_optional: if True, optional packages will be installed
-        :return: Nothing
+        :param batch: if True, the first alternative of all the missing packages is installed in a single package
+            manager transaction. If this fails, the packages are installed one by one
+        :param lock_file: if given, a lock file is written to this path after a successful installation
+        :param policy: how the alternatives of the interchangeable packages are ordered (see
+            flexidep.config.ALTERNATIVE_POLICIES). Default: the alternative_policy attribute
+        :param parallel: if True, the packages are downloaded/built in parallel when the priority list and the
+            install/uninstall constraints allow it, and then installed one at a time in the usual order
+        :param max_workers: the maximum number of parallel preparations. Default: as ThreadPoolExecutor
+        :return: Nothing. With the deferred_compile attribute, the installed distributions are compiled afterwards,
+            in the background (see wait_for_compilation) unless background_compile is False
         """
+        config_hash = self.config_hash()
+        if lock_file is None and self._is_verified_state(config_hash, 'optional' if install_optional else 'required'):
+            return
+
         # uninstall packages
-        pkg_to_uninstall_list = (
-            self.pkg_to_uninstall[PackageManagers.common] + self.pkg_to_uninstall[self.package_manager]
-        )
+        pkg_to_uninstall_list = self.get_packages_to_uninstall()
         for pkg in pkg_to_uninstall_list:
             self.uninstall_package(pkg, interactive=False)
 
-        # compatible with python 3.6
+        pkg_to_install = self.get_packages_to_install()
+        self.order_alternatives(pkg_to_install, policy)
+        self.probe_isolated_packages()
+
+        with self._deferred_compilation():
+            if batch and self._install_batch(pkg_to_install, install_optional):
+                pass
+            elif parallel:
+                self._install_parallel(pkg_to_install, install_optional, max_workers)
+            else:
+                for package, alternatives in pkg_to_install.items():
+                    if not self._module_exists(package):
+                        if install_optional or package not in self.optional_packages:
+                            self._install_package_auto(package, alternatives)
+
+        if lock_file is not None:
+            self.write_lock(lock_file)
+        self._publish_verified_state([config_hash], VERIFIED_SCOPES if install_optional else ('required',))
+
+    async def install_auto_async(self, install_optional=False, policy=None):
+        """
+        Install the packages automatically without blocking the event loop.
+
+        The package managers run as asyncio subprocesses, and are killed if the task is canceled. To follow the
+        progress, iterate over flexidep.aio.iter_install_auto(dm) instead.
+
+        :param install_optional: if True, optional packages will be installed
+        :param policy: how the alternatives of the interchangeable packages are ordered (see
+            flexidep.config.ALTERNATIVE_POLICIES). Default: the alternative_policy attribute
+        :return: Nothing
+        """
+        # pylint: disable=import-outside-toplevel
+        from .aio import install_auto_async
+
+        await install_auto_async(self, install_optional, policy)
+
+    def _install_package_auto(self, package, alternatives, extra_options=()):
+        """
+        Install a package, trying its alternatives in order until one succeeds.
+
+        :param package: the package name
+        :param alternatives: the alternatives dictionary. Failed alternatives are removed from it
+        :param extra_options: extra command line options for the package manager
+        :return: Nothing
+        """
+        while not self._install_alternative(
+            package,
+            next(iter(alternatives.keys())),
+            next(iter(alternatives.values())),
+            extra_options,
+        ):
+            print(f'Error installing {package}. Trying a different alternative')
+            alternatives.popitem(0)
+            if not alternatives:
+                if package in self.optional_packages:
+                    print(f'No more alternatives for {package}. Not failing because it is optional')
+                    break
+                raise SetupFailedError(f'Failed to install {package}')
+
+    def _install_parallel(self, pkg_to_install, install_optional, max_workers=None):
+        """
+        Prepare the missing packages in parallel and install them one at a time.
+
+        The first alternative of each package is downloaded/built as soon as the packages it depends on (according to
+        build_install_graph) are installed. The installations run in the order of pkg_to_install.
+
+        :param pkg_to_install: the sorted dictionary of the packages to install
+        :param install_optional: if True, optional packages will be installed
+        :param max_workers: the maximum number of parallel preparations
+        :return: Nothing
+        """
         pkg_to_install = OrderedDict(
-            {**self.pkg_to_install[PackageManagers.common], **self.pkg_to_install[self.package_manager]}
+            (package, alternatives)
+            for package, alternatives in pkg_to_install.items()
+            if alternatives
+            and (install_optional or package not in self.optional_packages)
+            and not self._module_exists(package)
         )
+        if not pkg_to_install:
+            return
 
-        self.sort_packages(pkg_to_install)
+        backend = self._backend()
+        predecessors = build_install_graph(pkg_to_install, self.priority_list)
+        package_index = {package: index for index, package in enumerate(pkg_to_install)}
 
-        for package, alternatives in pkg_to_install.items():
-            if not pkg_exists(package):
-                if install_optional or package not in self.optional_packages:
-                    while not install_package_with_deps(
-                        self.package_manager,
-                        next(iter(alternatives.keys())),
-                        next(iter(alternatives.values())),
-                        self.install_local,
-                        self.extra_command_line,
-                    ):
-                        print(f'Error installing {package}. Trying a different alternative')
-                        alternatives.popitem(0)
-                        if not alternatives:
-                            if package in self.optional_packages:
-                                print(f'No more alternatives for {package}. Not failing because it is optional')
-                                break
-                            raise SetupFailedError(f'Failed to install {package}')
+        with tempfile.TemporaryDirectory() as prepare_dir:
+
+            def prepare(package):
+                alternative, dependencies = next(iter(pkg_to_install[package].items()))
+                directory = os.path.join(prepare_dir, str(package_index[package]))
+                self._report_status(package, f'preparing {alternative}')
+                packages = dependencies.install_before + [alternative] + dependencies.install_after
+                command_line = ' '.join(
+                    [self.get_install_command_line(compile_options=False)]
+                    + [shlex.quote(option) for option in self._constraints_options([package])]
+                ).strip()
+                if backend.prepare(packages, directory, command_line):
+                    return backend.prepared_install_options(directory)
+                return None
+
+            def commit(package, prepared_options):
+                self._install_package_auto(package, pkg_to_install[package], prepared_options or ())
+
+            run_install_schedule(list(pkg_to_install), predecessors, prepare, commit, max_workers)
+
+    def create_lock(self):
+        """
+        Resolve the installed alternatives to exact distributions, to be stored in a lock file.
+
+        For each package, the lock records the alternative that was installed in this session or, if the package was
+        already present, the first alternative whose distribution is installed.
+
+        :return: the lock dictionary
+        """
+        backend = self._backend()
+        if not backend.supports_requirements_file:
+            raise ConfigurationError(f'Lock files are not supported with {self.package_manager.name}')
+
+        installed = backend.query_installed()
+        modules = OrderedDict()
+        for package, alternatives in self.get_packages_to_install().items():
+            alternative = self.selected_alternatives.get(package)
+            if alternative is None:
+                alternative = next((alt for alt in alternatives if base_package_name(alt) in installed), None)
+            if alternative is None or alternative not in alternatives:
+                continue
+            modules[package] = (alternative, alternatives[alternative])
+
+        roots = OrderedDict(
+            (package, dependencies.install_before + [alternative] + dependencies.install_after)
+            for package, (alternative, dependencies) in modules.items()
+        )
+        all_roots = list(dict.fromkeys(root for package_roots in roots.values() for root in package_roots))
+        distributions = backend.dry_run(
+            all_roots, self.install_local, self.get_install_command_line(compile_options=False), ignore_installed=True
+        )
+        if distributions is None:
+            raise SetupFailedError('Could not resolve the packages to lock')
+
+        environment = target_marker_environment(self.python_executable)
+        return {
+            'version': LOCK_FORMAT_VERSION,
+            'config_hash': self.config_hash(),
+            'package_manager': self.package_manager.name,
+            'environment': environment or marker_environment(),
+            'modules': OrderedDict(
+                (
+                    package,
+                    {
+                        'alternative': alternative,
+                        'uninstall_before': dependencies.uninstall_before,
+                        'uninstall_after': dependencies.uninstall_after,
+                        'distributions': distribution_closure(roots[package], distributions, environment),
+                    },
+                )
+                for package, (alternative, dependencies) in modules.items()
+            ),
+            'distributions': [
+                {'name': d['name'], 'version': d['version'], 'hashes': d.get('hashes', {})} for d in distributions
+            ],
+        }
+
+    def write_lock(self, lock_file):
+        """
+        Write a lock file for the installed alternatives.
+
+        :param lock_file: the path of the lock file
+        :return: Nothing
+        """
+        write_lock_file(lock_file, self.create_lock())
+
+    def install_from_lock(self, lock_file, install_optional=False):
+        """
+        Install the packages from a lock file, without selecting alternatives and resolving dependencies.
+
+        All the locked distributions of the missing packages are installed in a single transaction without
+        dependencies, checking their hashes. If the lock cannot be used (the file is missing, or was created for
+        another configuration or environment) or the installation fails, the packages are installed with install_auto.
+        Packages still missing after the locked installation (e.g. added to the configuration as optional packages
+        after creating the lock) are installed with install_auto too.
+
+        :param lock_file: the path of the lock file
+        :param install_optional: if True, optional packages will be installed
+        :return: True if the lock file was used, False if install_auto was used instead
+        """
+        backend = self._backend()
+        lock = read_lock_file(lock_file)
+        if lock is None:
+            reason = 'the lock file cannot be read'
+        elif not backend.supports_requirements_file:
+            reason = f'{self.package_manager.name} cannot install from a lock file'
+        else:
+            reason = lock_mismatch_reason(
+                lock, self.config_hash(), self.package_manager, target_marker_environment(self.python_executable)
+            )
+        if reason is not None:
+            print(f'Not using the lock file: {reason}')
+            self.install_auto(install_optional)
+            return False
+
+        for pkg in self.get_packages_to_uninstall():
+            self.uninstall_package(pkg, interactive=False)
+
+        modules = [
+            package
+            for package in lock['modules']
+            if (install_optional or package not in self.optional_packages) and not self._module_exists(package)
+        ]
+        if not modules:
+            self._install_missing_after_lock(install_optional)
+            return True
+
+        uninstall_before = []
+        distribution_names = []
+        uninstall_after = []
+        for package in modules:
+            locked_module = lock['modules'][package]
+            uninstall_before += locked_module['uninstall_before']
+            distribution_names += locked_module['distributions']
+            uninstall_after += locked_module['uninstall_after']
+            self._report_status(package, f'installing {locked_module["alternative"]}')
+
+        distributions = {base_package_name(d['name']): d for d in lock['distributions']}
+        to_install = [distributions[name] for name in dict.fromkeys(distribution_names)]
+        installed_before = self._installed_snapshot()
+        with self._deferred_compilation(), tempfile.TemporaryDirectory() as temp_dir:
+            requirements_file = os.path.join(temp_dir, 'requirements.txt')
+            with open(requirements_file, 'w', encoding='utf-8') as fd:
+                fd.write('\n'.join(locked_requirements(to_install)) + '\n')
+            success = (
+                backend.uninstall(list(dict.fromkeys(uninstall_before)))
+                and backend.install_requirements_file(
+                    requirements_file,
+                    self.install_local,
+                    self.get_install_command_line(),
+                    no_deps=True,
+                    require_hashes=all(d.get('hashes') for d in to_install),
+                )
+                and backend.uninstall(list(dict.fromkeys(uninstall_after)))
+            )
+        importlib.invalidate_caches()
+
+        if not success:
+            print('Error installing from the lock file. Resolving the packages again')
+            self.install_auto(install_optional)
+            return False
+
+        for package in modules:
+            self.selected_alternatives[package] = lock['modules'][package]['alternative']
+            self._report_status(package, 'installed')
+        self._record_installation(
+            OrderedDict(
+                (package, (lock['modules'][package]['alternative'], lock['modules'][package]['distributions']))
+                for package in modules
+            ),
+            installed_before,
+        )
+        self._install_missing_after_lock(install_optional)
+        return True
+
+    def _install_missing_after_lock(self, install_optional):
+        """
+        Install with install_auto the packages of the configuration that are still missing after installing from a
+        lock file.
+
+        :param install_optional: if True, optional packages will be installed
+        :return: Nothing
+        """
+        missing = [
+            package
+            for package in self.get_packages_to_install()
+            if (install_optional or package not in self.optional_packages) and not self._module_exists(package)
+        ]
+        if missing:
+            print(f'Not in the lock file or not installed from it: {", ".join(missing)}. Resolving them again')
+            self.install_auto(install_optional)
+
+    def _install_batch(self, pkg_to_install, install_optional):
+        """
+        Install the first alternative of all the missing packages in a single transaction.
+
+        :param pkg_to_install: the sorted dictionary of the packages to install
+        :param install_optional: if True, optional packages will be installed
+        :return: True if all the packages were installed, False otherwise
+        """
+        packages = [
+            package
+            for package, alternatives in pkg_to_install.items()
+            if alternatives
+            and (install_optional or package not in self.optional_packages)
+            and not self._module_exists(package)
+        ]
+        if not packages:
+            return True
+
+        uninstall_before = []
+        to_install = []
+        uninstall_after = []
+        for package in packages:
+            alternative, dependencies = next(iter(pkg_to_install[package].items()))
+            uninstall_before += dependencies.uninstall_before
+            to_install += dependencies.install_before + [alternative] + dependencies.install_after
+            uninstall_after += dependencies.uninstall_after
+            self._report_status(package, f'installing {alternative}')
+
+        backend = self._backend()
+        to_install = list(dict.fromkeys(to_install))
+        command_line = ' '.join(
+            [self.get_install_command_line()] + [shlex.quote(option) for option in self._constraints_options(packages)]
+        ).strip()
+        installed_before = self._installed_snapshot()
+        success = self._run_transaction(
+            to_install,
+            uninstall_before + uninstall_after,
+            command_line,
+            lambda: (
+                backend.uninstall(list(dict.fromkeys(uninstall_before)))
+                and backend.install(to_install, self.install_local, command_line)
+                and backend.uninstall(list(dict.fromkeys(uninstall_after)))
+            ),
+        )
+        importlib.invalidate_caches()
+
+        if not success:
+            print('Error in the batch installation. Installing the packages one by one')
+            return False
+
+        installed_modules = OrderedDict()
+        for package in packages:
+            alternative, dependencies = next(iter(pkg_to_install[package].items()))
+            self.selected_alternatives[package] = alternative
+            installed_modules[package] = (
+                alternative,
+                dependencies.install_before + [alternative] + dependencies.install_after,
+            )
+            self._report_status(package, 'installed')
+        self._record_installation(installed_modules, installed_before)
+        return True
 
     def uninstall_package(self, package, interactive=True):
         """
@@ -380,6 +1566,9 @@ class DependencyManager:
         :param interactive: if True, the user will be asked to confirm the uninstallation
         :return: Nothing
         """
+        if self._backend().is_installed(package) is False:
+            return
+
         if interactive:
             if self.use_gui:
                 from .gui import notify_uninstall
@@ -389,7 +1578,7 @@ class DependencyManager:
             if not notify_uninstall(package):
                 raise SetupFailedError(f'Uninstallation of {package} aborted by user')
 
-        uninstall_package(self.package_manager, package)
+        uninstall_package(self.package_manager, package, self.python_executable)
 
     def install_package_interactive(self, package, alternatives, optional=False):
         """
@@ -407,16 +1596,85 @@ class DependencyManager:
             self.show_initialization()
 
         alternative_names = list(alternatives.keys())
-        source = self.select_alternative(package, alternative_names, optional)
+        descriptions = self._footprint_descriptions(alternatives)
+        source = self.select_alternative(package, alternative_names, optional, descriptions)
         if optional and source is None:
             self.mark_ignored(package)
             return True
         dependencies = alternatives[source]
         del alternatives[source]
 
-        return install_package_with_deps(
-            self.package_manager, source, dependencies, self.install_local, self.extra_command_line
+        return self._install_alternative(package, source, dependencies)
+
+    def _install_alternative(self, package, alternative, dependencies, extra_options=()):
+        """
+        Install an alternative for a package, reporting the progress.
+
+        :param package: the package (module) name
+        :param alternative: the alternative to install
+        :param dependencies: the dependencies of the alternative. A NamedTuple as in core.py
+        :param extra_options: extra command line options for the package manager
+        :return: True if success
+        """
+        self._report_status(package, f'installing {alternative}')
+        extra_options = list(extra_options) + self._constraints_options([package])
+        command_line = ' '.join([self.get_install_command_line()] + [shlex.quote(o) for o in extra_options]).strip()
+        installed_before = self._installed_snapshot()
+        start_time = time.monotonic()
+        success = self._run_transaction(
+            dependencies.install_before + [alternative] + dependencies.install_after,
+            dependencies.uninstall_before + dependencies.uninstall_after,
+            command_line,
+            lambda: install_package_with_deps(
+                self.package_manager,
+                alternative,
+                dependencies,
+                self.install_local,
+                command_line,
+                self.python_executable,
+            ),
         )
+        if self.record_history:
+            record_install_outcome(
+                package, alternative, success, time.monotonic() - start_time, self.python_executable
+            )
+        self._report_status(package, 'installed' if success else f'failed {alternative}')
+        if success:
+            self.selected_alternatives[package] = alternative
+            roots = dependencies.install_before + [alternative] + dependencies.install_after
+            self._record_installation({package: (alternative, roots)}, installed_before)
+        return success
+
+    def _run_transaction(self, packages, removed_packages, command_line, install_function):
+        """
+        Run an installation, restoring the previous distributions if it fails and the manager is transactional.
+
+        :param packages: the packages that will be installed
+        :param removed_packages: the packages that will be uninstalled
+        :param command_line: the extra command line parameters of the installation
+        :param install_function: a function without parameters running the installation and returning True if success
+        :return: the result of install_function
+        """
+        if not self.transactional:
+            return install_function()
+
+        with InstallTransaction(self.package_manager, self.python_executable) as transaction:
+            transaction.protect(packages, removed_packages, True, self.install_local, command_line)
+            success = install_function()
+            if not success and not transaction.rollback():
+                print('Warning: the environment could not be completely restored')
+        return success
+
+    def _report_status(self, package, status):
+        """
+        Report a change in the status of a package to the status callback, if any.
+
+        :param package: the package name
+        :param status: the new status
+        :return: Nothing
+        """
+        if self.status_callback is not None:
+            self.status_callback(package, status)
 
     def show_initialization(self):
         """
@@ -436,13 +1694,27 @@ class DependencyManager:
 
         self.initialized = True
 
-    def select_alternative(self, package, alternatives, optional=False):
+    def _footprint_descriptions(self, alternatives):
+        """
+        Get the download sizes of the alternatives, to be shown when selecting them.
+
+        :param alternatives: a dictionary (alternative: dependencies)
+        :return: a dictionary (alternative: description) of the alternatives with a known size, or None
+        """
+        if not self.show_footprint or len(alternatives) < 2 or not self._backend().uses_python_index:
+            return None
+        sizes = alternatives_footprint(alternatives, python_executable=self.python_executable)
+        return {alternative: format_size(size) for alternative, size in sizes.items() if size is not None}
+
+    def select_alternative(self, package, alternatives, optional=False, descriptions=None):
         """
         Select an alternative from a list of alternatives.
 
         :param package: the provided module
         :param alternatives: list of alternatives
         :param optional: if True, the package is optional and the user will be asked if he wants to install it
+        :param descriptions: optional dictionary (alternative: description, e.g. the download size) shown with the
+            alternatives
         :return: the selected alternative [str]
         """
         # pylint: disable=import-outside-toplevel
@@ -451,4 +1723,4 @@ class DependencyManager:
         else:
             from .cli import select_package_alternative
 
-        return select_package_alternative(package, alternatives, optional)
+        return select_package_alternative(package, alternatives, optional, descriptions)
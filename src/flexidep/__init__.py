@@ -5,6 +5,8 @@ from .DependencyManager import DependencyManager
 from .exceptions import *
 from .utils import *
 from .installers import install_package_version, install_package, uninstall_package
+from .history import install_history_report, clear_history
+from .installers import install_packages, uninstall_packages, InstallerBackend, register_backend, get_backend
 
 VERSION = '0.0.16'
 __version__ = VERSION
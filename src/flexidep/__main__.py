@@ -0,0 +1,329 @@
+"""
+Command line interface of flexidep.
+
+Usage: python -m flexidep {check,plan,install,prune,profile,outdated,fanout} ...
+
+Exit codes: 0 on success, 1 if required modules are missing or the installation failed, 2 if the configuration is
+not valid.
+"""
+
+import argparse
+import configparser
+import json
+import os
+import sys
+
+from .core import pkg_spec_exists
+from .DependencyManager import DependencyManager
+from .exceptions import ConfigurationError, OperationCanceledError, SetupFailedError
+from .installers import resolve_package_manager
+
+EXIT_OK = 0
+EXIT_MISSING = 1
+EXIT_CONFIG_ERROR = 2
+
+
+def _print_json(data):
+    """Print data as indented json on the standard output."""
+    print(json.dumps(data, indent=2))
+
+
+def _package_manager(name):
+    """
+    Find the package manager given on the command line.
+
+    :param name: the name or alias of the package manager
+    :return: the package manager, as returned by resolve_package_manager
+    :raise ConfigurationError: if no backend is registered for the name
+    """
+    try:
+        return resolve_package_manager(name)
+    except KeyError:
+        raise ConfigurationError(f'Unknown package manager {name}') from None
+
+
+def _load_manager(args):
+    """
+    Create a dependency manager from the command line arguments.
+
+    :param args: the parsed arguments, with the config, package_manager and python attributes
+    :return: a DependencyManager
+    """
+    if not os.path.isfile(args.config):
+        raise ConfigurationError(f'Configuration file {args.config} not found')
+    dm = DependencyManager(config_file=args.config, interactive_initialization=False, python_executable=args.python)
+    if args.package_manager:
+        dm.package_manager = _package_manager(args.package_manager)
+    return dm
+
+
+def _module_status(dm):
+    """
+    Check which modules of a configuration are present, without importing them in this process.
+
+    The modules in the isolated probes list are imported in child interpreters, the other ones are only looked up.
+
+    :param dm: the DependencyManager
+    :return: a dictionary (package: {'present': bool, 'optional': bool}), in installation order
+    """
+    probe_results = dm.probe_isolated_packages()
+    return {
+        package: {
+            'present': probe_results[package] if package in probe_results else pkg_spec_exists(package),
+            'optional': package in dm.optional_packages,
+        }
+        for package in dm.get_packages_to_install()
+    }
+
+
+def command_check(args):
+    """
+    Check if the modules of a configuration are present and print a json summary.
+
+    :param args: the parsed arguments
+    :return: the exit code
+    """
+    dm = _load_manager(args)
+    modules = _module_status(dm)
+    missing = [package for package, status in modules.items() if not status['present']]
+    missing_required = [package for package in missing if not modules[package]['optional']]
+    missing_optional = [package for package in missing if modules[package]['optional']]
+    ok = not missing_required and not (args.optional and missing_optional)
+    _print_json(
+        {
+            'config': args.config,
+            'package_manager': dm.package_manager.name,
+            'ok': ok,
+            'missing_required': missing_required,
+            'missing_optional': missing_optional,
+            'modules': modules,
+        }
+    )
+    return EXIT_OK if ok else EXIT_MISSING
+
+
+def command_plan(args):
+    """
+    Print the alternatives that an automatic installation would try for the missing modules.
+
+    :param args: the parsed arguments
+    :return: the exit code
+    """
+    dm = _load_manager(args)
+    pkg_to_install = dm.get_packages_to_install()
+    dm.order_alternatives(pkg_to_install, args.policy)
+    modules = _module_status(dm)
+    for package, status in modules.items():
+        status['alternatives'] = [
+            {
+                'alternative': alternative,
+                'install_before': dependencies.install_before,
+                'uninstall_before': dependencies.uninstall_before,
+                'install_after': dependencies.install_after,
+                'uninstall_after': dependencies.uninstall_after,
+            }
+            for alternative, dependencies in pkg_to_install[package].items()
+        ]
+    _print_json(
+        {
+            'config': args.config,
+            'package_manager': dm.package_manager.name,
+            'uninstall': dm.get_packages_to_uninstall(),
+            'modules': modules,
+        }
+    )
+    return EXIT_OK
+
+
+def command_install(args):
+    """
+    Install the modules of a configuration.
+
+    :param args: the parsed arguments
+    :return: the exit code
+    """
+    dm = _load_manager(args)
+    if args.auto:
+        dm.install_auto(
+            install_optional=args.optional,
+            batch=args.batch,
+            lock_file=args.lock,
+            policy=args.policy,
+            parallel=args.parallel,
+        )
+    else:
+        dm.install_interactive(force_optional=args.optional)
+    return command_check(args)
+
+
+def command_prune(args):
+    """
+    Uninstall the distributions installed for modules that are no longer needed, and print their names.
+
+    :param args: the parsed arguments
+    :return: the exit code
+    """
+    dm = _load_manager(args)
+    _print_json({'dry_run': args.dry_run, 'pruned': dm.prune(dry_run=args.dry_run)})
+    return EXIT_OK
+
+
+def command_profile(args):
+    """
+    Print the import cost of the installed modules of a configuration.
+
+    :param args: the parsed arguments
+    :return: the exit code
+    """
+    # pylint: disable=import-outside-toplevel
+    from .profiling import format_import_report
+
+    report = _load_manager(args).profile_imports(args.jobs)
+    if args.json:
+        _print_json(report)
+    else:
+        print(format_import_report(report))
+    return EXIT_OK
+
+
+def command_outdated(args):
+    """
+    Print the installed packages that have newer versions on PyPI.
+
+    :param args: the parsed arguments
+    :return: the exit code
+    """
+    # pylint: disable=import-outside-toplevel
+    from .utils import get_installed_packages_with_available_versions
+
+    packages = get_installed_packages_with_available_versions(args.packages or None)
+    _print_json(
+        {
+            package: {
+                'installed_version': str(info['installed_version']),
+                'latest_version': str(info['available_versions'][0]),
+            }
+            for package, info in sorted(packages.items())
+            if args.all or not info['latest']
+        }
+    )
+    return EXIT_OK
+
+
+def command_fanout(args):
+    """
+    Install the modules of a configuration in several environments in parallel, and print the results.
+
+    :param args: the parsed arguments
+    :return: the exit code
+    """
+    # pylint: disable=import-outside-toplevel
+    from .fanout import format_environment_report, install_environments
+
+    if not os.path.isfile(args.config):
+        raise ConfigurationError(f'Configuration file {args.config} not found')
+    manager_options = {}
+    if args.package_manager:
+        manager_options['package_manager'] = _package_manager(args.package_manager)
+    results = install_environments(
+        args.environments,
+        config_file=args.config,
+        max_workers=args.jobs,
+        install_optional=args.optional,
+        batch=args.batch,
+        policy=args.policy,
+        cache_dir=args.cache_dir,
+        **manager_options,
+    )
+    if args.json:
+        _print_json({environment: result._asdict() for environment, result in results.items()})
+    else:
+        print(format_environment_report(results))
+    return EXIT_OK if all(result.success for result in results.values()) else EXIT_MISSING
+
+
+def build_parser():
+    """
+    Build the parser of the command line arguments.
+
+    :return: an ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog='flexidep', description='Check and install the dependencies of a project.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_config_arguments(subparser):
+        subparser.add_argument('config', help='the configuration file')
+        subparser.add_argument('--package-manager', help='override the package manager of the configuration')
+        subparser.add_argument('--python', help='the interpreter or the directory of the environment to manage')
+
+    check_parser = subparsers.add_parser('check', help='check that the modules are present, without importing them')
+    add_config_arguments(check_parser)
+    check_parser.add_argument('--optional', action='store_true', help='fail if optional modules are missing too')
+    check_parser.set_defaults(function=command_check)
+
+    plan_parser = subparsers.add_parser('plan', help='show the alternatives that would be installed')
+    add_config_arguments(plan_parser)
+    plan_parser.add_argument('--policy', help='the alternative policy (config, history or footprint)')
+    plan_parser.set_defaults(function=command_plan)
+
+    install_parser = subparsers.add_parser('install', help='install the missing modules')
+    add_config_arguments(install_parser)
+    install_parser.add_argument('--auto', action='store_true', help='install without asking for alternatives')
+    install_parser.add_argument('--optional', action='store_true', help='install the optional modules too')
+    install_parser.add_argument('--batch', action='store_true', help='install all the modules in one transaction')
+    install_parser.add_argument('--parallel', action='store_true', help='prepare the modules in parallel')
+    install_parser.add_argument('--policy', help='the alternative policy (config, history or footprint)')
+    install_parser.add_argument('--lock', help='write a lock file after the installation')
+    install_parser.set_defaults(function=command_install)
+
+    prune_parser = subparsers.add_parser('prune', help='uninstall what was installed for modules no longer needed')
+    add_config_arguments(prune_parser)
+    prune_parser.add_argument('--dry-run', action='store_true', help='only print what would be uninstalled')
+    prune_parser.set_defaults(function=command_prune)
+
+    profile_parser = subparsers.add_parser('profile', help='measure the import cost of the installed modules')
+    add_config_arguments(profile_parser)
+    profile_parser.add_argument('--jobs', type=int, help='number of parallel measurements. Default: number of cores')
+    profile_parser.add_argument('--json', action='store_true', help='print the full report as json')
+    profile_parser.set_defaults(function=command_profile)
+
+    outdated_parser = subparsers.add_parser('outdated', help='list the installed packages with newer versions')
+    outdated_parser.add_argument('packages', nargs='*', help='the packages to check. Default: all')
+    outdated_parser.add_argument('--all', action='store_true', help='list up-to-date packages too')
+    outdated_parser.set_defaults(function=command_outdated)
+
+    fanout_parser = subparsers.add_parser('fanout', help='install the missing modules in several environments')
+    fanout_parser.add_argument('config', help='the configuration file')
+    fanout_parser.add_argument('environments', nargs='+', help='the interpreters or directories of the environments')
+    fanout_parser.add_argument('--package-manager', help='override the package manager of the configuration')
+    fanout_parser.add_argument('--jobs', type=int, help='number of environments installed at the same time')
+    fanout_parser.add_argument('--cache-dir', help='the download cache shared by the environments')
+    fanout_parser.add_argument('--optional', action='store_true', help='install the optional modules too')
+    fanout_parser.add_argument('--batch', action='store_true', help='install all the modules in one transaction')
+    fanout_parser.add_argument('--policy', help='the alternative policy (config, history or footprint)')
+    fanout_parser.add_argument('--json', action='store_true', help='print the results as json')
+    fanout_parser.set_defaults(function=command_fanout)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the command line interface.
+
+    :param argv: the command line arguments. Default: sys.argv[1:]
+    :return: the exit code
+    """
+    args = build_parser().parse_args(argv)
+    try:
+        return args.function(args)
+    except (ConfigurationError, configparser.Error) as e:
+        print(f'Configuration error: {e}', file=sys.stderr)
+        return EXIT_CONFIG_ERROR
+    except (SetupFailedError, OperationCanceledError) as e:
+        print(f'Installation failed: {e}', file=sys.stderr)
+        return EXIT_MISSING
+
+
+if __name__ == '__main__':
+    sys.exit(main())
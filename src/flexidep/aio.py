@@ -0,0 +1,858 @@
+"""
+Asyncio counterparts of the installation and version scan functions.
+
+The package managers run through asyncio subprocesses and PyPI is queried with a small HTTP client keeping a pool of
+connections, so that the event loop is never blocked. Canceling the task running an operation kills the running
+package manager. Progress is reported by async iterators (iter_install_auto, iter_outdated).
+"""
+
+import asyncio
+import contextlib
+import importlib
+import json
+import shlex
+import ssl
+from collections import Counter, deque
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+
+from .config import PackageManagers
+from .core import pkg_spec_exists, process_alternatives
+from .exceptions import SetupFailedError
+from .history import record_install_outcome
+from .installers import get_backend
+from .utils import (
+    PYPI_MAX_ATTEMPTS,
+    PYPI_MIRRORS,
+    PYPI_RETRY_DELAY,
+    PYPI_TIMEOUT,
+    LatencyTracker,
+    PackageDict,
+    _parse_pypi_releases,
+    _pypi_canonical_name,
+    get_installed_packages,
+    parse_retry_after,
+)
+from .verified_state import VERIFIED_SCOPES
+
+# maximum length of an output line of a package manager
+MAX_LINE_LENGTH = 2 ** 20
+
+# maximum number of redirects followed by the HTTP client
+MAX_REDIRECTS = 5
+
+
+class InstallEvent(NamedTuple):
+    """An event of an asynchronous installation."""
+
+    package: str
+    # 'status' when the status of the package changes, 'output' for an output line of the package manager
+    kind: str
+    text: str
+
+
+class AsyncCommand:
+    """
+    A package manager command run as an asyncio subprocess.
+
+    Iterating over the object runs the command and yields its output lines (standard output and error). The process is
+    killed if the iteration is interrupted, e.g. because the task is canceled.
+    """
+
+    def __init__(self, command_list):
+        """
+        Initialize the command.
+
+        :param command_list: the command to run, as a list of strings
+        """
+        self.command_list = list(command_list)
+        self.returncode = None
+
+    def __aiter__(self):
+        """Run the command, iterating over its output lines."""
+        return self._output_lines()
+
+    async def _output_lines(self):
+        process = await asyncio.create_subprocess_exec(
+            *self.command_list,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=MAX_LINE_LENGTH,
+        )
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                yield line.decode(errors='replace').rstrip('\r\n')
+            self.returncode = await process.wait()
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def run(self):
+        """
+        Run the command, discarding its output.
+
+        :return: True if the command succeeded
+        """
+        async for _ in self:
+            pass
+        return self.returncode == 0
+
+
+def _alternative_steps(alternative, dependencies):
+    """
+    List the steps installing an alternative, in the same order as install_package_with_deps.
+
+    :param alternative: the alternative to install
+    :param dependencies: the dependencies of the alternative. A NamedTuple as in core.py
+    :return: a list of tuples (action, package), where action is install or uninstall
+    """
+    return (
+        [('uninstall', package) for package in dependencies.uninstall_before]
+        + [('install', package) for package in dependencies.install_before + [alternative] + dependencies.install_after]
+        + [('uninstall', package) for package in dependencies.uninstall_after]
+    )
+
+
+def _step_command(backend, action, package, install_local, extra_command_line):
+    """
+    Build the command of an installation step, checking the state left by the previous steps.
+
+    The checks read the installed distributions (or conda-meta), so this runs in a thread.
+
+    :param backend: the InstallerBackend
+    :param action: install or uninstall
+    :param package: the package of the step
+    :param install_local: whether to install locally
+    :param extra_command_line: extra command line parameters
+    :return: a command list, or None if there is nothing to do
+    """
+    if action == 'uninstall':
+        if backend.is_installed(package) is not False:
+            return backend.uninstall_command([package])
+    elif backend.plan_install([package], extra_command_line):
+        return backend.install_command([package], install_local, extra_command_line)
+    return None
+
+
+async def iter_install_alternative(
+    backend, package, alternative, dependencies, install_local=False, extra_command_line=''
+):
+    """
+    Install an alternative of a package asynchronously, iterating over the progress.
+
+    :param backend: the InstallerBackend
+    :param package: the package (module) name
+    :param alternative: the alternative to install
+    :param dependencies: the dependencies of the alternative. A NamedTuple as in core.py
+    :param install_local: whether to install locally
+    :param extra_command_line: extra command line parameters
+    :return: an async iterator of InstallEvent. The last event is the status 'installed' or 'failed <alternative>'
+    """
+    yield InstallEvent(package, 'status', f'installing {alternative}')
+    loop = asyncio.get_running_loop()
+    for action, step_package in _alternative_steps(alternative, dependencies):
+        command_list = await loop.run_in_executor(
+            None, _step_command, backend, action, step_package, install_local, extra_command_line
+        )
+        if command_list is None:
+            continue
+        command = AsyncCommand(command_list)
+        async for line in command:
+            yield InstallEvent(package, 'output', line)
+        if command.returncode != 0:
+            yield InstallEvent(package, 'status', f'failed {alternative}')
+            return
+    importlib.invalidate_caches()
+    yield InstallEvent(package, 'status', 'installed')
+
+
+async def iter_install_auto(dm, install_optional=False, policy=None):
+    """
+    Install the packages of a dependency manager automatically, iterating over the progress.
+
+    The installation follows install_auto, one package and one alternative at a time, with the constraints file when
+    use_constraints is set. Batch, parallel and transactional installations, and lock files, are not supported.
+
+    :param dm: the DependencyManager
+    :param install_optional: if True, optional packages will be installed
+    :param policy: how the alternatives of the interchangeable packages are ordered. Default: the alternative_policy
+        attribute of dm
+    :return: an async iterator of InstallEvent
+    """
+    config_hash = dm.config_hash()
+    scope = 'optional' if install_optional else 'required'
+    if dm._is_verified_state(config_hash, scope):  # pylint: disable=protected-access
+        return
+
+    backend = dm._backend()  # pylint: disable=protected-access
+    command_line = dm.get_install_command_line()
+
+    for package in dm.get_packages_to_uninstall():
+        installed = await asyncio.get_running_loop().run_in_executor(None, backend.is_installed, package)
+        if installed is False:
+            continue
+        command = AsyncCommand(backend.uninstall_command([package]))
+        async for line in command:
+            yield InstallEvent(package, 'output', line)
+        yield InstallEvent(package, 'status', 'uninstalled')
+
+    pkg_to_install = dm.get_packages_to_install()
+    dm.order_alternatives(pkg_to_install, policy)
+
+    # with a deferred compilation, the distributions installed by the loop are compiled at the end
+    compilation_before = await asyncio.get_running_loop().run_in_executor(
+        None, dm._compilation_snapshot  # pylint: disable=protected-access
+    )
+    try:
+        for package, alternatives in pkg_to_install.items():
+            if not (install_optional or package not in dm.optional_packages):
+                continue
+            # the probes of isolated packages run child interpreters, so they do not run in the event loop
+            exists = await asyncio.get_running_loop().run_in_executor(
+                None, dm._module_exists, package  # pylint: disable=protected-access
+            )
+            if exists:
+                continue
+            # the constraints file is regenerated in a thread when the environment has changed
+            constraints_options = await asyncio.get_running_loop().run_in_executor(
+                None, dm._constraints_options, [package]  # pylint: disable=protected-access
+            )
+            package_command_line = ' '.join(
+                [command_line] + [shlex.quote(option) for option in constraints_options]
+            ).strip()
+            for alternative, dependencies in alternatives.items():
+                # the installed distributions are listed in a thread, as the probes
+                installed_before = await asyncio.get_running_loop().run_in_executor(
+                    None, dm._installed_snapshot  # pylint: disable=protected-access
+                )
+                start_time = asyncio.get_running_loop().time()
+                async for event in iter_install_alternative(
+                    backend, package, alternative, dependencies, dm.install_local, package_command_line
+                ):
+                    if event.kind == 'status':
+                        dm._report_status(package, event.text)  # pylint: disable=protected-access
+                    yield event
+                success = event.text == 'installed'
+                if dm.record_history:
+                    duration = asyncio.get_running_loop().time() - start_time
+                    # the history file is written in a thread
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, record_install_outcome, package, alternative, success, duration, dm.python_executable
+                    )
+                if success:
+                    dm.selected_alternatives[package] = alternative
+                    roots = dependencies.install_before + [alternative] + dependencies.install_after
+                    await asyncio.get_running_loop().run_in_executor(
+                        None,
+                        dm._record_installation,  # pylint: disable=protected-access
+                        {package: (alternative, roots)},
+                        installed_before,
+                    )
+                    break
+                print(f'Error installing {package}. Trying a different alternative')
+            else:
+                if package in dm.optional_packages:
+                    print(f'No more alternatives for {package}. Not failing because it is optional')
+                    continue
+                raise SetupFailedError(f'Failed to install {package}')
+    finally:
+        await asyncio.get_running_loop().run_in_executor(
+            None, dm._compile_changes, compilation_before  # pylint: disable=protected-access
+        )
+    scopes = VERIFIED_SCOPES if install_optional else ('required',)
+    dm._publish_verified_state([config_hash], scopes)  # pylint: disable=protected-access
+
+
+async def install_auto_async(dm, install_optional=False, policy=None):
+    """
+    Install the packages of a dependency manager automatically, without blocking the event loop.
+
+    :param dm: the DependencyManager
+    :param install_optional: if True, optional packages will be installed
+    :param policy: how the alternatives of the interchangeable packages are ordered
+    :return: Nothing
+    """
+    async for _ in iter_install_auto(dm, install_optional, policy):
+        pass
+
+
+async def ensure_async(
+    module,
+    alternatives_str=None,
+    package_manager=PackageManagers.pip,
+    install_local=False,
+    extra_command_line='',
+):
+    """
+    Make sure that a module is available, installing it if needed, and import it.
+
+    :param module: the module name
+    :param alternatives_str: the alternatives providing the module, in the format of the configuration file.
+        Default: the top-level module name
+    :param package_manager: the package manager, a member of PackageManagers
+    :param install_local: whether to install locally
+    :param extra_command_line: extra command line parameters
+    :return: the imported module
+    """
+    loop = asyncio.get_running_loop()
+    # the module is looked up without importing it, in a thread since it scans the import path
+    if not await loop.run_in_executor(None, pkg_spec_exists, module):
+        backend = get_backend(package_manager)
+        alternatives = process_alternatives(alternatives_str or module.split('.')[0])
+        for alternative, dependencies in alternatives.items():
+            async for event in iter_install_alternative(
+                backend, module, alternative, dependencies, install_local, extra_command_line
+            ):
+                pass
+            if event.text == 'installed':
+                break
+            print(f'Error installing {module}. Trying a different alternative')
+        else:
+            raise SetupFailedError(f'Failed to install {module}')
+    # the import can take long, so it runs in a thread
+    return await loop.run_in_executor(None, importlib.import_module, module)
+
+
+class AsyncHTTPClient:
+    """
+    A minimal HTTP/1.1 client for GET requests, keeping a pool of persistent connections per host.
+
+    Use it as an async context manager, or call close() when it is not needed anymore.
+    """
+
+    def __init__(self, max_connections=10, timeout=10):
+        """
+        Initialize the client.
+
+        :param max_connections: the maximum number of simultaneous requests
+        :param timeout: the timeout of a request in seconds
+        """
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._idle_connections = {}
+        self._ssl_context = ssl.create_default_context()
+
+    async def __aenter__(self):
+        """Return the client."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Close the client."""
+        await self.close()
+
+    async def close(self):
+        """
+        Close the idle connections.
+
+        :return: Nothing
+        """
+        connections = [connection for idle in self._idle_connections.values() for connection in idle]
+        self._idle_connections = {}
+        for _, writer in connections:
+            writer.close()
+
+    async def get(self, url):
+        """
+        Send a GET request, following redirects.
+
+        :param url: the url
+        :return: the status code and the body (bytes)
+        """
+        status, _, body = await self.request(url)
+        return status, body
+
+    async def request(self, url):
+        """
+        Send a GET request, following redirects.
+
+        :param url: the url
+        :return: the status code, the headers (a dictionary with lowercase names) and the body (bytes)
+        """
+        async with self._semaphore:
+            for _ in range(MAX_REDIRECTS):
+                status, headers, body = await asyncio.wait_for(self._request(url), self.timeout)
+                if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                    url = urljoin(url, headers['location'])
+                    continue
+                return status, headers, body
+        raise OSError(f'Too many redirects for {url}')
+
+    async def get_json(self, url):
+        """
+        Send a GET request and decode the json response.
+
+        :param url: the url
+        :return: the decoded json, or None if the response status is not 200
+        """
+        status, body = await self.get(url)
+        if status != 200:
+            return None
+        return json.loads(body)
+
+    async def _request(self, url):
+        """Send a request on a pooled connection, and read the response."""
+        parts = urlsplit(url)
+        secure = parts.scheme == 'https'
+        port = parts.port or (443 if secure else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += f'?{parts.query}'
+
+        idle = self._idle_connections.setdefault(key, [])
+        reused = bool(idle)
+        if idle:
+            reader, writer = idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(
+                parts.hostname, port, ssl=self._ssl_context if secure else None
+            )
+
+        # IPv6 literals are bracketed, and the port is only given when it is not the default one of the scheme
+        host = f'[{parts.hostname}]' if ':' in parts.hostname else parts.hostname
+        if port != (443 if secure else 80):
+            host += f':{port}'
+        try:
+            request = (
+                f'GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: flexidep\r\n'
+                'Accept: application/json\r\nConnection: keep-alive\r\n\r\n'
+            )
+            writer.write(request.encode('ascii'))
+            await writer.drain()
+            status, headers, body, keep_alive = await self._read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            writer.close()
+            if reused:
+                # the server closed the idle connection: retry on a new one
+                return await self._request(url)
+            raise
+        except BaseException:
+            # e.g. canceled: the connection is in an unknown state
+            writer.close()
+            raise
+
+        if keep_alive:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, headers, body
+
+    @staticmethod
+    async def _read_head(reader):
+        """Read the status line and the headers of a response: the HTTP version, the status and the headers."""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed')
+        version, status = status_line.split()[:2]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return version.decode('latin-1'), int(status), headers
+
+    @classmethod
+    async def _read_response(cls, reader):
+        """
+        Read a response: the status code, the headers (with lowercase names), the body, and whether the connection
+        can be reused.
+        """
+        version, status, headers = await cls._read_head(reader)
+        while 100 <= status < 200:
+            # interim responses (e.g. 103 Early Hints) have no body and are followed by the final one
+            version, status, headers = await cls._read_head(reader)
+
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            keep_alive = connection == 'keep-alive'
+        else:
+            keep_alive = connection != 'close'
+
+        if status in (204, 304):
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # skip the trailers
+                    while (await reader.readline()).strip():
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            # no framing: the body ends when the server closes the connection
+            body = await reader.read()
+            keep_alive = False
+        return status, headers, body, keep_alive
+
+
+class AdaptiveLimiter:
+    """
+    Limit the number of concurrent requests, with a limit adapted to the server load.
+
+    The limit starts small and grows by one for each fast answer until the first sign of overload (slow start), then
+    by one for each window of fast answers (additive increase). It is halved when the server limits the rate (429,
+    503), times out or fails (multiplicative decrease), and answers much slower than the usual latency reduce it
+    slightly. A Retry-After delay pauses all the new requests.
+    """
+
+    # an answer slower than this multiple of the median latency is a sign of congestion
+    SLOW_FACTOR = 3
+
+    def __init__(self, max_limit, initial_limit=4, min_limit=1):
+        """
+        Initialize the limiter.
+
+        :param max_limit: the maximum number of concurrent requests
+        :param initial_limit: the initial limit
+        :param min_limit: the minimum limit
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.active = 0
+        self._slow_start = True
+        # futures of the waiting requests, the priority ones are served first
+        self._waiters = deque()
+        self._priority_waiters = deque()
+        # loop time before which no request is sent (Retry-After)
+        self._resume_time = 0.0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority=False):
+        """
+        Wait for a free slot and for the end of a Retry-After pause, and hold the slot.
+
+        :param priority: if True, the request is served before the waiting ones (e.g. a duplicated request)
+        :return: an async context manager
+        """
+        loop = asyncio.get_running_loop()
+        while self._resume_time > loop.time():
+            await asyncio.sleep(self._resume_time - loop.time())
+        if self.active < int(self.limit) and not self._priority_waiters and (priority or not self._waiters):
+            self.active += 1
+        else:
+            waiter = loop.create_future()
+            (self._priority_waiters if priority else self._waiters).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # the slot was given before the cancellation
+                    self._release()
+                else:
+                    (self._priority_waiters if priority else self._waiters).remove(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        """Release a slot and give the free slots to the waiting requests."""
+        self.active -= 1
+        self._wake_up()
+
+    def _wake_up(self):
+        """Give the free slots to the waiting requests."""
+        while self.active < int(self.limit) and (self._priority_waiters or self._waiters):
+            waiter = (self._priority_waiters or self._waiters).popleft()
+            waiter.set_result(None)
+            self.active += 1
+
+    def success(self, latency, median_latency=None):
+        """
+        Adapt the limit after an answer.
+
+        :param latency: the latency of the request in seconds
+        :param median_latency: the median of the recent latencies, if known
+        :return: Nothing
+        """
+        if median_latency is not None and latency > self.SLOW_FACTOR * median_latency:
+            self._slow_start = False
+            self.limit = max(self.min_limit, self.limit * 0.9)
+            return
+        self.limit = min(self.max_limit, self.limit + (1 if self._slow_start else 1 / self.limit))
+        self._wake_up()
+
+    def overload(self, retry_after=None):
+        """
+        Adapt the limit after a rate limitation, a timeout or a failure.
+
+        :param retry_after: the delay requested by the server in seconds, if any
+        :return: Nothing
+        """
+        self._slow_start = False
+        self.limit = max(self.min_limit, self.limit / 2)
+        if retry_after:
+            self._resume_time = max(self._resume_time, asyncio.get_running_loop().time() + retry_after)
+
+
+class IndexClient:
+    """
+    A client querying the available versions of packages on the index and its mirrors.
+
+    The number of concurrent requests adapts to the latency and to the rate limitations of the index (see
+    AdaptiveLimiter). A request slower than the 95th percentile of the recent latencies is duplicated on the next
+    mirror (or on the same index if there is only one), and the first answer is used. Failed requests are retried,
+    preferring the mirrors that did not fail. Use it as an async context manager, or call close().
+    """
+
+    # number of latencies needed before the 95th percentile is used as the hedging delay
+    MIN_HEDGE_SAMPLES = 20
+
+    def __init__(
+        self, mirrors=None, max_connections=10, timeout=PYPI_TIMEOUT, max_attempts=PYPI_MAX_ATTEMPTS, hedge_delay=1.0
+    ):
+        """
+        Initialize the client.
+
+        :param mirrors: the base urls of the json API of the index and of its mirrors. Default: PYPI_MIRRORS
+        :param max_connections: the maximum number of simultaneous requests
+        :param timeout: the timeout of a request in seconds
+        :param max_attempts: the number of attempts of a query before its result is unknown
+        :param hedge_delay: the delay before a request is duplicated, until enough latencies are known. None disables
+            the duplicated requests
+        """
+        self.mirrors = [mirror.rstrip('/') for mirror in (mirrors or PYPI_MIRRORS)]
+        self.max_attempts = max_attempts
+        self.hedge_delay = hedge_delay
+        self.latencies = LatencyTracker()
+        self.limiter = AdaptiveLimiter(max_connections)
+        # requests, hedged (duplicated requests), rate_limited, failed, unknown (queries without result)
+        self.statistics = Counter()
+        # hedged requests can use two connections per query
+        self._http_client = AsyncHTTPClient(2 * max_connections, timeout)
+        self._mirror_failures = [0] * len(self.mirrors)
+
+    async def __aenter__(self):
+        """Return the client."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Close the client."""
+        await self.close()
+
+    async def close(self):
+        """
+        Close the idle connections.
+
+        :return: Nothing
+        """
+        await self._http_client.close()
+
+    def _mirror_order(self):
+        """Return the indexes of the mirrors, the ones with the fewest recent failures first."""
+        return sorted(range(len(self.mirrors)), key=lambda index: (self._mirror_failures[index], index))
+
+    async def _fetch(self, package_name, rank, sent_event):
+        """
+        Send a request within the limits of the limiter, and update the statistics.
+
+        The mirror is chosen when the request is sent: the one at position rank in the order of _mirror_order (the
+        last one if there are fewer mirrors). sent_event is set when the request is sent. The duplicated requests
+        (rank > 0) have priority in the limiter.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.limiter.slot(priority=rank > 0):
+            mirror_order = self._mirror_order()
+            mirror_index = mirror_order[min(rank, len(mirror_order) - 1)]
+            url = f'{self.mirrors[mirror_index]}/{package_name}/json'
+            sent_event.set()
+            self.statistics['requests'] += 1
+            start_time = loop.time()
+            try:
+                status, headers, body = await self._http_client.request(url)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                self.statistics['failed'] += 1
+                self._mirror_failures[mirror_index] += 1
+                self.limiter.overload()
+                raise
+            latency = loop.time() - start_time
+
+        if status in (200, 404):
+            self._mirror_failures[mirror_index] = 0
+            median_latency = self.latencies.quantile(0.5) if len(self.latencies) >= self.MIN_HEDGE_SAMPLES else None
+            self.latencies.add(latency)
+            self.limiter.success(latency, median_latency)
+        else:
+            self._mirror_failures[mirror_index] += 1
+            if status in (429, 503):
+                self.statistics['rate_limited'] += 1
+                self.limiter.overload(parse_retry_after(headers.get('retry-after')))
+            else:
+                self.statistics['failed'] += 1
+                self.limiter.overload()
+        return status, body
+
+    def _hedge_delay(self):
+        """Return the delay before a request is duplicated."""
+        if self.hedge_delay is None or len(self.latencies) < self.MIN_HEDGE_SAMPLES:
+            return self.hedge_delay
+        return self.latencies.quantile(0.95)
+
+    async def _hedged_fetch(self, package_name):
+        """
+        Send a request to the best mirror, and a duplicate to the next one if there is no answer within the hedging
+        delay after the request was sent. Return the first definitive answer (200 or 404), or the last answer, or raise
+        the last error.
+        """
+        sent_event = asyncio.Event()
+        tasks = [asyncio.ensure_future(self._fetch(package_name, 0, sent_event))]
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None:
+                # the time spent waiting for the limiter does not count
+                sent_task = asyncio.ensure_future(sent_event.wait())
+                await asyncio.wait([tasks[0], sent_task], return_when=asyncio.FIRST_COMPLETED)
+                sent_task.cancel()
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    self.statistics['hedged'] += 1
+                    tasks.append(asyncio.ensure_future(self._fetch(package_name, 1, asyncio.Event())))
+
+            pending = set(tasks)
+            answer = None
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    answer = task.result()
+                    if answer[0] in (200, 404):
+                        return answer
+            if answer is not None:
+                return answer
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_versions(self, package_name):
+        """
+        Get the available versions of a package.
+
+        :param package_name: the package name
+        :return: a list of versions from the latest to the oldest (empty if the package is not on the index), or None
+            if the versions are unknown because the index could not be queried
+        """
+        for attempt in range(self.max_attempts):
+            if attempt > 0:
+                # a Retry-After pause is added by the limiter
+                await asyncio.sleep(PYPI_RETRY_DELAY * 2 ** (attempt - 1))
+            try:
+                status, body = await self._hedged_fetch(package_name)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                continue
+            if status == 404:
+                return []
+            if status == 200:
+                try:
+                    return _parse_pypi_releases(json.loads(body))
+                except (ValueError, KeyError, AttributeError):
+                    continue
+        self.statistics['unknown'] += 1
+        return None
+
+
+async def get_pypi_available_versions_async(package_name, client):
+    """
+    Get the available versions of a package on PyPI asynchronously.
+
+    :param package_name: the package name
+    :param client: an IndexClient, or an AsyncHTTPClient (a single request to PyPI, without retries)
+    :return: a list of versions from the latest to the oldest (empty if the package is not available), or None if the
+        versions are unknown because the index could not be queried
+    """
+    if isinstance(client, IndexClient):
+        return await client.get_versions(package_name)
+    try:
+        status, body = await client.get(f'{PYPI_MIRRORS[0].rstrip("/")}/{package_name}/json')
+        if status == 404:
+            return []
+        if status != 200:
+            return None
+        return _parse_pypi_releases(json.loads(body))
+    except (OSError, asyncio.TimeoutError, ValueError, KeyError):
+        return None
+
+
+async def iter_outdated(package_list=None, max_connections=10, mirrors=None):
+    """
+    Query PyPI for the available versions of the installed packages, iterating over the results as they arrive.
+
+    :param package_list: optional list of packages to include. Default: all the installed packages
+    :param max_connections: the maximum number of simultaneous requests
+    :param mirrors: the base urls of the json API of the index and of its mirrors. Default: PYPI_MIRRORS
+    :return: an async iterator of (package name, dictionary) tuples, where the dictionary is as in
+        get_installed_packages_with_available_versions. Packages not available on PyPI are skipped, and a warning
+        lists the packages whose versions could not be queried
+    """
+    installed_packages = get_installed_packages()
+    if package_list is None:
+        package_list = list(installed_packages.keys())
+    else:
+        if isinstance(package_list, str):
+            package_list = [package_list]
+        package_list = [_pypi_canonical_name(package) for package in package_list]
+        package_list = [package for package in package_list if package in installed_packages]
+
+    async with IndexClient(mirrors, max_connections) as client:
+
+        async def query(package_name):
+            return package_name, await client.get_versions(package_name)
+
+        tasks = [asyncio.ensure_future(query(package_name)) for package_name in package_list]
+        unknown_packages = []
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                package_name, available_versions = await next_result
+                if available_versions is None:
+                    unknown_packages.append(package_name)
+                    continue
+                if not available_versions:
+                    continue
+                current_version = installed_packages[package_name]
+                yield package_name, {
+                    'installed_version': current_version,
+                    'latest': current_version >= available_versions[0],
+                    'available_versions': available_versions,
+                }
+            if unknown_packages:
+                print(f'Warning: cannot query the index for {", ".join(unknown_packages)}')
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def get_installed_packages_with_available_versions_async(package_list=None, max_connections=10, mirrors=None):
+    """
+    Get the installed packages with their available versions on PyPI, without blocking the event loop.
+
+    :param package_list: optional list of packages to include
+    :param max_connections: the maximum number of simultaneous requests
+    :param mirrors: the base urls of the json API of the index and of its mirrors. Default: PYPI_MIRRORS
+    :return: a PackageDict as returned by get_installed_packages_with_available_versions
+    """
+    results = {}
+    async for package_name, output_element in iter_outdated(package_list, max_connections, mirrors):
+        results[package_name] = output_element
+    # same order as the synchronous version
+    output_dict = PackageDict()
+    for package_name in get_installed_packages():
+        if package_name in results:
+            output_dict[package_name] = results[package_name]
+    return output_dict
@@ -0,0 +1,140 @@
+"""Compilation of the python files of installed distributions, deferred after their installation."""
+
+import heapq
+import os
+import subprocess
+import sys
+import time
+
+from .environment import installed_distributions
+
+# minimum number of files compiled by each child interpreter, so that small compilations do not start many of them
+MIN_FILES_PER_PROCESS = 50
+
+
+class BytecodeCompilation:
+    """A compilation running in child interpreters, which continue if the current process exits."""
+
+    def __init__(self, processes, file_count):
+        """
+        Initialize the compilation.
+
+        :param processes: the Popen objects of the child interpreters
+        :param file_count: the number of files to compile
+        """
+        self.processes = processes
+        self.file_count = file_count
+
+    def done(self):
+        """
+        Check if the compilation is finished.
+
+        :return: True if all the child interpreters exited
+        """
+        return all(process.poll() is not None for process in self.processes)
+
+    def wait(self, timeout=None):
+        """
+        Wait for the end of the compilation.
+
+        :param timeout: the maximum time to wait in seconds. Default: no limit
+        :return: True if the compilation is finished
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for process in self.processes:
+            try:
+                process.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                return False
+        return True
+
+    def errors(self):
+        """
+        Check if some files could not be compiled, e.g. because they use the syntax of another python version.
+
+        :return: True if a child interpreter reported an error, None if the compilation is not finished
+        """
+        if not self.done():
+            return None
+        return any(process.returncode != 0 for process in self.processes)
+
+
+def distribution_sources(names, python_executable=None):
+    """
+    Get the python files of installed distributions, from their RECORD.
+
+    :param names: canonical names of the distributions
+    :param python_executable: the interpreter of the distributions. Default: the current one
+    :return: a list of paths of existing files
+    """
+    distributions = installed_distributions(python_executable)
+    sources = []
+    for name in names:
+        if name not in distributions:
+            continue
+        for record_entry in distributions[name].files or []:
+            if record_entry.suffix == '.py':
+                path = str(distributions[name].locate_file(record_entry))
+                if os.path.isfile(path):
+                    sources.append(path)
+    return sources
+
+
+def _balanced_chunks(paths, count):
+    """Split the paths in count lists of similar total size, the largest files first."""
+    sizes = {path: os.path.getsize(path) for path in paths}
+    chunks = [[] for _ in range(count)]
+    loads = [(0, index) for index in range(count)]
+    for path in sorted(paths, key=sizes.get, reverse=True):
+        load, index = heapq.heappop(loads)
+        chunks[index].append(path)
+        heapq.heappush(loads, (load + sizes[path], index))
+    return [chunk for chunk in chunks if chunk]
+
+
+def compile_files(paths, python_executable=None, max_workers=None):
+    """
+    Compile python files to bytecode with compileall, in parallel child interpreters.
+
+    The files are split between the children by size. The children are started before returning: use the wait
+    method of the result to wait for them. Files whose bytecode is up to date are skipped by compileall.
+
+    :param paths: the paths of the python files
+    :param python_executable: the interpreter compiling the files, which must be the one that will import them.
+        Default: the current one
+    :param max_workers: the maximum number of child interpreters. Default: the number of cores
+    :return: a BytecodeCompilation
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return BytecodeCompilation([], 0)
+    process_count = min(max_workers or os.cpu_count() or 1, -(-len(paths) // MIN_FILES_PER_PROCESS))
+    processes = []
+    for chunk in _balanced_chunks(paths, process_count):
+        # the file list is read from the standard input
+        process = subprocess.Popen(
+            [python_executable or sys.executable, '-m', 'compileall', '-qq', '-i', '-'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            process.stdin.write(''.join(f'{path}\n' for path in chunk).encode(sys.getfilesystemencoding()))
+            process.stdin.close()
+        except OSError:
+            # the child exited early: its files stay uncompiled, and are compiled at their first import
+            pass
+        processes.append(process)
+    return BytecodeCompilation(processes, len(paths))
+
+
+def compile_distributions(names, python_executable=None, max_workers=None):
+    """
+    Compile the python files of installed distributions to bytecode, e.g. after installing them with --no-compile.
+
+    :param names: canonical names of the distributions
+    :param python_executable: the interpreter of the distributions. Default: the current one
+    :param max_workers: the maximum number of child interpreters. Default: the number of cores
+    :return: a BytecodeCompilation, running in the background
+    """
+    return compile_files(distribution_sources(names, python_executable), python_executable, max_workers)
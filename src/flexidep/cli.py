@@ -1,8 +1,9 @@
 """CLI implementation."""
 
 from .config import DONT_INSTALL_TEXT
-from .core import PackageManagers, get_package_managers_list
+from .core import get_package_managers_list
 from .exceptions import OperationCanceledError
+from .installers import get_backend, resolve_package_manager
 
 
 def show_alternatives(prompt, alternative_list, default=None, show_cancel=True):
@@ -143,41 +144,47 @@ def interactive_initialize(default_package_manager, default_install_local, defau
 
     :return:
     """
-    # The package manager enum always contains "common" at 1, which is not offered as an option, so the returned
-    # choice, which starts at zero, always corresponds to the package manager index-2
+    package_manager_names = get_package_managers_list()
+    try:
+        default_choice = package_manager_names.index(default_package_manager.name)
+    except ValueError:
+        default_choice = 0
     choice = show_alternatives(
         'Select a package manager',
-        [x.capitalize() for x in get_package_managers_list()],
-        default_package_manager.value - 2,
+        [x.capitalize() for x in package_manager_names],
+        default_choice,
         True,
     )
-    package_manager = PackageManagers(choice + 2)
+    package_manager = resolve_package_manager(package_manager_names[choice])
 
     install_local = default_install_local
 
-    if package_manager == PackageManagers.pip:
+    if get_backend(package_manager).supports_local_install:
         install_local = show_yesno('Install locally', default_install_local)
 
     extra_command_line = show_open('Extra command line parameters', default_extra_command_line, True)
     return package_manager, install_local, extra_command_line
 
 
-def select_package_alternative(package, alternatives_list, optional=False):
+def select_package_alternative(package, alternatives_list, optional=False, descriptions=None):
     """
     Select a package alternative.
 
     :param package: the package name
     :param alternatives_list: the list of alternatives
     :param optional: whether the package is optional
+    :param descriptions: optional dictionary (alternative: description) shown next to the alternatives
     :return:
     """
     if len(alternatives_list) == 1 and not optional:
         return alternatives_list[0]
 
+    descriptions = descriptions or {}
+    labels = [f'{x} ({descriptions[x]})' if x in descriptions else x for x in alternatives_list]
     if optional:
-        display_alternatives = [DONT_INSTALL_TEXT] + alternatives_list
+        display_alternatives = [DONT_INSTALL_TEXT] + labels
     else:
-        display_alternatives = alternatives_list
+        display_alternatives = labels
 
     opt_req = 'Optional' if optional else 'Required'
 
@@ -0,0 +1,185 @@
+"""Reading the state of a conda environment directly from its conda-meta directory."""
+
+import glob
+import json
+import os
+import re
+import sys
+from typing import NamedTuple
+
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+from .environment import register_cache_invalidator
+
+
+class CondaPackageRecord(NamedTuple):
+    """A package installed by conda."""
+
+    name: str
+    version: str
+    build: str
+    channel: str
+
+
+# conda-meta directory: (modification time of the directory, {canonical name: CondaPackageRecord})
+_conda_meta_cache = {}
+
+
+def _canonical_name(name):
+    """Return the canonical name of a package."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def get_conda_meta_dir(prefix=None):
+    """
+    Get the conda-meta directory of an environment.
+
+    :param prefix: the prefix of the environment. Default: the current one
+    :return: the path of the conda-meta directory
+    """
+    return os.path.join(prefix or sys.prefix, 'conda-meta')
+
+
+def _channel_name(channel):
+    """
+    Get the short name of a channel from the channel url stored by conda.
+
+    :param channel: the channel as stored in conda-meta, e.g. https://conda.anaconda.org/conda-forge/linux-64
+    :return: the channel name, e.g. conda-forge
+    """
+    if not channel:
+        return ''
+    channel = channel.rstrip('/')
+    if '://' not in channel:
+        return channel
+    parts = channel.split('/')
+    # remove the subdir (linux-64, noarch...) if present
+    if len(parts) > 4 and re.match(r'^(noarch|[a-z]+-(32|64|aarch64|arm64|armv[67]l|ppc64le|s390x))$', parts[-1]):
+        parts = parts[:-1]
+    return parts[-1]
+
+
+def read_conda_packages(prefix=None):
+    """
+    Read the packages installed in a conda environment.
+
+    The result is cached and only read again when the conda-meta directory changes.
+
+    :param prefix: the prefix of the environment. Default: the current one
+    :return: a dictionary (canonical name: CondaPackageRecord), or None if the prefix is not a conda environment
+    """
+    meta_dir = get_conda_meta_dir(prefix)
+    try:
+        mtime = os.stat(meta_dir).st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _conda_meta_cache.get(meta_dir)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    packages = {}
+    for record_file in glob.glob(os.path.join(meta_dir, '*.json')):
+        try:
+            with open(record_file, encoding='utf-8') as fd:
+                record = json.load(fd)
+        except (OSError, ValueError):
+            continue
+        if 'name' not in record or 'version' not in record:
+            continue
+        packages[_canonical_name(record['name'])] = CondaPackageRecord(
+            name=record['name'],
+            version=record['version'],
+            build=record.get('build', ''),
+            channel=_channel_name(record.get('channel') or record.get('schannel', '')),
+        )
+
+    _conda_meta_cache[meta_dir] = (mtime, packages)
+    return packages
+
+
+@register_cache_invalidator
+def clear_conda_cache():
+    """
+    Clear the cache of the conda-meta contents.
+
+    :return: Nothing
+    """
+    _conda_meta_cache.clear()
+
+
+def get_conda_package(name, prefix=None):
+    """
+    Get the record of an installed conda package.
+
+    :param name: the package name
+    :param prefix: the prefix of the environment. Default: the current one
+    :return: a CondaPackageRecord, or None if the package is not installed
+    """
+    packages = read_conda_packages(prefix)
+    if not packages:
+        return None
+    return packages.get(_canonical_name(name))
+
+
+def parse_conda_spec(spec):
+    """
+    Parse a conda package specification.
+
+    Supported formats: name, channel::name, name=1.2 (meaning 1.2.*), name==1.2, name>=1.2,<2, name 1.2.*
+
+    :param spec: the package specification
+    :return: the package name and a SpecifierSet, or None if the version part cannot be interpreted
+    """
+    spec = spec.strip()
+    if '::' in spec:
+        spec = spec.split('::', 1)[1]
+    match = re.match(r'^([A-Za-z0-9_.-]+)\s*(.*)$', spec)
+    if not match:
+        return None
+    name, version_spec = match.group(1), match.group(2).strip()
+    if not version_spec:
+        return name, SpecifierSet()
+
+    if version_spec.startswith('=') and not version_spec.startswith('=='):
+        version_spec = version_spec[1:]
+        if '=' in version_spec:
+            # a build string is specified. Not supported
+            return None
+        if not version_spec.endswith('*'):
+            version_spec += '.*'
+        version_spec = '==' + version_spec
+    elif version_spec[0].isdigit():
+        version_spec = '==' + version_spec
+
+    try:
+        return name, SpecifierSet(version_spec)
+    except InvalidSpecifier:
+        return None
+
+
+def conda_requirement_satisfied(spec, prefix=None):
+    """
+    Check if a conda package specification is satisfied by the installed packages.
+
+    :param spec: the package specification, e.g. numpy>=1.20
+    :param prefix: the prefix of the environment. Default: the current one
+    :return: True or False, or None if it cannot be determined without running conda
+    """
+    packages = read_conda_packages(prefix)
+    if packages is None:
+        return None
+    parsed_spec = parse_conda_spec(spec)
+    if parsed_spec is None:
+        return None
+    name, specifier = parsed_spec
+    record = packages.get(_canonical_name(name))
+    if record is None:
+        return False
+    if not specifier:
+        return True
+    try:
+        return specifier.contains(Version(record.version), prereleases=True)
+    except InvalidVersion:
+        return None
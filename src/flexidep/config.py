@@ -10,7 +10,7 @@ from .exceptions import ConfigurationError
 APP_NAME = 'com.francescosantini.flexidep'
 APP_AUTHOR = 'Francesco Santini'
 
-PackageManagers = Enum('PackageManagers', 'common pip conda')
+PackageManagers = Enum('PackageManagers', 'common pip conda uv mamba')
 
 CONFIG_DIR = appdirs.user_config_dir(APP_NAME, APP_AUTHOR)
 os.makedirs(CONFIG_DIR, exist_ok=True)
@@ -28,3 +28,8 @@ def ignored_packages_file(unique_id):
 
 
 DONT_INSTALL_TEXT = 'Do not install'
+
+# policies to order the alternatives of interchangeable packages in automatic installations
+# config: the order of the configuration file; history: the expected installation time from the recorded history;
+# footprint: the download size for the current platform, from the index metadata
+ALTERNATIVE_POLICIES = ('config', 'history', 'footprint')
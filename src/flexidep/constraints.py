@@ -0,0 +1,76 @@
+"""Constraints files keeping the installed distributions stable while other packages are installed."""
+
+import hashlib
+import os
+import threading
+
+from packaging.requirements import InvalidRequirement, Requirement
+
+from .config import CONFIG_DIR
+from .core import base_package_name
+
+CONSTRAINTS_DIR = os.path.join(CONFIG_DIR, 'constraints')
+
+_HEADER_PREFIX = '# flexidep constraints '
+
+
+def pinned_requirements(requirements):
+    """
+    Extract the exact pins from a list of requirements.
+
+    :param requirements: a list of requirement strings, e.g. ['numpy==1.26.4', 'scipy>=1.10']
+    :return: a dictionary (canonical name: pin string), e.g. {'numpy': 'numpy==1.26.4'}
+    """
+    pins = {}
+    for requirement_string in requirements:
+        try:
+            requirement = Requirement(requirement_string)
+        except InvalidRequirement:
+            continue
+        exact = [specifier for specifier in requirement.specifier if specifier.operator in ('==', '===')]
+        if exact and not exact[0].version.endswith('.*'):
+            pins[base_package_name(requirement.name)] = f'{requirement.name}{exact[0]}'
+    return pins
+
+
+def build_constraints(installed, pins, excluded=()):
+    """
+    Build the lines of a constraints file.
+
+    :param installed: a dictionary (canonical name: version) of the installed distributions
+    :param pins: a dictionary (canonical name: pin string) of the pins of the selected alternatives
+    :param excluded: canonical names that must not be constrained to their installed version, e.g. because they are
+        installed or upgraded by the configuration
+    :return: a sorted list of constraint strings
+    """
+    excluded = set(excluded)
+    constraints = {name: f'{name}=={version}' for name, version in installed.items() if name not in excluded}
+    constraints.update(pins)
+    return [constraints[name] for name in sorted(constraints)]
+
+
+def constraints_file(name, fingerprint, generate):
+    """
+    Get the path of a constraints file, writing it only if its state has changed.
+
+    :param name: the name of the constraints file (without extension), e.g. derived from the configuration hash
+    :param fingerprint: a string identifying the state the constraints depend on (environment and pins)
+    :param generate: a function without parameters returning the lines of the constraints file
+    :return: the path of the constraints file
+    """
+    path = os.path.join(CONSTRAINTS_DIR, f'{name}.txt')
+    header = _HEADER_PREFIX + hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+    try:
+        with open(path, encoding='utf-8') as fd:
+            if fd.readline().rstrip('\n') == header:
+                return path
+    except OSError:
+        pass
+
+    os.makedirs(CONSTRAINTS_DIR, exist_ok=True)
+    # the file can be generated by several threads, e.g. in parallel installations
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as fd:
+        fd.write('\n'.join([header] + generate()) + '\n')
+    os.replace(temp_path, path)
+    return path
@@ -1,11 +1,15 @@
 """Core module for flexidep."""
+import heapq
 from collections import OrderedDict
+from functools import lru_cache
+from importlib.machinery import PathFinder
+from importlib.util import find_spec
 from typing import NamedTuple
 import re
 
-from packaging.markers import Marker
+from packaging.markers import Marker, default_environment
 
-from .config import PackageManagers
+from .installers import get_registered_package_managers
 
 
 class RequirementsTuple(NamedTuple):
@@ -23,9 +27,7 @@ def get_package_managers_list():
 
     :return: a list of strings
     """
-    pm_list = [x.name for x in PackageManagers]
-    pm_list.pop(0)  # remove the first dummy package manager
-    return pm_list
+    return [x.name for x in get_registered_package_managers()]
 
 
 def parse_alternative(alternative_string: str) -> (str, list, list, list, list):
@@ -62,28 +64,52 @@ def parse_alternative(alternative_string: str) -> (str, list, list, list, list):
     return package_name, install_before, uninstall_before, install_after, uninstall_after
 
 
-def process_alternatives(alternatives_str: str) -> dict:
+@lru_cache(maxsize=None)
+def parse_marker(marker_string):
     """
-    Process the alternatives to only show the ones relevant to the current setup.
+    Parse an environment marker. The parsed markers are cached, so that each distinct marker is only parsed once.
 
-    :param alternatives: a list of strings in the format "package_name; marker"
-    :return: a dictionary where the keys are packages (without markers) that are relevant to the current setup,
-    and the elements are the packages to install/uninstall before and after the main package
+    :param marker_string: the marker, e.g. sys_platform == 'darwin'
+    :return: a Marker object
+    """
+    return Marker(marker_string)
+
+
+def split_alternatives(alternatives_str):
+    """
+    Split a string of alternatives into the alternatives and their markers.
+
+    :param alternatives_str: the alternatives, separated by commas or newlines, in the format "alternative; marker"
+    :return: a list of (alternative, marker string) tuples. The marker string is None if there is no marker
     """
     alternatives = [x.strip() for x in re.split('[\n,]', alternatives_str)]
-    alternatives_out = OrderedDict()
+    alternatives_out = []
 
     for alternative in alternatives:
         if not alternative.strip():
             continue
         if ';' in alternative:
-            marker = Marker(alternative.split(';')[1])
-            if marker.evaluate():
-                alternative_string = alternative.split(';')[0].strip()
-            else:
-                alternative_string = ""
+            alternatives_out.append((alternative.split(';')[0].strip(), alternative.split(';')[1].strip()))
         else:
-            alternative_string = alternative
+            alternatives_out.append((alternative, None))
+
+    return alternatives_out
+
+
+def process_alternatives(alternatives_str: str, environment=None) -> dict:
+    """
+    Process the alternatives to only show the ones relevant to the current setup.
+
+    :param alternatives: a list of strings in the format "package_name; marker"
+    :param environment: the marker environment to evaluate the markers in. Default: the current one
+    :return: a dictionary where the keys are packages (without markers) that are relevant to the current setup,
+    and the elements are the packages to install/uninstall before and after the main package
+    """
+    alternatives_out = OrderedDict()
+
+    for alternative_string, marker in split_alternatives(alternatives_str):
+        if marker is not None and not parse_marker(marker).evaluate(environment):
+            continue
 
         if alternative_string:
             alt, i_b, u_b, i_a, u_a = parse_alternative(alternative_string)
@@ -107,3 +133,328 @@ def pkg_exists(pkg_name):
         except ImportError:
             pass
     return False
+
+
+def _module_spec_exists(module_name):
+    """
+    Check if a module can be found, without importing it or its parent packages.
+
+    :param module_name: the module name, possibly dotted
+    :return: True if the module can be found
+    """
+    top_level, *submodules = module_name.split('.')
+    try:
+        spec = find_spec(top_level)
+    except (ImportError, ValueError):
+        return False
+    for submodule in submodules:
+        if spec is None or spec.submodule_search_locations is None:
+            return False
+        spec = PathFinder.find_spec(submodule, spec.submodule_search_locations)
+    return spec is not None
+
+
+def pkg_spec_exists(pkg_name):
+    """
+    Check if a package exists, without importing it.
+
+    This is faster than pkg_exists and has no side effects, but it does not detect packages that are found but fail
+    to import.
+
+    :param pkg_name: the name of the package. Alternative names can be separated by |
+    :return: True if the package exists, False otherwise
+    """
+    return any(_module_spec_exists(pkg_to_check) for pkg_to_check in pkg_name.split('|'))
+
+
+def base_package_name(package):
+    """
+    Extract the base name of a package from a requirement string.
+
+    :param package: a requirement, e.g. numpy>=1.20
+    :return: the canonical package name, e.g. numpy
+    """
+    match = re.match(r'\s*([A-Za-z0-9_.-]*)', package)
+    return re.sub(r'[-_.]+', '-', match.group(1)).lower()
+
+
+class PackageList(list):
+    """
+    A list of package names with constant time membership tests and positions.
+
+    The index (package: position of its first occurrence) is updated when items are appended, and rebuilt lazily after
+    the other changes, so the list can be used and modified like a plain list.
+    """
+
+    # class default, used while copies and unpickled lists are filled before their attributes are restored
+    _index = None
+
+    def __init__(self, iterable=()):
+        """Initialize the list."""
+        super().__init__(iterable)
+        self._index = None
+
+    def _get_index(self):
+        """Return the index, building it if needed."""
+        if self._index is None:
+            index = {}
+            for position, item in enumerate(self):
+                index.setdefault(item, position)
+            self._index = index
+        return self._index
+
+    def _invalidate(self):
+        """Forget the index after a change."""
+        self._index = None
+
+    def __contains__(self, item):
+        """Check if an item is in the list."""
+        return item in self._get_index()
+
+    def position(self, item):
+        """
+        Get the position of the first occurrence of an item.
+
+        :param item: the item
+        :return: the position, or None if the item is not in the list
+        """
+        return self._get_index().get(item)
+
+    def append(self, item):
+        """Append an item."""
+        super().append(item)
+        if self._index is not None:
+            self._index.setdefault(item, len(self) - 1)
+
+    def extend(self, iterable):
+        """Append the items of an iterable, which can be the list itself."""
+        start = len(self)
+        super().extend(iterable)
+        if self._index is not None:
+            for position in range(start, len(self)):
+                self._index.setdefault(self[position], position)
+
+    def __iadd__(self, iterable):
+        """Append the items of an iterable."""
+        self.extend(iterable)
+        return self
+
+    def __imul__(self, count):
+        """Repeat the items."""
+        result = super().__imul__(count)
+        self._invalidate()
+        return result
+
+    def insert(self, position, item):
+        """Insert an item."""
+        super().insert(position, item)
+        self._invalidate()
+
+    def remove(self, item):
+        """Remove the first occurrence of an item."""
+        super().remove(item)
+        self._invalidate()
+
+    def pop(self, position=-1):
+        """Remove and return an item."""
+        item = super().pop(position)
+        self._invalidate()
+        return item
+
+    def clear(self):
+        """Remove all the items."""
+        super().clear()
+        self._invalidate()
+
+    def sort(self, *args, **kwargs):
+        """Sort the items."""
+        super().sort(*args, **kwargs)
+        self._invalidate()
+
+    def reverse(self):
+        """Reverse the items."""
+        super().reverse()
+        self._invalidate()
+
+    def __setitem__(self, key, value):
+        """Replace items."""
+        super().__setitem__(key, value)
+        self._invalidate()
+
+    def __delitem__(self, key):
+        """Delete items."""
+        super().__delitem__(key)
+        self._invalidate()
+
+
+def _merge_unique(lists):
+    """Concatenate lists removing duplicates and keeping the order of first appearance."""
+    return list(OrderedDict.fromkeys(item for item_list in lists for item in item_list))
+
+
+def merge_alternatives(package, alternatives_list):
+    """
+    Merge the alternatives of a package that is required by several configurations.
+
+    Only the alternatives accepted by all configurations are kept, in the order of the first configuration. The extra
+    packages to install/uninstall of an alternative are joined.
+
+    :param package: the package (module) name
+    :param alternatives_list: a list of dictionaries as returned by process_alternatives
+    :return: the merged dictionary, and a list of conflict descriptions
+    """
+    conflicts = []
+    merged = OrderedDict()
+    for alternative in alternatives_list[0]:
+        if not all(alternative in alternatives for alternatives in alternatives_list[1:]):
+            continue
+        requirements = [alternatives[alternative] for alternatives in alternatives_list]
+        merged_requirements = RequirementsTuple(
+            install_before=_merge_unique(r.install_before for r in requirements),
+            uninstall_before=_merge_unique(r.uninstall_before for r in requirements),
+            install_after=_merge_unique(r.install_after for r in requirements),
+            uninstall_after=_merge_unique(r.uninstall_after for r in requirements),
+        )
+        installed = {
+            base_package_name(p) for p in merged_requirements.install_before + merged_requirements.install_after
+        }
+        uninstalled = {
+            base_package_name(p) for p in merged_requirements.uninstall_before + merged_requirements.uninstall_after
+        }
+        if installed & uninstalled:
+            both = ', '.join(sorted(installed & uninstalled))
+            conflicts.append(f'{package}: alternative {alternative} both installs and uninstalls {both}')
+            continue
+        merged[alternative] = merged_requirements
+
+    if not merged:
+        alternatives_str = ' vs '.join('[' + ', '.join(alternatives) + ']' for alternatives in alternatives_list)
+        conflicts.append(f'{package}: no alternative is accepted by all configurations ({alternatives_str})')
+
+    return merged, conflicts
+
+
+def merge_priority_lists(priority_lists):
+    """
+    Merge several priority lists into one that respects the order of each of them.
+
+    :param priority_lists: a list of priority lists
+    :return: the merged list, and a list of conflict descriptions
+    """
+    packages = _merge_unique(priority_lists)
+    appearance = {package: position for position, package in enumerate(packages)}
+    # graph of the packages that must come after each package, and number of packages that must come before
+    successors = {package: set() for package in packages}
+    for priority_list in priority_lists:
+        for before, after in zip(priority_list, priority_list[1:]):
+            if before != after:
+                successors[before].add(after)
+    predecessor_count = dict.fromkeys(packages, 0)
+    for package_successors in successors.values():
+        for successor in package_successors:
+            predecessor_count[successor] += 1
+
+    merged = []
+    # the ready packages, by order of appearance, to keep the result stable
+    ready = [appearance[package] for package in packages if predecessor_count[package] == 0]
+    heapq.heapify(ready)
+    while ready:
+        package = packages[heapq.heappop(ready)]
+        merged.append(package)
+        for successor in successors[package]:
+            predecessor_count[successor] -= 1
+            if predecessor_count[successor] == 0:
+                heapq.heappush(ready, appearance[successor])
+    if len(merged) < len(packages):
+        merged_packages = set(merged)
+        cycle = ', '.join(package for package in packages if package not in merged_packages)
+        return packages, [f'the priority lists have incompatible orders for {cycle}']
+    return merged, []
+
+
+_PLATFORM_ENVIRONMENTS = {
+    'linux': {'platform_system': 'Linux', 'os_name': 'posix'},
+    'darwin': {'platform_system': 'Darwin', 'os_name': 'posix'},
+    'win32': {'platform_system': 'Windows', 'os_name': 'nt'},
+}
+
+
+def target_environment(**markers):
+    """
+    Build the marker environment of a target platform, starting from the current one.
+
+    If only sys_platform is given, platform_system and os_name are set accordingly. If only python_version is given,
+    python_full_version is set to its first release.
+
+    :param markers: the marker variables of the target, e.g. sys_platform='win32', python_version='3.10'
+    :return: a dictionary of marker variables
+    """
+    environment = dict(default_environment())
+    if 'sys_platform' in markers:
+        for key, value in _PLATFORM_ENVIRONMENTS.get(markers['sys_platform'], {}).items():
+            environment[key] = value
+    if 'python_version' in markers and 'python_full_version' not in markers:
+        environment['python_full_version'] = f'{markers["python_version"]}.0'
+    environment.update(markers)
+    return environment
+
+
+def plan_alternatives_matrix(packages, environments, uninstalled=()):
+    """
+    Evaluate the alternatives of several packages for several target environments at once.
+
+    Each distinct marker is parsed once, and evaluated once per target environment.
+
+    :param packages: a dictionary (package: list of alternatives strings). If a package has more than one
+        alternatives string (e.g. from merged configurations), the alternatives are merged as in merge_alternatives
+    :param environments: a dictionary (target name: marker environment), e.g. built with target_environment
+    :param uninstalled: the packages to uninstall. Their alternatives are dropped, as in DependencyManager.merge,
+        unless all the alternatives of a package would be dropped
+    :return: a dictionary (target name: OrderedDict(package: alternatives dictionary as in process_alternatives))
+    """
+    # parse the alternatives once: package -> list of [(alternative, RequirementsTuple, marker string)]
+    parsed_packages = OrderedDict()
+    for package, alternatives_strings in packages.items():
+        parsed_packages[package] = []
+        for alternatives_str in alternatives_strings:
+            parsed_alternatives = []
+            for alternative_string, marker in split_alternatives(alternatives_str):
+                if not alternative_string:
+                    continue
+                alt, i_b, u_b, i_a, u_a = parse_alternative(alternative_string)
+                requirements = RequirementsTuple(
+                    install_before=i_b, uninstall_before=u_b, install_after=i_a, uninstall_after=u_a
+                )
+                parsed_alternatives.append((alt, requirements, marker))
+            parsed_packages[package].append(parsed_alternatives)
+
+    uninstalled = {base_package_name(package) for package in uninstalled}
+    matrix = OrderedDict()
+    for target, environment in environments.items():
+        marker_results = {}
+        plan = OrderedDict()
+        for package, parsed_alternatives_list in parsed_packages.items():
+            alternatives_list = []
+            for parsed_alternatives in parsed_alternatives_list:
+                alternatives = OrderedDict()
+                for alt, requirements, marker in parsed_alternatives:
+                    if marker is not None:
+                        if marker not in marker_results:
+                            marker_results[marker] = parse_marker(marker).evaluate(environment)
+                        if not marker_results[marker]:
+                            continue
+                    alternatives[alt] = requirements
+                alternatives_list.append(alternatives)
+            if len(alternatives_list) == 1:
+                alternatives = alternatives_list[0]
+            else:
+                alternatives = merge_alternatives(package, alternatives_list)[0]
+            # an alternative in the uninstall lists would be removed right after being installed
+            installable = OrderedDict(
+                (alt, requirements)
+                for alt, requirements in alternatives.items()
+                if base_package_name(alt) not in uninstalled
+            )
+            plan[package] = installable if installable else alternatives
+        matrix[target] = plan
+    return matrix
@@ -0,0 +1,248 @@
+"""State of the python environment: fingerprint and invalidation of the caches that depend on it."""
+
+import hashlib
+import importlib.metadata as metadata
+import json
+import os
+import re
+import subprocess
+import sys
+from functools import lru_cache
+
+from packaging.requirements import InvalidRequirement, Requirement
+
+from .exceptions import ConfigurationError
+
+# functions clearing the caches that depend on the installed packages
+_cache_invalidators = []
+
+
+def register_cache_invalidator(function):
+    """
+    Register a function clearing a cache that depends on the installed packages.
+
+    :param function: a function without parameters
+    :return: the function, so that this can be used as a decorator
+    """
+    if function not in _cache_invalidators:
+        _cache_invalidators.append(function)
+    return function
+
+
+def invalidate_environment_caches():
+    """
+    Clear all the registered caches, e.g. after the environment was changed by another process.
+
+    :return: Nothing
+    """
+    for function in _cache_invalidators:
+        function()
+
+
+# script run in a target interpreter: prints its paths and marker environment as json
+_INTERPRETER_SCRIPT = '''
+import json, os, platform, sys
+
+def format_version(info):
+    version = f'{info.major}.{info.minor}.{info.micro}'
+    if info.releaselevel != 'final':
+        version += info.releaselevel[0] + str(info.serial)
+    return version
+
+print(json.dumps({
+    'executable': sys.executable,
+    'prefix': sys.prefix,
+    'version': sys.version,
+    'path': [path for path in sys.path if path],
+    'markers': {
+        'implementation_name': sys.implementation.name,
+        'implementation_version': format_version(sys.implementation.version),
+        'os_name': os.name,
+        'platform_machine': platform.machine(),
+        'platform_release': platform.release(),
+        'platform_system': platform.system(),
+        'platform_version': platform.version(),
+        'python_full_version': platform.python_version(),
+        'platform_python_implementation': platform.python_implementation(),
+        'python_version': '.'.join(platform.python_version_tuple()[:2]),
+        'sys_platform': sys.platform,
+    },
+}))
+'''
+
+
+def resolve_python_executable(target):
+    """
+    Find the python interpreter of a target environment.
+
+    :param target: the path of a python interpreter, or of an environment directory (a virtual environment or a conda
+        prefix). None means the current interpreter
+    :return: the path of the interpreter
+    """
+    if target is None:
+        return sys.executable
+    target = os.fspath(target)
+    if not os.path.isdir(target):
+        return target
+    for relative_path in (os.path.join('bin', 'python'), os.path.join('Scripts', 'python.exe'), 'python.exe'):
+        candidate = os.path.join(target, relative_path)
+        if os.path.isfile(candidate):
+            return candidate
+    raise ConfigurationError(f'No python interpreter found in {target}')
+
+
+def is_current_interpreter(python_executable):
+    """
+    Check if an interpreter is the one running flexidep.
+
+    :param python_executable: the path of an interpreter, or None for the current one
+    :return: True if it is the current interpreter
+    """
+    return python_executable is None or os.path.abspath(python_executable) == os.path.abspath(sys.executable)
+
+
+@lru_cache(maxsize=None)
+def interpreter_info(python_executable):
+    """
+    Get the paths and the marker environment of a python interpreter, running it once.
+
+    :param python_executable: the path of the interpreter
+    :return: a dictionary with the keys executable, prefix, version, path (its sys.path) and markers (its marker
+        environment, as packaging.markers.default_environment)
+    """
+    try:
+        process = subprocess.run(
+            [python_executable, '-c', _INTERPRETER_SCRIPT], capture_output=True, text=True, timeout=60, check=False
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ConfigurationError(f'Cannot run the python interpreter {python_executable}: {e}') from e
+    try:
+        return json.loads(process.stdout)
+    except ValueError:
+        raise ConfigurationError(
+            f'Cannot run the python interpreter {python_executable}: {process.stderr.strip()}'
+        ) from None
+
+
+def target_marker_environment(python_executable=None):
+    """
+    Get the marker environment of a python interpreter.
+
+    :param python_executable: the path of the interpreter. Default: the current one
+    :return: a dictionary of marker variables, or None for the current interpreter (the default of packaging)
+    """
+    if is_current_interpreter(python_executable):
+        return None
+    return interpreter_info(python_executable)['markers']
+
+
+def directory_state(path):
+    """
+    Get the state of a directory, which changes when entries are added or removed.
+
+    :param path: the path of the directory
+    :return: a tuple (modification time, inode), or None if the directory does not exist
+    """
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_ino
+
+
+def environment_fingerprint(python_executable=None, site_packages_only=False):
+    """
+    Compute a fingerprint of the installed packages of a python interpreter.
+
+    The fingerprint changes when a distribution is installed, upgraded or removed, because this changes the modification
+    time of the directories in sys.path (and of conda-meta in conda environments). Computing it only needs a stat of
+    each directory.
+
+    :param python_executable: the path of the interpreter. Default: the current one
+    :param site_packages_only: if True, only the site-packages directories of sys.path are considered, so that the
+        fingerprint does not change when files are created in the other ones (e.g. the directory of the script)
+    :return: a hexadecimal string
+    """
+    if is_current_interpreter(python_executable):
+        executable, version, prefix, paths = sys.executable, sys.version, sys.prefix, sys.path
+    else:
+        info = interpreter_info(python_executable)
+        executable, version, prefix, paths = info['executable'], info['version'], info['prefix'], info['path']
+    state = [executable, version, str(directory_state(os.path.join(prefix, 'conda-meta')))]
+    for path in paths:
+        if site_packages_only and os.path.basename(path) not in ('site-packages', 'dist-packages'):
+            continue
+        state.append(f'{path}:{directory_state(path or os.getcwd())}')
+    return hashlib.sha256('\n'.join(state).encode('utf-8')).hexdigest()
+
+
+def _canonical_name(name):
+    """Return the canonical name of a distribution."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def installed_distributions(python_executable=None):
+    """
+    Get the distributions installed in a python interpreter.
+
+    :param python_executable: the path of the interpreter. Default: the current one
+    :return: a dictionary (canonical name: Distribution). If a distribution is found more than once in sys.path, the
+        first one is returned, as the import system would do
+    """
+    if is_current_interpreter(python_executable):
+        found = metadata.distributions()
+    else:
+        found = metadata.distributions(path=interpreter_info(python_executable)['path'])
+    distributions = {}
+    for distribution in found:
+        name = distribution.metadata['Name']
+        if name:
+            distributions.setdefault(_canonical_name(name), distribution)
+    return distributions
+
+
+def distribution_requirements(distribution, environment=None):
+    """
+    Get the installed distributions required by a distribution, ignoring extras and requirements whose marker does
+    not apply to the environment.
+
+    :param distribution: a Distribution
+    :param environment: the marker environment. Default: the current one
+    :return: a list of canonical names
+    """
+    names = []
+    for requirement_string in distribution.requires or []:
+        try:
+            requirement = Requirement(requirement_string)
+        except InvalidRequirement:
+            continue
+        if requirement.marker is not None and not requirement.marker.evaluate({**(environment or {}), 'extra': ''}):
+            continue
+        names.append(_canonical_name(requirement.name))
+    return names
+
+
+def requirement_closure(names, distributions=None, environment=None):
+    """
+    Find the installed distributions needed by a set of distributions, following their requirements.
+
+    :param names: canonical names of distributions
+    :param distributions: the result of installed_distributions(), if already available
+    :param environment: the marker environment of the requirements. Default: the current one
+    :return: a set of canonical names of installed distributions, including the ones in names
+    """
+    if distributions is None:
+        distributions = installed_distributions()
+    closure = set()
+    stack = [name for name in names if name in distributions]
+    while stack:
+        name = stack.pop()
+        if name in closure:
+            continue
+        closure.add(name)
+        stack += [
+            required
+            for required in distribution_requirements(distributions[name], environment)
+            if required in distributions
+        ]
+    return closure
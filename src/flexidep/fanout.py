@@ -0,0 +1,157 @@
+"""Installation of one configuration in many python environments in parallel."""
+
+import io
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from .DependencyManager import DependencyManager
+from .environment import resolve_python_executable
+
+
+class EnvironmentResult(NamedTuple):
+    """The outcome of the installation in one environment."""
+
+    # the environment as given (interpreter or environment directory)
+    environment: str
+    python_executable: Optional[str]
+    success: bool
+    # the alternatives installed by this run (package: alternative)
+    installed: dict
+    error: Optional[str]
+    # the duration of the installation in seconds
+    duration: float
+
+
+def install_environment(
+    environment,
+    config_file=None,
+    config_string=None,
+    install_optional=False,
+    batch=False,
+    policy=None,
+    cache_dir=None,
+    status_callback=None,
+    **manager_options,
+):
+    """
+    Install the packages of a configuration automatically in one environment.
+
+    :param environment: the python interpreter of the environment, or its directory (virtual environment or conda
+        prefix)
+    :param config_file: the configuration file (a path)
+    :param config_string: the configuration, if config_file is not given
+    :param install_optional: if True, optional packages will be installed
+    :param batch: if True, the missing packages are first tried in a single transaction (see install_auto)
+    :param policy: the alternative policy. Default: the one of the configuration
+    :param cache_dir: the download cache directory of the package manager. Default: the one of the configuration, or
+        the default of the package manager
+    :param status_callback: optional function accepting the environment, a package name and a status string
+    :param manager_options: other arguments of DependencyManager, e.g. package_manager
+    :return: an EnvironmentResult
+    """
+    start_time = time.monotonic()
+    python_executable = None
+    try:
+        python_executable = resolve_python_executable(environment)
+        dm = DependencyManager(
+            config_file=config_file,
+            config_string=config_string,
+            interactive_initialization=False,
+            python_executable=python_executable,
+            **manager_options,
+        )
+        if cache_dir is not None:
+            dm.cache_dir = cache_dir
+        if status_callback is not None:
+            dm.status_callback = lambda package, status: status_callback(environment, package, status)
+        dm.install_auto(install_optional=install_optional, batch=batch, policy=policy)
+    except Exception as e:  # pylint: disable=broad-except
+        # one failing environment must not stop the others
+        return EnvironmentResult(
+            str(environment), python_executable, False, {}, f'{type(e).__name__}: {e}', time.monotonic() - start_time
+        )
+    return EnvironmentResult(
+        str(environment), python_executable, True, dict(dm.selected_alternatives), None, time.monotonic() - start_time
+    )
+
+
+def install_environments(
+    environments,
+    config_file=None,
+    config_string=None,
+    max_workers=None,
+    install_optional=False,
+    batch=False,
+    policy=None,
+    cache_dir=None,
+    status_callback=None,
+    **manager_options,
+):
+    """
+    Install the packages of a configuration automatically in several environments at the same time.
+
+    Each environment is handled by a worker of a bounded pool, driving the package manager of that environment. All
+    the installations use the same download cache, so each distribution is downloaded (or built) once: cache_dir, or
+    the default cache of the package manager, which is shared by the environments of the same user. Note that the
+    outputs of the package managers are interleaved on the console; use flexidep.installers.set_output_callback to
+    redirect them.
+
+    :param environments: a list of python interpreters or environment directories
+    :param config_file: the configuration file (a path or a file-like object)
+    :param config_string: the configuration, if config_file is not given
+    :param max_workers: the maximum number of environments installed at the same time. Default: the number of cores
+    :param install_optional: if True, optional packages will be installed
+    :param batch: if True, the missing packages are first tried in a single transaction (see install_auto)
+    :param policy: the alternative policy. Default: the one of the configuration
+    :param cache_dir: the shared download cache directory. Default: the one of the configuration, or the default of
+        the package manager
+    :param status_callback: optional function accepting the environment, a package name and a status string
+    :param manager_options: other arguments of DependencyManager, e.g. package_manager
+    :return: an OrderedDict (environment: EnvironmentResult), in the order of environments
+    """
+    if isinstance(config_file, io.IOBase):
+        # the configuration is read once, and parsed by each worker
+        config_string = config_file.read()
+        config_file = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    environments = list(environments)
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(
+                install_environment,
+                environment,
+                config_file,
+                config_string,
+                install_optional,
+                batch,
+                policy,
+                cache_dir,
+                status_callback,
+                **manager_options,
+            )
+            for environment in environments
+        ]
+        return OrderedDict((str(environment), future.result()) for environment, future in zip(environments, futures))
+
+
+def format_environment_report(results):
+    """
+    Format the results of install_environments as a text table.
+
+    :param results: the dictionary returned by install_environments
+    :return: a string
+    """
+    lines = [f'{"environment":50} {"result":>7} {"time":>8}  details']
+    for environment, result in results.items():
+        if result.success:
+            details = ', '.join(f'{package}: {alternative}' for package, alternative in result.installed.items())
+            details = f'installed {details}' if details else 'nothing to install'
+        else:
+            details = result.error
+        lines.append(f'{environment:50} {"ok" if result.success else "failed":>7} {result.duration:>6.1f} s  {details}')
+    return '\n'.join(lines)
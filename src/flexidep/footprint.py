@@ -0,0 +1,308 @@
+"""Download size of the alternatives for the platform of an interpreter, from the metadata of the package index."""
+
+import json
+import os
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.tags import compatible_tags, cpython_tags, platform_tags, sys_tags
+from packaging.utils import InvalidWheelFilename, canonicalize_name, parse_wheel_filename
+from packaging.version import InvalidVersion, Version
+
+from .config import CONFIG_DIR
+from .environment import interpreter_info, is_current_interpreter
+
+FOOTPRINT_CACHE_FILE = os.path.join(CONFIG_DIR, 'footprint_cache.json')
+FOOTPRINT_CACHE_SECONDS = 24 * 3600
+
+INDEX_JSON_URL = 'https://pypi.org/pypi/{name}/json'
+
+# timeout of the index requests in seconds
+INDEX_TIMEOUT = 5
+
+# lists the wheel tags of an interpreter, with its packaging or the one vendored by pip
+_TAGS_SCRIPT = '''
+import json
+try:
+    from packaging.tags import sys_tags
+except ImportError:
+    from pip._vendor.packaging.tags import sys_tags
+print(json.dumps([str(tag) for tag in sys_tags()]))
+'''
+
+# projects whose metadata could not be fetched in this session: they are not requested again until the next session
+_unreachable_projects = set()
+
+
+def _marker_tags(python_executable):
+    """Build the wheel tags of an interpreter from its marker environment, for the platforms of the current one."""
+    markers = interpreter_info(python_executable)['markers']
+    version = tuple(int(part) for part in markers['python_version'].split('.')[:2])
+    platforms = list(platform_tags())
+    if markers['implementation_name'] == 'cpython':
+        interpreter = f'cp{version[0]}{version[1]}'
+        tags = list(cpython_tags(version, [interpreter], platforms))
+    else:
+        interpreter = None
+        tags = []
+    return tags + list(compatible_tags(version, interpreter, platforms))
+
+
+@lru_cache(maxsize=None)
+def interpreter_tags(python_executable=None):
+    """
+    Get the wheel tags supported by an interpreter, from the most to the least specific.
+
+    For another interpreter, the tags are computed by running it. If it cannot import packaging, they are built from
+    its python version and implementation, for the platforms of the current interpreter.
+
+    :param python_executable: the path of the interpreter. Default: the current one
+    :return: a tuple of strings like cp311-cp311-manylinux_2_17_x86_64
+    """
+    if is_current_interpreter(python_executable):
+        return tuple(str(tag) for tag in sys_tags())
+    try:
+        process = subprocess.run(
+            [python_executable, '-c', _TAGS_SCRIPT], capture_output=True, text=True, timeout=60, check=False
+        )
+        return tuple(json.loads(process.stdout))
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        return tuple(str(tag) for tag in _marker_tags(python_executable))
+
+
+def _supported_tags(python_executable=None):
+    """Return the tags supported by an interpreter, with their priority (lower is better)."""
+    return {tag: priority for priority, tag in enumerate(interpreter_tags(python_executable))}
+
+
+def _platform_key(python_executable=None):
+    """Return the most specific tag of an interpreter, identifying the platform in the cache."""
+    return interpreter_tags(python_executable)[0]
+
+
+def _load_cache():
+    """Load the footprint cache, without the expired entries."""
+    try:
+        with open(FOOTPRINT_CACHE_FILE, encoding='utf-8') as fd:
+            cache = json.load(fd)
+    except (OSError, ValueError):
+        return {}
+    now = time.time()
+    return {key: entry for key, entry in cache.items() if now - entry['time'] < FOOTPRINT_CACHE_SECONDS}
+
+
+def _save_cache(cache):
+    """Save the footprint cache."""
+    temp_file = f'{FOOTPRINT_CACHE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_file, 'w', encoding='utf-8') as fd:
+            json.dump(cache, fd)
+        os.replace(temp_file, FOOTPRINT_CACHE_FILE)
+    except OSError as e:
+        print(f'Warning: cannot save the footprint cache: {e}')
+
+
+def clear_footprint_cache():
+    """
+    Delete the cached download sizes, and forget the projects that could not be fetched in this session.
+
+    :return: Nothing
+    """
+    _unreachable_projects.clear()
+    try:
+        os.remove(FOOTPRINT_CACHE_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def _fetch_project(name):
+    """
+    Get the metadata of a project from the index.
+
+    :param name: the project name
+    :return: the decoded json, or None if the project does not exist. Raises OSError if the index cannot be reached
+    """
+    try:
+        with urllib.request.urlopen(INDEX_JSON_URL.format(name=name), timeout=INDEX_TIMEOUT) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    except ValueError as e:
+        raise OSError(f'Invalid answer from the index for {name}') from e
+
+
+def select_distribution_file(project_data, requirement, python_executable=None):
+    """
+    Choose the file that pip would download for a requirement on the platform of an interpreter.
+
+    The latest version matching the requirement with a compatible wheel (or a source distribution) is chosen. Among
+    the compatible wheels, the one with the most specific tag is chosen.
+
+    :param project_data: the json metadata of the project
+    :param requirement: a Requirement object
+    :param python_executable: the interpreter installing the requirement. Default: the current one
+    :return: a dictionary with the keys version, filename, size and packagetype, or None if no file is compatible
+    """
+    supported_tags = _supported_tags(python_executable)
+    versions = []
+    for version_string in project_data.get('releases', {}):
+        try:
+            version = Version(version_string)
+        except InvalidVersion:
+            continue
+        if requirement.specifier.contains(version):
+            versions.append((version, version_string))
+
+    for _, version_string in sorted(versions, reverse=True):
+        best_wheel = None
+        best_priority = None
+        source_distribution = None
+        for file_info in project_data['releases'][version_string]:
+            if file_info.get('yanked'):
+                continue
+            if file_info.get('packagetype') == 'sdist':
+                source_distribution = file_info
+                continue
+            if file_info.get('packagetype') != 'bdist_wheel':
+                continue
+            try:
+                tags = parse_wheel_filename(file_info['filename'])[3]
+            except InvalidWheelFilename:
+                continue
+            priorities = [supported_tags[str(tag)] for tag in tags if str(tag) in supported_tags]
+            if priorities and (best_priority is None or min(priorities) < best_priority):
+                best_wheel = file_info
+                best_priority = min(priorities)
+        selected = best_wheel or source_distribution
+        if selected is not None:
+            return {
+                'version': version_string,
+                'filename': selected['filename'],
+                'size': selected.get('size'),
+                'packagetype': selected['packagetype'],
+            }
+    return None
+
+
+def requirement_footprint(requirement_string, cache, python_executable=None):
+    """
+    Get the file that would be downloaded for a requirement on the platform of an interpreter.
+
+    :param requirement_string: the requirement, e.g. tensorflow>=2.10
+    :param cache: the footprint cache, updated with the result
+    :param python_executable: the interpreter installing the requirement. Default: the current one
+    :return: a dictionary as returned by select_distribution_file, or None if it cannot be determined
+    """
+    try:
+        requirement = Requirement(requirement_string)
+    except InvalidRequirement:
+        # e.g. a path or a vcs url
+        return None
+    if requirement.url:
+        return None
+
+    key = f'{requirement_string}|{_platform_key(python_executable)}'
+    if key in cache:
+        return cache[key]['result']
+    project = canonicalize_name(requirement.name)
+    if project in _unreachable_projects:
+        return None
+    try:
+        project_data = _fetch_project(requirement.name)
+    except OSError:
+        # not in the persistent cache, as the index may be reachable in the next session
+        _unreachable_projects.add(project)
+        return None
+    result = None
+    if project_data is not None:
+        result = select_distribution_file(project_data, requirement, python_executable)
+    cache[key] = {'time': time.time(), 'result': result}
+    return result
+
+
+def alternatives_footprint(alternatives, max_workers=None, python_executable=None):
+    """
+    Get the download size of the alternatives of a package on the platform of an interpreter.
+
+    The size of an alternative is the size of the files of the alternative and of its extra packages to install.
+    Their dependencies are not counted. The index is queried in parallel, and the answers are cached for a day. The
+    projects that cannot be fetched are not requested again in the same session.
+
+    :param alternatives: a dictionary (alternative: dependencies) as returned by process_alternatives
+    :param max_workers: the maximum number of parallel requests
+    :param python_executable: the interpreter installing the alternatives. Default: the current one
+    :return: a dictionary (alternative: size in bytes, or None if the size of the alternative itself is unknown)
+    """
+    if is_current_interpreter(python_executable):
+        python_executable = None
+    cache = _load_cache()
+    requirements = list(
+        dict.fromkeys(
+            requirement
+            for alternative, dependencies in alternatives.items()
+            for requirement in dependencies.install_before + [alternative] + dependencies.install_after
+        )
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        footprints = dict(
+            zip(
+                requirements,
+                executor.map(
+                    lambda requirement: requirement_footprint(requirement, cache, python_executable), requirements
+                ),
+            )
+        )
+    _save_cache(cache)
+
+    sizes = {}
+    for alternative, dependencies in alternatives.items():
+        if footprints[alternative] is None or footprints[alternative]['size'] is None:
+            sizes[alternative] = None
+            continue
+        sizes[alternative] = sum(
+            footprints[requirement]['size']
+            for requirement in dependencies.install_before + [alternative] + dependencies.install_after
+            if footprints[requirement] is not None and footprints[requirement]['size'] is not None
+        )
+    return sizes
+
+
+def order_alternatives_by_footprint(alternatives, sizes=None, python_executable=None):
+    """
+    Order the alternatives of a package from the smallest to the largest download.
+
+    Alternatives with an unknown size come last, in their original order.
+
+    :param alternatives: a dictionary (alternative: dependencies)
+    :param sizes: the result of alternatives_footprint, if already available
+    :param python_executable: the interpreter installing the alternatives. Default: the current one
+    :return: an OrderedDict with the same content as alternatives
+    """
+    if sizes is None:
+        sizes = alternatives_footprint(alternatives, python_executable=python_executable)
+    known = sorted((alternative for alternative in alternatives if sizes.get(alternative) is not None), key=sizes.get)
+    unknown = [alternative for alternative in alternatives if sizes.get(alternative) is None]
+    return OrderedDict((alternative, alternatives[alternative]) for alternative in known + unknown)
+
+
+def format_size(size):
+    """
+    Format a size in bytes for display.
+
+    :param size: the size in bytes
+    :return: a string like 512 kB or 1.2 GB
+    """
+    for unit in ('B', 'kB', 'MB'):
+        if size < 1000:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1000
+    return f'{size:.1f} GB'
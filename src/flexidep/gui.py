@@ -16,12 +16,17 @@ if sys.platform == 'win32':
         os.environ['TCL_LIBRARY'] = os.path.join(base, 'tcl', tcl_version)
         os.environ['TK_LIBRARY'] = os.path.join(base, 'tcl', tk_version)
 
+import queue
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
 from tkinter import messagebox, ttk
 
-from .config import DONT_INSTALL_TEXT, PackageManagers
+from .config import DONT_INSTALL_TEXT
 from .core import get_package_managers_list
 from .exceptions import OperationCanceledError
+from .installers import cancel_running_commands, reset_cancel, resolve_package_manager, set_output_callback
 
 
 def center_window(window):
@@ -46,6 +51,268 @@ def center_window(window):
     window.wm_attributes('-alpha', 1)  # show window
 
 
+class GuiSession:
+    """
+    A persistent tk session for a whole installation run.
+
+    The installation runs in a worker thread, while the main thread runs a single mainloop showing the progress of the
+    installation. Dialogs requested by the worker are shown on the same root and their results are passed back to the
+    worker.
+    """
+
+    active = None
+    POLL_INTERVAL_MS = 100
+    LOG_TAIL_LINES = 500
+
+    def __init__(self):
+        """Initialize a GuiSession instance."""
+        self.root = tk.Tk()
+        self.root.title('Installing dependencies')
+        self.events = queue.Queue()
+        self.worker = None
+        self.worker_exception = None
+        self.finished = False
+        self.canceled = False
+        self.start_time = None
+        self.package_rows = {}
+        self.package_start_times = {}
+        self.package_end_times = {}
+        self.log_lines = deque(maxlen=self.LOG_TAIL_LINES)
+        self.body()
+        self.root.protocol('WM_DELETE_WINDOW', self.cancel_pressed)
+
+    def body(self):
+        """Populate the progress window."""
+        parent = ttk.Frame(self.root)
+        parent.pack(fill='both', expand=True, padx=(10, 10), pady=(10, 10))
+
+        self.package_tree = ttk.Treeview(parent, columns=('status', 'elapsed'), height=8)
+        self.package_tree.heading('#0', text='Package')
+        self.package_tree.heading('status', text='Status')
+        self.package_tree.heading('elapsed', text='Elapsed')
+        self.package_tree.column('elapsed', width=80, anchor='e')
+        self.package_tree.pack(fill='x')
+
+        self.elapsed_label = ttk.Label(parent, text='Elapsed: 0s')
+        self.elapsed_label.pack(anchor='w', pady=(5, 5))
+
+        log_frame = ttk.Frame(parent)
+        self.log_text = tk.Text(log_frame, height=12, width=100, state='disabled', wrap='none')
+        log_scrollbar = ttk.Scrollbar(log_frame, command=self.log_text.yview)
+        self.log_text.configure(yscrollcommand=log_scrollbar.set)
+        self.log_text.pack(side='left', fill='both', expand=True)
+        log_scrollbar.pack(side='right', fill='y')
+        log_frame.pack(fill='both', expand=True)
+
+        self.cancel_button = ttk.Button(parent, text='Cancel', command=self.cancel_pressed)
+        self.cancel_button.pack(pady=(10, 0))
+
+    def run(self, function, *args):
+        """
+        Run a function in a worker thread while showing the progress window.
+
+        :param function: the function to run
+        :param args: the arguments of the function
+        :return: the return value of the function
+        """
+        result = []
+
+        def work():
+            try:
+                result.append(function(*args))
+            except BaseException as e:  # pylint: disable=broad-except
+                self.worker_exception = e
+            self.events.put(('finished',))
+
+        GuiSession.active = self
+        set_output_callback(self.append_log)
+        self.start_time = time.monotonic()
+        self.worker = threading.Thread(target=work, daemon=True)
+        self.worker.start()
+        self.root.after(self.POLL_INTERVAL_MS, self.poll)
+        center_window(self.root)
+        try:
+            self.root.mainloop()
+        finally:
+            GuiSession.active = None
+            set_output_callback(None)
+            if self.worker.is_alive():
+                # the window was closed before the worker finished
+                cancel_running_commands()
+                self.worker.join()
+            reset_cancel()
+
+        if self.worker_exception is not None:
+            raise self.worker_exception
+        if self.canceled:
+            raise OperationCanceledError()
+        return result[0]
+
+    def call(self, function, *args):
+        """
+        Run a function in the GUI thread and wait for its result. To be called from the worker thread.
+
+        :param function: the function to call. It receives the root window as first argument
+        :param args: the other arguments of the function
+        :return: the return value of the function
+        """
+        done = threading.Event()
+        outcome = {}
+        self.events.put(('call', function, args, outcome, done))
+        done.wait()
+        if 'exception' in outcome:
+            raise outcome['exception']
+        return outcome['result']
+
+    def set_package_status(self, package, status):
+        """
+        Update the status of a package. Can be called from any thread.
+
+        :param package: the package name
+        :param status: the new status
+        :return: Nothing
+        """
+        self.events.put(('status', package, status, time.monotonic()))
+
+    def append_log(self, line):
+        """
+        Append a line to the log. Can be called from any thread.
+
+        :param line: the line to append
+        :return: Nothing
+        """
+        self.events.put(('log', line))
+
+    def poll(self):
+        """Process the events sent by the worker thread."""
+        log_changed = False
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'status':
+                self.show_package_status(*event[1:])
+            elif event[0] == 'log':
+                self.log_lines.append(event[1])
+                log_changed = True
+            elif event[0] == 'call':
+                function, args, outcome, done = event[1:]
+                try:
+                    outcome['result'] = function(self.root, *args)
+                except Exception as e:  # pylint: disable=broad-except
+                    outcome['exception'] = e
+                done.set()
+            elif event[0] == 'finished':
+                self.worker_finished()
+
+        if log_changed:
+            self.show_log()
+        self.update_elapsed()
+
+        if not self.finished:
+            self.root.after(self.POLL_INTERVAL_MS, self.poll)
+
+    def show_package_status(self, package, status, timestamp):
+        """Show the status of a package in the package list."""
+        if status.startswith('installing') or status.startswith('uninstalling'):
+            self.package_start_times.setdefault(package, timestamp)
+            self.package_end_times.pop(package, None)
+        elif package in self.package_start_times:
+            self.package_end_times[package] = timestamp
+
+        if package not in self.package_rows:
+            self.package_rows[package] = self.package_tree.insert('', 'end', text=package, values=(status, ''))
+        else:
+            self.package_tree.set(self.package_rows[package], 'status', status)
+        self.package_tree.see(self.package_rows[package])
+
+    def show_log(self):
+        """Show the tail of the log."""
+        self.log_text.configure(state='normal')
+        self.log_text.delete('1.0', 'end')
+        self.log_text.insert('end', '\n'.join(self.log_lines))
+        self.log_text.see('end')
+        self.log_text.configure(state='disabled')
+
+    def update_elapsed(self):
+        """Update the elapsed times."""
+        now = time.monotonic()
+        self.elapsed_label.configure(text=f'Elapsed: {format_elapsed(now - self.start_time)}')
+        for package, start_time in self.package_start_times.items():
+            end_time = self.package_end_times.get(package, now)
+            self.package_tree.set(self.package_rows[package], 'elapsed', format_elapsed(end_time - start_time))
+
+    def worker_finished(self):
+        """Close the window, or keep it open to show the log if the installation failed."""
+        self.finished = True
+        if self.canceled or self.worker_exception is None or isinstance(self.worker_exception, OperationCanceledError):
+            self.root.destroy()
+            return
+        self.log_lines.append(f'Error: {self.worker_exception}')
+        self.show_log()
+        self.cancel_button.configure(text='Close', command=self.root.destroy)
+        self.root.protocol('WM_DELETE_WINDOW', self.root.destroy)
+
+    def cancel_pressed(self):
+        """Callback-function called for the <Cancel> button."""
+        if self.finished:
+            self.root.destroy()
+            return
+        self.canceled = True
+        self.cancel_button.configure(text='Canceling...', state='disabled')
+        cancel_running_commands()
+
+
+def format_elapsed(seconds):
+    """
+    Format a time interval for display.
+
+    :param seconds: the interval in seconds
+    :return: a string like 1m 05s
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes:
+        return f'{minutes}m {seconds:02d}s'
+    return f'{seconds}s'
+
+
+def _show_dialog_in_session(root, dialog_class, *args):
+    """
+    Show a dialog in a new window of an existing root, and wait for it to be closed.
+
+    :param root: the root window
+    :param dialog_class: the class of the dialog
+    :param args: the arguments of the dialog
+    :return: the dialog instance
+    """
+    window = tk.Toplevel(root)
+    window.transient(root)
+    dialog = dialog_class(window, *args)
+    center_window(window)
+    window.grab_set()
+    root.wait_window(window)
+    return dialog
+
+
+def show_dialog(dialog_class, *args):
+    """
+    Show a dialog, reusing the root of the active session if there is one.
+
+    :param dialog_class: the class of the dialog
+    :param args: the arguments of the dialog
+    :return: the dialog instance
+    """
+    if GuiSession.active is not None:
+        return GuiSession.active.call(_show_dialog_in_session, dialog_class, *args)
+
+    root = tk.Tk()
+    dialog = dialog_class(root, *args)
+    center_window(root)
+    root.mainloop()
+    return dialog
+
+
 class InitDialog:
     """GUI dialog class for YES/NO choices."""
 
@@ -99,7 +366,7 @@ class InitDialog:
 
     def ok_pressed(self):
         """Callback-function called for the <OK> button."""
-        self.package_manager = PackageManagers[self.package_manager_box.get().lower()]
+        self.package_manager = resolve_package_manager(self.package_manager_box.get())
         self.local_install = self.li_check.instate(['selected'])
         self.extra_command_line = self.extra_command_line_entry.get()
 
@@ -132,10 +399,7 @@ def interactive_initialize(default_package_manager, default_install_local, defau
     :param default_extra_command_line: the default extra command line
     :return: the package manager, the install local flag, and the extra command line
     """
-    root = tk.Tk()
-    dialog = InitDialog(root, default_package_manager, default_install_local, default_extra_command_line)
-    center_window(root)
-    root.mainloop()
+    dialog = show_dialog(InitDialog, default_package_manager, default_install_local, default_extra_command_line)
     if not dialog.ok:
         raise OperationCanceledError()
     return dialog.package_manager, dialog.local_install, dialog.extra_command_line
@@ -144,10 +408,12 @@ def interactive_initialize(default_package_manager, default_install_local, defau
 class SelectAlternativeDialog:
     """GUI dialog class for a list of alternative choices."""
 
-    def __init__(self, app, package_name, source_alternatives, optional=False):
+    def __init__(self, app, package_name, source_alternatives, optional=False, descriptions=None):
         """Initialize a SelectAlternativeDialog instance."""
         self.package_name = package_name
         self.source_alternatives = source_alternatives
+        descriptions = descriptions or {}
+        self.labels = [f'{x} ({descriptions[x]})' if x in descriptions else x for x in source_alternatives]
         self.app = app
         self.optional = optional
         self.parent = ttk.Frame(app)
@@ -169,14 +435,14 @@ class SelectAlternativeDialog:
         frame = ttk.Frame(self.parent)
         alt_label = ttk.Label(frame, text='Package:')
         alt_label.pack(side='left', padx=(10, 10))
-        self.alternative_box = ttk.Combobox(frame, values=self.source_alternatives, state='readonly')
-        self.alternative_box.set(self.source_alternatives[0])
+        self.alternative_box = ttk.Combobox(frame, values=self.labels, state='readonly')
+        self.alternative_box.current(0)
         self.alternative_box.pack(side='right', fill='x', expand=True)
         frame.pack(fill='x', expand=True, padx=(10, 10), pady=(10, 0))
 
     def ok_pressed(self):
         """Callback-function called for the <OK> button."""
-        self.alternative = self.alternative_box.get()
+        self.alternative = self.source_alternatives[self.alternative_box.current()]
         self.ok = True
         self.app.destroy()
 
@@ -197,13 +463,14 @@ class SelectAlternativeDialog:
         self.app.bind('<Escape>', lambda event: self.cancel_pressed())
 
 
-def select_package_alternative(package_name, source_alternatives, optional=False):
+def select_package_alternative(package_name, source_alternatives, optional=False, descriptions=None):
     """
     Show the select alternative interface.
 
     :param package_name: the package name
     :param source_alternatives: the source alternatives
     :param optional: if the selection is optional
+    :param descriptions: optional dictionary (alternative: description) shown next to the alternatives
     :return: the selected alternative
     """
     if len(source_alternatives) == 1 and not optional:
@@ -214,10 +481,7 @@ def select_package_alternative(package_name, source_alternatives, optional=False
     else:
         display_alternatives = source_alternatives
 
-    root = tk.Tk()
-    dialog = SelectAlternativeDialog(root, package_name, display_alternatives, optional)
-    center_window(root)
-    root.mainloop()
+    dialog = show_dialog(SelectAlternativeDialog, package_name, display_alternatives, optional, descriptions)
     if not dialog.ok:
         raise OperationCanceledError()
     if optional and dialog.alternative == DONT_INSTALL_TEXT:
@@ -243,8 +507,14 @@ def notify_uninstall(package):
     :param package: the package name
     :return: True if the user accepts, False otherwise
     """
-    with tk_context_manager() as root:
-        root.withdraw()
+    def ask(root):
         return messagebox.askyesno(
-            'Uninstall package', f'Uninstall {package} (Note: answering no will abort the execution)?'
+            'Uninstall package', f'Uninstall {package} (Note: answering no will abort the execution)?', parent=root
         )
+
+    if GuiSession.active is not None:
+        return GuiSession.active.call(ask)
+
+    with tk_context_manager() as root:
+        root.withdraw()
+        return ask(root)
@@ -0,0 +1,180 @@
+"""Local history of the installations, used to order alternatives by their expected cost."""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+from collections import OrderedDict
+
+from .config import CONFIG_DIR
+from .environment import target_marker_environment
+
+HISTORY_FILE = os.path.join(CONFIG_DIR, 'install_history.json')
+
+# number of durations kept for each alternative
+MAX_DURATIONS = 20
+
+# serializes the updates of the history by the threads of the process, e.g. when installing several environments
+_history_lock = threading.Lock()
+
+
+def platform_key(python_executable=None):
+    """
+    Get the key identifying the platform of an interpreter in the history.
+
+    :param python_executable: the interpreter of the managed environment. Default: the current one
+    :return: a string like linux-x86_64-py3.11
+    """
+    markers = target_marker_environment(python_executable)
+    if markers is None:
+        return f'{sys.platform}-{platform.machine()}-py{sys.version_info.major}.{sys.version_info.minor}'
+    return f'{markers["sys_platform"]}-{markers["platform_machine"]}-py{markers["python_version"]}'
+
+
+def load_history():
+    """
+    Load the installation history.
+
+    :return: a dictionary (platform key: {package: {alternative: record}})
+    """
+    try:
+        with open(HISTORY_FILE, encoding='utf-8') as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_history(history):
+    """
+    Save the installation history.
+
+    :param history: the history dictionary
+    :return: Nothing
+    """
+    temp_file = f'{HISTORY_FILE}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as fd:
+        json.dump(history, fd)
+    os.replace(temp_file, HISTORY_FILE)
+
+
+def clear_history():
+    """
+    Delete the installation history.
+
+    :return: Nothing
+    """
+    try:
+        os.remove(HISTORY_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def record_install_outcome(package, alternative, success, duration, python_executable=None):
+    """
+    Record the outcome of the installation of an alternative.
+
+    :param package: the package (module) name
+    :param alternative: the installed alternative
+    :param success: whether the installation succeeded
+    :param duration: the duration of the installation in seconds
+    :param python_executable: the interpreter of the managed environment. Default: the current one
+    :return: Nothing
+    """
+    key = platform_key(python_executable)
+    with _history_lock:
+        history = load_history()
+        record = history.setdefault(key, {}).setdefault(package, {}).setdefault(
+            alternative, {'attempts': 0, 'successes': 0, 'durations': []}
+        )
+        record['attempts'] += 1
+        if success:
+            record['successes'] += 1
+            record['durations'] = (record['durations'] + [round(duration, 3)])[-MAX_DURATIONS:]
+        save_history(history)
+
+
+def _record_stats(record):
+    """Compute the statistics of a history record."""
+    attempts = record['attempts']
+    successes = record['successes']
+    return {
+        'attempts': attempts,
+        'successes': successes,
+        'success_rate': successes / attempts if attempts else None,
+        'median_duration': statistics.median(record['durations']) if record['durations'] else None,
+    }
+
+
+def expected_cost(package, alternative, history=None, python_executable=None):
+    """
+    Compute the expected cost of installing an alternative on the platform of an interpreter.
+
+    The cost is the median duration of the successful installations divided by the success rate, i.e. the expected
+    time spent until the alternative is installed. Alternatives that never succeeded have an infinite cost.
+
+    :param package: the package (module) name
+    :param alternative: the alternative
+    :param history: the history dictionary. Default: the saved history
+    :param python_executable: the interpreter of the managed environment. Default: the current one
+    :return: the cost in seconds, or None if the alternative was never installed on this platform
+    """
+    if history is None:
+        history = load_history()
+    record = history.get(platform_key(python_executable), {}).get(package, {}).get(alternative)
+    if record is None or not record['attempts']:
+        return None
+    stats = _record_stats(record)
+    if not stats['successes']:
+        return float('inf')
+    return stats['median_duration'] / stats['success_rate']
+
+
+def order_alternatives_by_cost(package, alternatives, history=None, python_executable=None):
+    """
+    Order the alternatives of a package by their expected cost.
+
+    Alternatives that were already installed successfully on this platform come first, from the cheapest to the most
+    expensive. The ones that were never tried follow in their original order, and the ones that always failed come
+    last.
+
+    :param package: the package (module) name
+    :param alternatives: a dictionary (alternative: dependencies)
+    :param history: the history dictionary. Default: the saved history
+    :param python_executable: the interpreter of the managed environment. Default: the current one
+    :return: an OrderedDict with the same content as alternatives
+    """
+    if history is None:
+        history = load_history()
+    costs = {
+        alternative: expected_cost(package, alternative, history, python_executable) for alternative in alternatives
+    }
+    succeeded = sorted(
+        (alternative for alternative in alternatives if costs[alternative] not in (None, float('inf'))), key=costs.get
+    )
+    unknown = [alternative for alternative in alternatives if costs[alternative] is None]
+    failed = [alternative for alternative in alternatives if costs[alternative] == float('inf')]
+    return OrderedDict((alternative, alternatives[alternative]) for alternative in succeeded + unknown + failed)
+
+
+def install_history_report(all_platforms=False):
+    """
+    Get the statistics of the recorded installations.
+
+    :param all_platforms: if True, the statistics of all the platforms are returned, otherwise only the current one
+    :return: a list of dictionaries with the keys platform, package, alternative, attempts, successes, success_rate,
+        median_duration, sorted by platform, package and alternative
+    """
+    history = load_history()
+    current_platform = platform_key()
+    report = []
+    for key in sorted(history):
+        if not all_platforms and key != current_platform:
+            continue
+        for package in sorted(history[key]):
+            for alternative in sorted(history[key][package]):
+                row = {'platform': key, 'package': package, 'alternative': alternative}
+                row.update(_record_stats(history[key][package][alternative]))
+                report.append(row)
+    return report
@@ -1,14 +1,151 @@
 """Installers handling functions."""
 
+import importlib.metadata as metadata
+import json
+import os
 import shlex
+import shutil
 import subprocess
 import sys
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple
 
+from .conda_state import conda_requirement_satisfied, parse_conda_spec, read_conda_packages
 from .config import PackageManagers
+from .exceptions import OperationCanceledError, SetupFailedError
 
+_output_callback = None
+_running_processes = set()
+_running_processes_lock = threading.Lock()
+_cancel_requested = threading.Event()
 
-def install_package_with_deps(package_manager, package, dependencies, install_local, extra_command_line):
+
+def set_output_callback(callback):
+    """
+    Set a function receiving the output of the package managers line by line.
+
+    If no callback is set, the output of the package managers is shown on the console as usual.
+
+    :param callback: a function accepting a string, or None to restore the console output
+    :return: Nothing
+    """
+    global _output_callback  # pylint: disable=global-statement
+    _output_callback = callback
+
+
+def cancel_running_commands():
+    """
+    Abort the package manager processes that are currently running.
+
+    Every running command, and any command started before reset_cancel() is called, raises OperationCanceledError.
+
+    :return: Nothing
+    """
+    _cancel_requested.set()
+    with _running_processes_lock:
+        for process in _running_processes:
+            if process.poll() is None:
+                process.terminate()
+
+
+def reset_cancel():
+    """
+    Allow commands to be run again after cancel_running_commands() was called.
+
+    :return: Nothing
+    """
+    _cancel_requested.clear()
+
+
+def _start_process(command_list, **kwargs):
+    """
+    Start a package manager process, so that it can be canceled.
+
+    :param command_list: the command to run, as a list of strings
+    :param kwargs: extra arguments to Popen
+    :return: the Popen object
+    """
+    if _cancel_requested.is_set():
+        raise OperationCanceledError()
+    process = subprocess.Popen(command_list, **kwargs)  # pylint: disable=consider-using-with
+    with _running_processes_lock:
+        _running_processes.add(process)
+    return process
+
+
+def _finish_process(process):
+    """
+    Unregister a package manager process, and check if it was canceled.
+
+    :param process: the Popen object
+    :return: Nothing
+    """
+    with _running_processes_lock:
+        _running_processes.discard(process)
+    if _cancel_requested.is_set():
+        raise OperationCanceledError()
+
+
+def run_command(command_list):
+    """
+    Run a package manager command.
+
+    :param command_list: the command to run, as a list of strings
+    :return: True if the command succeeded, False otherwise
+    """
+    if _output_callback is None:
+        process = _start_process(command_list)
+    else:
+        process = _start_process(
+            command_list, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace'
+        )
+
+    try:
+        if process.stdout is not None:
+            for line in process.stdout:
+                _output_callback(line.rstrip('\n'))
+        return_code = process.wait()
+    finally:
+        _finish_process(process)
+
+    return return_code == 0
+
+
+def run_command_output(command_list, merge_stderr=False):
+    """
+    Run a package manager command and capture its standard output.
+
+    :param command_list: the command to run, as a list of strings
+    :param merge_stderr: if True, the standard error is captured together with the standard output
+    :return: the standard output of the command if it succeeded, None otherwise
+    """
+    if merge_stderr:
+        stderr = subprocess.STDOUT
+    elif _output_callback is not None:
+        stderr = subprocess.PIPE
+    else:
+        stderr = None
+    process = _start_process(command_list, stdout=subprocess.PIPE, stderr=stderr, text=True, errors='replace')
+    try:
+        output, error_output = process.communicate()
+    finally:
+        _finish_process(process)
+
+    if error_output and _output_callback is not None:
+        for line in error_output.splitlines():
+            _output_callback(line)
+
+    if process.returncode != 0:
+        return None
+    return output
+
+
+def install_package_with_deps(
+    package_manager, package, dependencies, install_local, extra_command_line, python_executable=None
+):
     """
     Install a package and its dependencies using the specified package manager.
 
@@ -17,31 +154,667 @@ def install_package_with_deps(package_manager, package, dependencies, install_lo
     :param dependencies: the dependencies to install. A NamedTuple as in core.py
     :param install_local: whether to install locally
     :param extra_command_line: extra command line parameters
+    :param python_executable: the python interpreter of the environment to manage. Default: the current one
     :return: True if success
     """
     for uninstall_before in dependencies.uninstall_before:
-        if not uninstall_package(package_manager, uninstall_before):
+        if not uninstall_package(package_manager, uninstall_before, python_executable):
             return False
 
     for install_before in dependencies.install_before:
-        if not install_package(package_manager, install_before, install_local, extra_command_line):
+        if not install_package(package_manager, install_before, install_local, extra_command_line, python_executable):
             return False
 
-    if not install_package(package_manager, package, install_local, extra_command_line):
+    if not install_package(package_manager, package, install_local, extra_command_line, python_executable):
         return False
 
     for install_after in dependencies.install_after:
-        if not install_package(package_manager, install_after, install_local, extra_command_line):
+        if not install_package(package_manager, install_after, install_local, extra_command_line, python_executable):
             return False
 
     for uninstall_after in dependencies.uninstall_after:
-        if not uninstall_package(package_manager, uninstall_after):
+        if not uninstall_package(package_manager, uninstall_after, python_executable):
             return False
 
     return True
 
 
-def install_package(package_manager, package, install_local=False, extra_command_line=''):
+class InstallerBackend:
+    """
+    Base class of the package manager backends.
+
+    A backend builds the command lines of a package manager, and knows how to query its state. Packages are always
+    given as a list, so that several packages can be handled in a single transaction.
+    """
+
+    # names that can be used in the configuration file in place of the package manager name
+    aliases = ()
+    # whether the backend supports installing in the user directory
+    supports_local_install = False
+    # whether the backend can install from a requirements file, needed by lock files
+    supports_requirements_file = False
+    # whether the backend can build wheels and install from a wheelhouse directory
+    supports_wheelhouse = False
+    # whether the backend accepts a constraints file
+    supports_constraints = False
+    # whether the packages are downloaded from a python package index, whose metadata gives their download size
+    uses_python_index = False
+    # whether the download cache directory can be chosen on the command line
+    supports_cache_dir = False
+    # whether the installations can skip the bytecode compilation, so that it can be deferred
+    supports_no_compile = False
+
+    def __init__(self, python_executable=None):
+        """
+        Initialize the backend.
+
+        :param python_executable: the python interpreter of the environment to manage. Default: the current one
+        """
+        self.python_executable = python_executable or sys.executable
+
+    def is_available(self):
+        """
+        Check if the package manager can be used.
+
+        :return: True if the package manager is available
+        """
+        return True
+
+    def install_command(self, packages, install_local=False, extra_command_line=''):
+        """
+        Build the command to install packages.
+
+        :param packages: list of packages to install
+        :param install_local: whether to install locally
+        :param extra_command_line: extra command line parameters
+        :return: the command as a list of strings
+        """
+        raise NotImplementedError
+
+    def uninstall_command(self, packages):
+        """
+        Build the command to uninstall packages.
+
+        :param packages: list of packages to uninstall
+        :return: the command as a list of strings
+        """
+        raise NotImplementedError
+
+    def requirement_satisfied(self, package):
+        """
+        Check, without running the package manager, if a package requirement is already satisfied.
+
+        :param package: the package requirement
+        :return: True or False, or None if it cannot be determined cheaply
+        """
+        return None
+
+    def is_installed(self, package):
+        """
+        Check, without running the package manager, if a package is installed.
+
+        :param package: the package name
+        :return: True or False, or None if it cannot be determined cheaply
+        """
+        return None
+
+    def plan_install(self, packages, extra_command_line=''):
+        """
+        Get the packages that actually need to be installed.
+
+        :param packages: list of packages to install
+        :param extra_command_line: extra command line parameters
+        :return: the packages whose requirement is not known to be satisfied already
+        """
+        if '--force-reinstall' in extra_command_line:
+            return list(packages)
+        return [package for package in packages if not self.requirement_satisfied(package)]
+
+    def install(self, packages, install_local=False, extra_command_line=''):
+        """
+        Install packages in a single transaction.
+
+        :param packages: list of packages to install
+        :param install_local: whether to install locally
+        :param extra_command_line: extra command line parameters
+        :return: True if success
+        """
+        packages = self.plan_install(packages, extra_command_line)
+        if not packages:
+            return True
+        return run_command(self.install_command(packages, install_local, extra_command_line))
+
+    def uninstall(self, packages):
+        """
+        Uninstall packages in a single transaction.
+
+        :param packages: list of packages to uninstall
+        :return: True if success
+        """
+        packages = [package for package in packages if self.is_installed(package) is not False]
+        if not packages:
+            return True
+        return run_command(self.uninstall_command(packages))
+
+    def dry_run(self, packages, install_local=False, extra_command_line='', ignore_installed=False):
+        """
+        Resolve the installation of packages without changing the environment.
+
+        :param packages: list of packages to install
+        :param install_local: whether to install locally
+        :param extra_command_line: extra command line parameters
+        :param ignore_installed: if True, resolve as if nothing was installed, so that all the needed distributions
+            are returned
+        :return: a list of dictionaries with (at least) the keys "name" and "version" of the distributions that would
+            be installed, or None if the resolution failed
+        """
+        raise NotImplementedError
+
+    def install_offline(self, packages):
+        """
+        Install exact versions of packages from the local package cache, without accessing the index.
+
+        :param packages: list of packages with exact versions, e.g. numpy==1.26.4
+        :return: True if success
+        """
+        raise NotImplementedError
+
+    def install_requirements_file(
+        self, requirements_file, install_local=False, extra_command_line='', no_deps=False, require_hashes=False
+    ):
+        """
+        Install the packages listed in a requirements file.
+
+        :param requirements_file: the path of the requirements file
+        :param install_local: whether to install locally
+        :param extra_command_line: extra command line parameters
+        :param no_deps: if True, the dependencies of the packages are not installed
+        :param require_hashes: if True, all the packages must have a hash that is checked
+        :return: True if success
+        """
+        raise NotImplementedError
+
+    def build_wheels(self, packages, directory, extra_command_line=''):
+        """
+        Build or download the wheels of packages and their dependencies into a directory.
+
+        :param packages: list of packages
+        :param directory: the destination directory
+        :param extra_command_line: extra command line parameters
+        :return: True if success
+        """
+        raise NotImplementedError
+
+    def wheelhouse_options(self, directory):
+        """
+        Get the command line options to install only from a wheelhouse directory.
+
+        :param directory: the wheelhouse directory
+        :return: a list of strings
+        """
+        raise NotImplementedError
+
+    def constraints_options(self, path):
+        """
+        Get the command line options to use a constraints file.
+
+        :param path: the path of the constraints file
+        :return: a list of strings
+        """
+        raise NotImplementedError
+
+    def cache_options(self, directory):
+        """
+        Get the command line options to use a download cache directory, e.g. shared by several environments.
+
+        :param directory: the cache directory
+        :return: a list of strings
+        """
+        raise NotImplementedError
+
+    def no_compile_options(self):
+        """
+        Get the command line options to install without compiling the python files to bytecode.
+
+        :return: a list of strings
+        """
+        raise NotImplementedError
+
+    def prepare(self, packages, directory, extra_command_line=''):
+        """
+        Download (and build, if needed) packages before installing them, without changing the environment.
+
+        :param packages: list of packages
+        :param directory: a directory where the prepared files can be stored
+        :param extra_command_line: extra command line parameters
+        :return: True if the packages were prepared, False if the backend does not support it or it failed
+        """
+        return False
+
+    def prepared_install_options(self, directory):
+        """
+        Get the command line options to install the packages prepared in a directory.
+
+        :param directory: the directory passed to prepare
+        :return: a list of strings
+        """
+        return []
+
+    def query_installed(self):
+        """
+        Get the installed distributions.
+
+        :return: a dictionary (canonical name: version string)
+        """
+        raise NotImplementedError
+
+
+def _split_extra_command_line(extra_command_line):
+    """Split the extra command line parameters."""
+    if extra_command_line and extra_command_line.strip():
+        return shlex.split(extra_command_line)
+    return []
+
+
+def _canonical_name(name):
+    """Return the canonical name of a distribution."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+class PipBackend(InstallerBackend):
+    """Backend using pip from the target interpreter."""
+
+    supports_local_install = True
+    supports_requirements_file = True
+    supports_wheelhouse = True
+    supports_constraints = True
+    uses_python_index = True
+    supports_cache_dir = True
+    supports_no_compile = True
+
+    def pip_command(self):
+        """Return the command running pip."""
+        return [self.python_executable, '-m', 'pip']
+
+    def install_command(self, packages, install_local=False, extra_command_line=''):
+        """Build the command to install packages."""
+        command_list = self.pip_command() + ['install']
+        if install_local:
+            command_list.append('--user')
+        command_list += _split_extra_command_line(extra_command_line)
+        return command_list + list(packages)
+
+    def uninstall_command(self, packages):
+        """Build the command to uninstall packages."""
+        return self.pip_command() + ['uninstall', '-y'] + list(packages)
+
+    def dry_run(self, packages, install_local=False, extra_command_line='', ignore_installed=False):
+        """Resolve the installation of packages using the installation report of pip."""
+        options = ['--dry-run', '--quiet', '--report', '-']
+        if ignore_installed:
+            options.append('--ignore-installed')
+        command_list = self.install_command(options + list(packages), install_local, extra_command_line)
+        output = run_command_output(command_list)
+        if output is None:
+            return None
+        try:
+            report = json.loads(output)
+        except json.JSONDecodeError:
+            return None
+        resolved = []
+        for item in report.get('install', []):
+            download_info = item.get('download_info', {})
+            resolved.append(
+                {
+                    'name': item['metadata']['name'],
+                    'version': item['metadata']['version'],
+                    'url': download_info.get('url'),
+                    'hashes': download_info.get('archive_info', {}).get('hashes', {}),
+                    'requested': item.get('requested', False),
+                    'requires': item['metadata'].get('requires_dist', []),
+                }
+            )
+        return resolved
+
+    def install_requirements_file(
+        self, requirements_file, install_local=False, extra_command_line='', no_deps=False, require_hashes=False
+    ):
+        """Install the packages listed in a requirements file."""
+        options = ['-r', requirements_file]
+        if no_deps:
+            options.append('--no-deps')
+        if require_hashes:
+            options.append('--require-hashes')
+        return run_command(self.install_command(options, install_local, extra_command_line))
+
+    def build_wheels(self, packages, directory, extra_command_line=''):
+        """Build the wheels of packages with pip wheel."""
+        if not packages:
+            return True
+        command_list = [self.python_executable, '-m', 'pip', 'wheel', '-w', directory]
+        command_list += _split_extra_command_line(extra_command_line)
+        return run_command(command_list + list(packages))
+
+    def wheelhouse_options(self, directory):
+        """Get the command line options to install only from a wheelhouse directory."""
+        return ['--no-index', '--find-links', directory]
+
+    def constraints_options(self, path):
+        """Get the command line options to use a constraints file."""
+        return ['-c', path]
+
+    def cache_options(self, directory):
+        """Get the command line options to use a download cache directory."""
+        return ['--cache-dir', directory]
+
+    def no_compile_options(self):
+        """Get the command line options to install without compiling the python files to bytecode."""
+        return ['--no-compile']
+
+    def prepare(self, packages, directory, extra_command_line=''):
+        """Build the wheels of the packages and their dependencies."""
+        return self.build_wheels(packages, directory, extra_command_line)
+
+    def prepared_install_options(self, directory):
+        """Get the command line options to use the prepared wheels."""
+        return ['--find-links', directory]
+
+    def query_installed(self):
+        """Get the installed distributions."""
+        if self.python_executable == sys.executable:
+            return {
+                _canonical_name(dist.metadata['Name']): dist.version
+                for dist in metadata.distributions()
+                if dist.metadata['Name']
+            }
+        output = run_command_output(self.pip_command() + ['list', '--format', 'json'])
+        if output is None:
+            return {}
+        return {_canonical_name(item['name']): item['version'] for item in json.loads(output)}
+
+
+class UvBackend(PipBackend):
+    """Backend using the pip interface of uv."""
+
+    supports_local_install = False
+
+    def pip_command(self):
+        """Return the command running uv pip."""
+        uv_executable = os.environ.get('UV') or shutil.which('uv')
+        if uv_executable:
+            return [uv_executable, 'pip']
+        return [self.python_executable, '-m', 'uv', 'pip']
+
+    def is_available(self):
+        """Check if uv can be found."""
+        if os.environ.get('UV') or shutil.which('uv'):
+            return True
+        return run_command_output([self.python_executable, '-m', 'uv', '--version']) is not None
+
+    def install_command(self, packages, install_local=False, extra_command_line=''):
+        """Build the command to install packages."""
+        if install_local:
+            print('Warning: uv does not support local installs. Installing in the environment')
+        command_list = self.pip_command() + ['install', '--python', self.python_executable]
+        command_list += _split_extra_command_line(extra_command_line)
+        return command_list + list(packages)
+
+    def uninstall_command(self, packages):
+        """Build the command to uninstall packages."""
+        return self.pip_command() + ['uninstall', '--python', self.python_executable] + list(packages)
+
+    def no_compile_options(self):
+        """Get the command line options to install without compiling: none, uv only compiles with --compile-bytecode."""
+        return []
+
+    def dry_run(self, packages, install_local=False, extra_command_line='', ignore_installed=False):
+        """Resolve the installation of packages using the dry run summary of uv."""
+        options = ['--dry-run']
+        if ignore_installed:
+            options.append('--reinstall')
+        command_list = self.install_command(options + list(packages), install_local, extra_command_line)
+        # uv writes the summary to stderr
+        output = run_command_output(command_list, merge_stderr=True)
+        if output is None:
+            return None
+        resolved = []
+        for line in output.splitlines():
+            match = re.match(r'\s*\+\s*([A-Za-z0-9_.-]+)==(\S+)', line)
+            if match:
+                resolved.append({'name': match.group(1), 'version': match.group(2)})
+        return resolved
+
+    def query_installed(self):
+        """Get the installed distributions."""
+        output = run_command_output(
+            self.pip_command() + ['list', '--python', self.python_executable, '--format', 'json']
+        )
+        if output is None:
+            return {}
+        return {_canonical_name(item['name']): item['version'] for item in json.loads(output)}
+
+
+@lru_cache(maxsize=None)
+def _interpreter_prefix(python_executable):
+    """Return the prefix of the environment of an interpreter, running it once."""
+    output = run_command_output([python_executable, '-c', 'import sys; print(sys.prefix)'])
+    if output is None:
+        raise SetupFailedError(f'Cannot determine the prefix of {python_executable}')
+    return output.strip()
+
+
+class CondaBackend(InstallerBackend):
+    """
+    Backend using conda on the environment of the target interpreter.
+
+    The conda module is only installed in the base environment, so the environments of other interpreters are managed
+    by the current conda (CONDA_EXE, or the conda module of the current interpreter) with their prefix. The installed
+    packages are read from the conda-meta directory of the environment, so that conda is only run when the environment
+    has to be changed.
+    """
+
+    def is_current_environment(self):
+        """Check if the target interpreter is the current one."""
+        return os.path.abspath(self.python_executable) == os.path.abspath(sys.executable)
+
+    def prefix(self):
+        """Return the prefix of the environment of the target interpreter, which is only run once per process."""
+        if self.is_current_environment():
+            return sys.prefix
+        return _interpreter_prefix(self.python_executable)
+
+    def prefix_options(self):
+        """Return the command line options selecting the environment of the target interpreter."""
+        if self.is_current_environment():
+            return []
+        return ['-p', self.prefix()]
+
+    def requirement_satisfied(self, package):
+        """Check in conda-meta if a package requirement is satisfied."""
+        return conda_requirement_satisfied(package, self.prefix())
+
+    def is_installed(self, package):
+        """Check in conda-meta if a package is installed."""
+        packages = read_conda_packages(self.prefix())
+        if packages is None:
+            return None
+        parsed_spec = parse_conda_spec(package)
+        if parsed_spec is None:
+            return None
+        return _canonical_name(parsed_spec[0]) in packages
+
+    def conda_command(self):
+        """Return the command running conda."""
+        if self.is_current_environment():
+            return [sys.executable, '-m', 'conda']
+        conda_executable = os.environ.get('CONDA_EXE')
+        return [conda_executable] if conda_executable else [sys.executable, '-m', 'conda']
+
+    def install_command(self, packages, install_local=False, extra_command_line=''):
+        """Build the command to install packages."""
+        command_list = self.conda_command() + ['install', '-y'] + self.prefix_options()
+        command_list += _split_extra_command_line(extra_command_line)
+        return command_list + list(packages)
+
+    def uninstall_command(self, packages):
+        """Build the command to uninstall packages."""
+        return self.conda_command() + ['remove', '-y'] + self.prefix_options() + list(packages)
+
+    def prepare(self, packages, directory, extra_command_line=''):
+        """Download the packages into the package cache. The directory is not used."""
+        packages = self.plan_install(packages, extra_command_line)
+        if not packages:
+            return True
+        return run_command(self.install_command(['--download-only'] + packages, extra_command_line=extra_command_line))
+
+    def install_offline(self, packages):
+        """Install packages from the package cache."""
+        if not packages:
+            return True
+        return run_command(self.install_command(['--offline'] + list(packages)))
+
+    def dry_run(self, packages, install_local=False, extra_command_line='', ignore_installed=False):
+        """Resolve the installation of packages using the json output of conda."""
+        command_list = self.install_command(['--dry-run', '--json'] + list(packages), install_local, extra_command_line)
+        output = run_command_output(command_list)
+        if output is None:
+            return None
+        try:
+            report = json.loads(output)
+        except json.JSONDecodeError:
+            return None
+        return [
+            {
+                'name': item['name'],
+                'version': item['version'],
+                'channel': item.get('channel'),
+                'build': item.get('build_string'),
+            }
+            for item in report.get('actions', {}).get('LINK', [])
+        ]
+
+    def query_installed(self):
+        """Get the installed packages."""
+        packages = read_conda_packages(self.prefix())
+        if packages is not None:
+            return {name: record.version for name, record in packages.items()}
+        output = run_command_output(self.conda_command() + ['list', '--json'] + self.prefix_options())
+        if output is None:
+            return {}
+        return {_canonical_name(item['name']): item['version'] for item in json.loads(output)}
+
+
+class MambaBackend(CondaBackend):
+    """Backend using micromamba or mamba on the prefix of the target interpreter."""
+
+    aliases = ('micromamba',)
+
+    @staticmethod
+    def find_executable():
+        """
+        Find the mamba executable.
+
+        :return: the path of micromamba or mamba, or None if none is found
+        """
+        return os.environ.get('MAMBA_EXE') or shutil.which('micromamba') or shutil.which('mamba')
+
+    def is_available(self):
+        """Check if micromamba or mamba can be found."""
+        return self.find_executable() is not None
+
+    def conda_command(self):
+        """Return the command running mamba."""
+        return [self.find_executable() or 'micromamba']
+
+    def prefix_options(self):
+        """Return the command line options selecting the environment, which mamba needs even for the current one."""
+        return ['-p', self.prefix()]
+
+
+class ExternalPackageManager(NamedTuple):
+    """A package manager added with register_backend, used in place of the members of PackageManagers."""
+
+    name: str
+
+
+_backends = OrderedDict()
+
+
+def register_backend(package_manager, backend_class):
+    """
+    Register the backend implementing a package manager.
+
+    Registering a backend for a package manager that already has one replaces it. A new package manager can be added
+    by name: its packages are then read from the section with the capitalized name in the configuration files, and
+    it can be selected by name like the built-in ones.
+
+    :param package_manager: the package manager, a member of PackageManagers, or the name of a package manager
+    :param backend_class: a subclass of InstallerBackend
+    :return: the package manager, a member of PackageManagers or an ExternalPackageManager
+    """
+    if isinstance(package_manager, str):
+        name = package_manager.strip().lower()
+        if name in PackageManagers.__members__:
+            package_manager = PackageManagers[name]
+        else:
+            package_manager = ExternalPackageManager(name)
+    if package_manager == PackageManagers.common:
+        raise ValueError('Cannot register a backend for the common packages')
+    _backends[package_manager] = backend_class
+    return package_manager
+
+
+def get_registered_package_managers():
+    """
+    Get the package managers that have a backend.
+
+    :return: a list of PackageManagers members and ExternalPackageManager objects, in registration order
+    """
+    return list(_backends.keys())
+
+
+def get_backend(package_manager, python_executable=None):
+    """
+    Get the backend of a package manager.
+
+    :param package_manager: the package manager, as returned by resolve_package_manager, or its name
+    :param python_executable: the python interpreter of the environment to manage. Default: the current one
+    :return: an InstallerBackend instance
+    """
+    if isinstance(package_manager, str):
+        try:
+            package_manager = resolve_package_manager(package_manager)
+        except KeyError:
+            raise ValueError(f'Unknown package manager {package_manager}') from None
+    try:
+        backend_class = _backends[package_manager]
+    except KeyError:
+        raise ValueError('Unknown package manager') from None
+    return backend_class(python_executable)
+
+
+def resolve_package_manager(name):
+    """
+    Find the package manager corresponding to a name or alias, as used in the configuration file.
+
+    :param name: the name of the package manager (case insensitive)
+    :return: a member of PackageManagers, or an ExternalPackageManager
+    :raise KeyError: if no backend is registered for the name
+    """
+    name = name.strip().lower()
+    for package_manager, backend_class in _backends.items():
+        if name == package_manager.name or name in backend_class.aliases:
+            return package_manager
+    raise KeyError(name)
+
+
+register_backend(PackageManagers.pip, PipBackend)
+register_backend(PackageManagers.conda, CondaBackend)
+register_backend(PackageManagers.uv, UvBackend)
+register_backend(PackageManagers.mamba, MambaBackend)
+
+
+def install_package(package_manager, package, install_local=False, extra_command_line='', python_executable=None):
     """
     Install a package using the specified package manager.
 
@@ -49,14 +822,25 @@ def install_package(package_manager, package, install_local=False, extra_command
     :param package: the package to install
     :param install_local: whether to install locally
     :param extra_command_line: extra command line parameters
+    :param python_executable: the python interpreter of the environment to manage. Default: the current one
     :return:
     """
-    if package_manager == PackageManagers.pip:
-        return install_pip(package, install_local, extra_command_line)
-    elif package_manager == PackageManagers.conda:
-        return install_conda(package, extra_command_line)
-    else:
-        raise ValueError('Unknown package manager')
+    return install_packages(package_manager, [package], install_local, extra_command_line, python_executable)
+
+
+def install_packages(package_manager, packages, install_local=False, extra_command_line='', python_executable=None):
+    """
+    Install several packages in a single transaction using the specified package manager.
+
+    :param package_manager: the package manager to use
+    :param packages: the list of packages to install
+    :param install_local: whether to install locally
+    :param extra_command_line: extra command line parameters
+    :param python_executable: the python interpreter of the environment to manage. Default: the current one
+    :return: True if success
+    """
+    return get_backend(package_manager, python_executable).install(packages, install_local, extra_command_line)
+
 
 def install_package_version(package_manager, package, version, install_local=False, extra_command_line=''):
     # get base package name
@@ -73,15 +857,7 @@ def install_conda(package, extra_command_line):
     :param extra_command_line: extra command line parameters
     :return:
     """
-    command_list = [sys.executable, '-m', 'conda', 'install', '-y']
-    if extra_command_line.strip():
-        command_list += shlex.split(extra_command_line)
-    command_list.append(package)
-    try:
-        subprocess.check_call(command_list)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    return get_backend(PackageManagers.conda).install([package], extra_command_line=extra_command_line)
 
 
 def install_pip(package, install_local, extra_command_line):
@@ -93,33 +869,31 @@ def install_pip(package, install_local, extra_command_line):
     :param extra_command_line: extra command line parameters
     :return:
     """
-    command_list = [sys.executable, '-m', 'pip', 'install']
-    if install_local:
-        command_list.append('--user')
-    if extra_command_line.strip():
-        command_list += shlex.split(extra_command_line)
-    command_list.append(package)
-    try:
-        subprocess.check_call(command_list)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    return get_backend(PackageManagers.pip).install([package], install_local, extra_command_line)
 
 
-def uninstall_package(package_manager, package):
+def uninstall_package(package_manager, package, python_executable=None):
     """
     Uninstall a package using the specified package manager.
 
     :param package_manager: the package manager to use
     :param package: the package to install
+    :param python_executable: the python interpreter of the environment to manage. Default: the current one
     :return:
     """
-    if package_manager == PackageManagers.pip:
-        return uninstall_pip(package)
-    elif package_manager == PackageManagers.conda:
-        return uninstall_conda(package)
-    else:
-        raise ValueError('Unknown package manager')
+    return uninstall_packages(package_manager, [package], python_executable)
+
+
+def uninstall_packages(package_manager, packages, python_executable=None):
+    """
+    Uninstall several packages in a single transaction using the specified package manager.
+
+    :param package_manager: the package manager to use
+    :param packages: the list of packages to uninstall
+    :param python_executable: the python interpreter of the environment to manage. Default: the current one
+    :return: True if success
+    """
+    return get_backend(package_manager, python_executable).uninstall(packages)
 
 
 def uninstall_pip(package):
@@ -129,12 +903,7 @@ def uninstall_pip(package):
     :param package: the package to uninstall
     :return:
     """
-    command_list = [sys.executable, '-m', 'pip', 'uninstall', '-y', package]
-    try:
-        subprocess.check_call(command_list)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    return get_backend(PackageManagers.pip).uninstall([package])
 
 
 def uninstall_conda(package):
@@ -144,9 +913,4 @@ def uninstall_conda(package):
     :param package: the package to uninstall
     :return:
     """
-    command_list = [sys.executable, '-m', 'conda', 'remove', '-y', package]
-    try:
-        subprocess.check_call(command_list)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    return get_backend(PackageManagers.conda).uninstall([package])
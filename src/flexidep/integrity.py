@@ -0,0 +1,114 @@
+"""Verification of the files of the installed distributions against their RECORD."""
+
+import base64
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .environment import installed_distributions
+from .installers import get_backend
+
+# files larger than this are hashed through mmap, without reading them in memory
+MMAP_THRESHOLD = 1024 * 1024
+
+_READ_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(path, algorithm):
+    """
+    Compute the digest of a file in the format of RECORD files.
+
+    :param path: the path of the file
+    :param algorithm: the name of the hash algorithm, e.g. sha256
+    :return: the urlsafe base64 digest without padding
+    """
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                hasher.update(mapped_file)
+        else:
+            for block in iter(lambda: fd.read(_READ_BLOCK_SIZE), b''):
+                hasher.update(block)
+    return base64.urlsafe_b64encode(hasher.digest()).rstrip(b'=').decode('ascii')
+
+
+def _verify_file(distribution, record_entry):
+    """
+    Verify a file of a distribution.
+
+    :param distribution: the Distribution
+    :param record_entry: the PackagePath of the file, with its hash and size
+    :return: a description of the problem, or None if the file is correct
+    """
+    path = distribution.locate_file(record_entry)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return f'{record_entry}: missing'
+    if record_entry.size is not None and size != record_entry.size:
+        return f'{record_entry}: size {size}, expected {record_entry.size}'
+    try:
+        digest = file_digest(path, record_entry.hash.mode)
+    except ValueError:
+        # unknown hash algorithm
+        return None
+    except OSError as e:
+        return f'{record_entry}: {e}'
+    if digest != record_entry.hash.value:
+        return f'{record_entry}: hash mismatch'
+    return None
+
+
+def verify_distributions(names=None, max_workers=None, python_executable=None):
+    """
+    Verify the files of installed distributions against the hashes in their RECORD, in parallel.
+
+    Only the files with a hash are verified (e.g. RECORD itself and compiled files are not).
+
+    :param names: canonical names of the distributions to verify. Default: all the installed distributions
+    :param max_workers: the maximum number of files hashed at the same time. Default: as ThreadPoolExecutor
+    :param python_executable: the interpreter whose distributions are verified. Default: the current one
+    :return: a dictionary (canonical name: list of problem descriptions) of the corrupt distributions
+    """
+    distributions = installed_distributions(python_executable)
+    if names is not None:
+        distributions = {name: distributions[name] for name in names if name in distributions}
+
+    checks = [
+        (name, distribution, record_entry)
+        for name, distribution in distributions.items()
+        for record_entry in distribution.files or []
+        if record_entry.hash is not None
+    ]
+    problems = {}
+    # hashlib releases the GIL while hashing, so the files are hashed in parallel by threads
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda check: _verify_file(check[1], check[2]), checks)
+        for (name, _, _), problem in zip(checks, results):
+            if problem is not None:
+                problems.setdefault(name, []).append(problem)
+    return problems
+
+
+def repair_distributions(names, package_manager, install_local=False, extra_command_line='', python_executable=None):
+    """
+    Reinstall distributions in a single transaction, without their dependencies.
+
+    The installed versions are reinstalled. pip reuses the downloaded files in its cache when possible.
+
+    :param names: canonical names of the distributions to repair
+    :param package_manager: the package manager, a member of PackageManagers
+    :param install_local: whether to install locally
+    :param extra_command_line: extra command line parameters
+    :param python_executable: the interpreter whose distributions are repaired. Default: the current one
+    :return: True if success
+    """
+    distributions = installed_distributions(python_executable)
+    packages = [f'{name}=={distributions[name].version}' if name in distributions else name for name in names]
+    if not packages:
+        return True
+    command_line = f'{extra_command_line} --force-reinstall --no-deps'.strip()
+    return get_backend(package_manager, python_executable).install(packages, install_local, command_line)
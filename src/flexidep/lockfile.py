@@ -0,0 +1,140 @@
+"""Lock files recording the result of a resolution, to repeat it without resolving again."""
+
+import json
+import os
+
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+LOCK_FORMAT_VERSION = 1
+
+# marker variables that must be equal for a lock file to be used in an environment
+LOCK_ENVIRONMENT_KEYS = (
+    'implementation_name',
+    'os_name',
+    'platform_machine',
+    'platform_system',
+    'python_version',
+    'sys_platform',
+)
+
+
+def marker_environment():
+    """
+    Get the marker environment of the current interpreter.
+
+    :return: a dictionary of marker variables
+    """
+    return dict(default_environment())
+
+
+def lock_mismatch_reason(lock, config_hash, package_manager, environment=None):
+    """
+    Check if a lock can be used for a configuration in an environment.
+
+    :param lock: the lock dictionary
+    :param config_hash: the hash of the current configuration
+    :param package_manager: the current package manager (a PackageManagers member)
+    :param environment: the marker environment to check. Default: the current one
+    :return: None if the lock can be used, otherwise a string describing why it cannot
+    """
+    if environment is None:
+        environment = marker_environment()
+    if lock.get('version') != LOCK_FORMAT_VERSION:
+        return f'unsupported lock format version {lock.get("version")}'
+    if lock.get('config_hash') != config_hash:
+        return 'the configuration has changed'
+    if lock.get('package_manager') != package_manager.name:
+        return f'the lock was created for {lock.get("package_manager")}'
+    lock_environment = lock.get('environment', {})
+    for key in LOCK_ENVIRONMENT_KEYS:
+        if lock_environment.get(key) != environment.get(key):
+            return f'{key} is {environment.get(key)}, the lock was created for {lock_environment.get(key)}'
+    return None
+
+
+def write_lock_file(path, lock):
+    """
+    Write a lock to a file.
+
+    :param path: the path of the lock file
+    :param lock: the lock dictionary
+    :return: Nothing
+    """
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as fd:
+        json.dump(lock, fd, indent=2)
+    os.replace(temp_path, path)
+
+
+def read_lock_file(path):
+    """
+    Read a lock from a file.
+
+    :param path: the path of the lock file
+    :return: the lock dictionary, or None if the file does not exist or is not valid
+    """
+    try:
+        with open(path, encoding='utf-8') as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return None
+
+
+def locked_requirements(distributions):
+    """
+    Convert the locked distributions to the lines of a requirements file.
+
+    :param distributions: a list of dictionaries with the keys name, version and hashes
+    :return: a list of strings like "name==version --hash=sha256:..."
+    """
+    lines = []
+    for distribution in distributions:
+        line = f'{distribution["name"]}=={distribution["version"]}'
+        for algorithm, digest in sorted(distribution.get('hashes', {}).items()):
+            line += f' --hash={algorithm}:{digest}'
+        lines.append(line)
+    return lines
+
+
+def distribution_closure(roots, distributions, environment=None):
+    """
+    Find the resolved distributions needed by a set of requirements.
+
+    :param roots: a list of requirement strings
+    :param distributions: the resolved distributions, dictionaries with the keys name, version and requires
+    :param environment: the marker environment of the requirements. Default: the current one
+    :return: a list of canonical names of the distributions needed by the roots
+    """
+    by_name = {canonicalize_name(distribution['name']): distribution for distribution in distributions}
+    processed_extras = {}
+    stack = []
+    for root in roots:
+        try:
+            stack.append(Requirement(root))
+        except InvalidRequirement:
+            # e.g. a url or a path: the dependencies cannot be attributed, so all the distributions are needed
+            return list(by_name)
+
+    while stack:
+        requirement = stack.pop()
+        name = canonicalize_name(requirement.name)
+        if name not in by_name:
+            continue
+        extras = set(requirement.extras) | {''}
+        new_extras = extras - processed_extras.get(name, set())
+        if not new_extras:
+            continue
+        processed_extras.setdefault(name, set()).update(new_extras)
+        for dependency_string in by_name[name].get('requires', []):
+            try:
+                dependency = Requirement(dependency_string)
+            except InvalidRequirement:
+                continue
+            if dependency.marker is None or any(
+                dependency.marker.evaluate({**(environment or {}), 'extra': extra}) for extra in new_extras
+            ):
+                stack.append(dependency)
+
+    return [name for name in by_name if name in processed_extras]
@@ -0,0 +1,116 @@
+"""Record of the distributions installed by flexidep for each module and alternative, used to prune them."""
+
+import json
+import os
+import sys
+import threading
+
+from .config import CONFIG_DIR
+from .exceptions import ConfigurationError
+
+OWNERSHIP_FILE = os.path.join(CONFIG_DIR, 'installed_distributions.json')
+
+# serializes the updates of the record by the threads of the process
+_ownership_lock = threading.Lock()
+
+
+def environment_key(python_executable=None):
+    """
+    Get the key identifying an environment in the record.
+
+    :param python_executable: the interpreter of the environment. Default: the current one
+    :return: a string
+    """
+    return os.path.abspath(python_executable or sys.executable)
+
+
+def load_ownership():
+    """
+    Load the record of the installed distributions.
+
+    :return: a dictionary (environment key: {unique id: {module: {alternative: [canonical names]}}})
+    """
+    try:
+        with open(OWNERSHIP_FILE, encoding='utf-8') as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_ownership(ownership):
+    """Save the record of the installed distributions."""
+    temp_file = f'{OWNERSHIP_FILE}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_file, 'w', encoding='utf-8') as fd:
+            json.dump(ownership, fd)
+        os.replace(temp_file, OWNERSHIP_FILE)
+    except OSError as e:
+        print(f'Warning: cannot save the record of the installed distributions: {e}')
+
+
+def environment_ownership(python_executable=None):
+    """
+    Get the record of an environment.
+
+    :param python_executable: the interpreter of the environment. Default: the current one
+    :return: a dictionary (unique id: {module: {alternative: [canonical names]}})
+    """
+    return load_ownership().get(environment_key(python_executable), {})
+
+
+def record_installed(unique_id, module, alternative, distributions, python_executable=None):
+    """
+    Record the distributions installed for a module.
+
+    :param unique_id: the unique id of the configuration
+    :param module: the module (package) name
+    :param alternative: the installed alternative
+    :param distributions: the canonical names of the distributions added by the installation
+    :param python_executable: the interpreter of the environment. Default: the current one
+    :return: Nothing
+    """
+    if not unique_id:
+        # the records of configurations without an id could not be told apart
+        raise ConfigurationError('Cannot record the installed distributions without a unique id')
+    if not distributions:
+        return
+    with _ownership_lock:
+        ownership = load_ownership()
+        modules = ownership.setdefault(environment_key(python_executable), {}).setdefault(unique_id, {})
+        owned = modules.setdefault(module, {}).setdefault(alternative, [])
+        owned += [name for name in distributions if name not in owned]
+        _save_ownership(ownership)
+
+
+def forget_distributions(names, python_executable=None):
+    """
+    Remove distributions from the record of an environment, e.g. after they were uninstalled.
+
+    :param names: canonical names of distributions
+    :param python_executable: the interpreter of the environment. Default: the current one
+    :return: Nothing
+    """
+    names = set(names)
+    with _ownership_lock:
+        ownership = load_ownership()
+        for modules in ownership.get(environment_key(python_executable), {}).values():
+            for module in list(modules):
+                for alternative in list(modules[module]):
+                    modules[module][alternative] = [name for name in modules[module][alternative] if name not in names]
+                    if not modules[module][alternative]:
+                        del modules[module][alternative]
+                if not modules[module]:
+                    del modules[module]
+        _save_ownership(ownership)
+
+
+def clear_ownership():
+    """
+    Delete the record of the installed distributions.
+
+    :return: Nothing
+    """
+    try:
+        os.remove(OWNERSHIP_FILE)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,137 @@
+"""Checking if modules can be imported in child interpreters, without loading them in the current process."""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import CONFIG_DIR
+from .environment import environment_fingerprint, register_cache_invalidator
+
+PROBE_CACHE_FILE = os.path.join(CONFIG_DIR, 'probe_cache.json')
+
+# default maximum duration of a probe in seconds
+PROBE_TIMEOUT = 30
+
+# script run in the child interpreter: exits with 0 if one of the modules in argv[1] (separated by |) can be imported
+_PROBE_SCRIPT = '''
+import importlib, sys
+for name in sys.argv[1].split('|'):
+    try:
+        importlib.import_module(name)
+        sys.exit(0)
+    except Exception:
+        pass
+sys.exit(1)
+'''
+
+# results of the probes, per interpreter: {python executable: {'fingerprint': environment fingerprint, 'results':
+# {module: bool}}}
+_probe_cache = None
+_probe_cache_lock = threading.Lock()
+
+
+def _load_probe_cache(python_executable, fingerprint):
+    """
+    Get the cached results of the probes of an interpreter for an environment fingerprint, loading them from file if
+    needed. Must be called with the cache lock held.
+    """
+    global _probe_cache  # pylint: disable=global-statement
+    if _probe_cache is None:
+        try:
+            with open(PROBE_CACHE_FILE, encoding='utf-8') as fd:
+                _probe_cache = json.load(fd)
+        except (OSError, ValueError):
+            _probe_cache = {}
+        if not isinstance(_probe_cache, dict) or 'fingerprint' in _probe_cache:
+            # unreadable, or written by a previous version for a single interpreter
+            _probe_cache = {}
+    entry = _probe_cache.get(python_executable)
+    if not isinstance(entry, dict) or entry.get('fingerprint') != fingerprint:
+        entry = _probe_cache[python_executable] = {'fingerprint': fingerprint, 'results': {}}
+    return entry['results']
+
+
+def _save_probe_cache():
+    """Save the results of the probes. Must be called with the cache lock held."""
+    temp_file = f'{PROBE_CACHE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_file, 'w', encoding='utf-8') as fd:
+            json.dump(_probe_cache, fd)
+        os.replace(temp_file, PROBE_CACHE_FILE)
+    except OSError as e:
+        print(f'Warning: cannot save the probe cache: {e}')
+
+
+@register_cache_invalidator
+def clear_probe_cache():
+    """
+    Forget the results of the probes.
+
+    :return: Nothing
+    """
+    global _probe_cache  # pylint: disable=global-statement
+    with _probe_cache_lock:
+        _probe_cache = None
+    try:
+        os.remove(PROBE_CACHE_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def probe_module(module, timeout=PROBE_TIMEOUT, python_executable=None):
+    """
+    Check if a module can be imported, in a child interpreter.
+
+    :param module: the module name. Alternative names can be separated by |
+    :param timeout: the maximum duration of the probe in seconds. A probe that takes longer fails
+    :param python_executable: the interpreter to use. Default: the current one
+    :return: True if the module can be imported
+    """
+    try:
+        return (
+            subprocess.run(
+                [python_executable or sys.executable, '-c', _PROBE_SCRIPT, module],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+                check=False,
+            ).returncode
+            == 0
+        )
+    except subprocess.TimeoutExpired:
+        print(f'Warning: the import of {module} took more than {timeout} s')
+        return False
+
+
+def probe_modules(modules, max_workers=None, timeout=PROBE_TIMEOUT, python_executable=None):
+    """
+    Check if modules can be imported, each in a child interpreter, in parallel.
+
+    The results are cached for the environment fingerprint of the interpreter, so the probes are only run again when
+    the installed packages change.
+
+    :param modules: a list of module names
+    :param max_workers: the maximum number of probes running at the same time. Default: the number of cores
+    :param timeout: the maximum duration of each probe in seconds
+    :param python_executable: the interpreter to use. Default: the current one
+    :return: a dictionary (module: True if it can be imported)
+    """
+    python_executable = python_executable or sys.executable
+    fingerprint = environment_fingerprint(python_executable)
+    with _probe_cache_lock:
+        cached = dict(_load_probe_cache(python_executable, fingerprint))
+    missing = [module for module in dict.fromkeys(modules) if module not in cached]
+    if missing:
+        # each probe is a separate interpreter: the pool threads only wait for them
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            probed = dict(
+                zip(missing, executor.map(lambda module: probe_module(module, timeout, python_executable), missing))
+            )
+        cached.update(probed)
+        with _probe_cache_lock:
+            _load_probe_cache(python_executable, fingerprint).update(probed)
+            _save_probe_cache()
+    return {module: cached[module] for module in modules}
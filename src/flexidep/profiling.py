@@ -0,0 +1,169 @@
+"""Measurement of the import cost of modules, each in a fresh interpreter."""
+
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# script run in the child interpreter: imports the first importable module of argv[1] (names separated by |) and
+# prints the measurements as json
+_PROFILE_SCRIPT = '''
+import importlib, json, os, sys, time
+
+def rss():
+    try:
+        with open('/proc/self/statm') as fd:
+            return int(fd.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+modules_before = set(sys.modules)
+rss_before = rss()
+start_time = time.perf_counter()
+imported = None
+error = None
+for name in sys.argv[1].split('|'):
+    try:
+        importlib.import_module(name)
+        imported = name
+        error = None
+        break
+    except BaseException as e:
+        error = f'{type(e).__name__}: {e}'
+wall_time = time.perf_counter() - start_time
+rss_after = rss()
+print(json.dumps({
+    'imported': imported,
+    'error': error,
+    'wall_time': wall_time,
+    'rss_delta': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+    'modules': sorted(set(sys.modules) - modules_before),
+}))
+'''
+
+# number of modules with the highest self import time kept in the report
+TOP_MODULES = 10
+
+
+def _parse_importtime(stderr_output, modules):
+    """
+    Parse the output of -X importtime.
+
+    :param stderr_output: the standard error of the child interpreter
+    :param modules: the modules to keep (the ones loaded by the profiled import)
+    :return: a dictionary (module: self import time in seconds)
+    """
+    modules = set(modules)
+    import_times = {}
+    for line in stderr_output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        module = fields[2].strip()
+        try:
+            self_time = int(fields[0])
+        except ValueError:
+            # header line
+            continue
+        if module in modules:
+            import_times[module] = import_times.get(module, 0) + self_time / 1e6
+    return import_times
+
+
+def profile_import(module, python_executable=None, timeout=120):
+    """
+    Measure the cost of importing a module in a fresh interpreter.
+
+    :param module: the module name. Alternative names can be separated by |, the first importable one is measured
+    :param python_executable: the interpreter to use. Default: the current one
+    :param timeout: the maximum duration of the measurement in seconds
+    :return: a dictionary with the keys module, imported (the imported name, or None), error, wall_time (seconds),
+        rss_delta (bytes, or None if it cannot be measured), module_count, modules (the list of modules loaded by the
+        import), import_time (the sum of the self import times of the modules, in seconds) and top_modules (a list of
+        (module, self import time) tuples of the slowest modules)
+    """
+    result = {
+        'module': module,
+        'imported': None,
+        'error': None,
+        'wall_time': None,
+        'rss_delta': None,
+        'module_count': 0,
+        'modules': [],
+        'import_time': None,
+        'top_modules': [],
+    }
+    try:
+        process = subprocess.run(
+            [python_executable or sys.executable, '-X', 'importtime', '-c', _PROFILE_SCRIPT, module],
+            capture_output=True,
+            text=True,
+            errors='replace',
+            timeout=timeout,
+            check=False,
+        )
+    except subprocess.TimeoutExpired:
+        result['error'] = f'Timeout after {timeout} s'
+        return result
+
+    try:
+        measurement = json.loads(process.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        result['error'] = f'The interpreter failed with exit code {process.returncode}'
+        return result
+
+    result.update(measurement)
+    result['module_count'] = len(measurement['modules'])
+    import_times = _parse_importtime(process.stderr, measurement['modules'])
+    result['import_time'] = sum(import_times.values())
+    result['top_modules'] = sorted(import_times.items(), key=lambda item: item[1], reverse=True)[:TOP_MODULES]
+    return result
+
+
+def profile_imports(modules, python_executable=None, max_workers=None, timeout=120):
+    """
+    Measure the cost of importing several modules, each in a fresh interpreter, in parallel.
+
+    Note that the measurements run at the same time, so the wall times are only comparable with each other if there
+    are enough cores.
+
+    :param modules: a list of module names
+    :param python_executable: the interpreter to use. Default: the current one
+    :param max_workers: the maximum number of interpreters running at the same time. Default: the number of cores
+    :param timeout: the maximum duration of each measurement in seconds
+    :return: a list of dictionaries as returned by profile_import, from the most to the least expensive import
+    """
+    # each measurement is a separate interpreter: the pool threads only wait for them
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        report = list(executor.map(lambda module: profile_import(module, python_executable, timeout), modules))
+    return sorted(report, key=lambda result: result['wall_time'] or 0, reverse=True)
+
+
+def format_import_report(report):
+    """
+    Format an import report as a text table.
+
+    :param report: a list of dictionaries as returned by profile_imports
+    :return: a string
+    """
+    lines = [f'{"module":30} {"wall time":>10} {"rss delta":>10} {"modules":>8}  slowest']
+    for result in report:
+        if result['error'] is not None and result['imported'] is None:
+            lines.append(f'{result["module"]:30} {result["error"]}')
+            continue
+        rss_delta = f'{result["rss_delta"] / 2 ** 20:.1f} MB' if result['rss_delta'] is not None else '?'
+        slowest = ', '.join(f'{module} ({self_time * 1000:.0f} ms)' for module, self_time in result['top_modules'][:3])
+        lines.append(
+            f'{result["module"]:30} {result["wall_time"] * 1000:>7.0f} ms {rss_delta:>10} {result["module_count"]:>8}'
+            f'  {slowest}'
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,98 @@
+"""Scheduling of installations, preparing independent packages in parallel."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import base_package_name
+
+
+def _touched_packages(alternatives):
+    """
+    Get the distributions installed and uninstalled by the alternatives of a package.
+
+    :param alternatives: a dictionary (alternative: dependencies) as returned by process_alternatives
+    :return: two sets of canonical names: installed and uninstalled distributions
+    """
+    installed = set()
+    uninstalled = set()
+    for alternative, dependencies in alternatives.items():
+        for package in [alternative] + dependencies.install_before + dependencies.install_after:
+            installed.add(base_package_name(package))
+        for package in dependencies.uninstall_before + dependencies.uninstall_after:
+            uninstalled.add(base_package_name(package))
+    return installed, uninstalled
+
+
+def build_install_graph(pkg_to_install, priority_list):
+    """
+    Build the graph of the constraints between the installations of packages.
+
+    A package depends on another one if it comes after it in the installation order and:
+    - the other package is in the priority list, i.e. it must be installed before anything else is prepared, or
+    - one of them uninstalls a distribution that the other one installs or uninstalls (+/-/++/-- constraints).
+
+    :param pkg_to_install: an OrderedDict (package: alternatives), sorted in installation order
+    :param priority_list: the priority list
+    :return: a dictionary (package: set of packages that must be installed before it can be prepared)
+    """
+    priority_packages = set(priority_list)
+    predecessors = {package: set() for package in pkg_to_install}
+    touched = {package: _touched_packages(alternatives) for package, alternatives in pkg_to_install.items()}
+
+    previous_packages = []
+    for package in pkg_to_install:
+        installed, uninstalled = touched[package]
+        for previous_package in previous_packages:
+            previous_installed, previous_uninstalled = touched[previous_package]
+            if (
+                previous_package in priority_packages
+                or uninstalled & (previous_installed | previous_uninstalled)
+                or previous_uninstalled & installed
+            ):
+                predecessors[package].add(previous_package)
+        previous_packages.append(package)
+
+    return predecessors
+
+
+def run_install_schedule(order, predecessors, prepare, commit, max_workers=None):
+    """
+    Prepare packages in parallel and install them one at a time.
+
+    The preparation of a package starts as soon as all its predecessors are installed. The installations (commit)
+    are run in the calling thread, strictly in the given order, so that only one step changes the environment at a
+    time.
+
+    :param order: the list of packages in installation order. All the predecessors of a package must come before it
+    :param predecessors: a dictionary (package: set of packages that must be installed before it is prepared)
+    :param prepare: a function accepting a package and returning the result of its preparation. Exceptions are
+        treated as a failed preparation, with None as result
+    :param commit: a function accepting a package and the result of its preparation, installing it
+    :param max_workers: the maximum number of parallel preparations. Default: as ThreadPoolExecutor
+    :return: Nothing
+    """
+    committed = set()
+    futures = {}
+
+    def prepare_safely(package):
+        try:
+            return prepare(package)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f'Error preparing {package}: {e}')
+            return None
+
+    def submit_ready():
+        for package in order:
+            if package not in futures and predecessors[package] <= committed:
+                futures[package] = executor.submit(prepare_safely, package)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            submit_ready()
+            for package in order:
+                prepared = futures[package].result()
+                commit(package, prepared)
+                committed.add(package)
+                submit_ready()
+        finally:
+            for future in futures.values():
+                future.cancel()
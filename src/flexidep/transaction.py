@@ -0,0 +1,189 @@
+"""Transactional installations, restoring the previous distributions if an installation fails."""
+
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import threading
+import zipfile
+
+import appdirs
+
+from .config import APP_AUTHOR, APP_NAME
+from .core import base_package_name
+from .environment import installed_distributions
+from .installers import get_backend
+
+ROLLBACK_CACHE_DIR = os.path.join(appdirs.user_cache_dir(APP_NAME, APP_AUTHOR), 'rollback')
+
+MANIFEST_NAME = 'flexidep-manifest.json'
+
+
+def clear_rollback_cache():
+    """
+    Delete the archives kept to restore distributions.
+
+    :return: Nothing
+    """
+    shutil.rmtree(ROLLBACK_CACHE_DIR, ignore_errors=True)
+
+
+def archive_distribution(name, version, python_executable=None):
+    """
+    Archive the files of an installed distribution, as listed in its RECORD file.
+
+    Archives are kept in a cache (one directory per site directory), so a distribution that was already archived is
+    not archived again.
+
+    :param name: the canonical name of the distribution
+    :param version: the installed version
+    :param python_executable: the interpreter where the distribution is installed. Default: the current one
+    :return: the path of the archive, or None if the distribution cannot be archived
+    """
+    distribution = installed_distributions(python_executable).get(name)
+    if distribution is None or distribution.version != version or not distribution.files:
+        return None
+
+    base_dir = str(distribution.locate_file(''))
+    archive_dir = os.path.join(ROLLBACK_CACHE_DIR, hashlib.sha256(base_dir.encode('utf-8')).hexdigest()[:16])
+    archive_path = os.path.join(archive_dir, f'{name}-{version}.zip')
+    if os.path.exists(archive_path):
+        return archive_path
+
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = {'name': name, 'version': version, 'base_dir': base_dir, 'files': []}
+    temp_path = f'{archive_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    # the files are stored without compression: the archive must be fast to create and to restore
+    with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as archive:
+        for index, file in enumerate(distribution.files):
+            full_path = str(distribution.locate_file(file))
+            if not os.path.isfile(full_path):
+                continue
+            archive.write(full_path, str(index))
+            manifest['files'].append([str(index), str(file)])
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest))
+    os.replace(temp_path, archive_path)
+    return archive_path
+
+
+def restore_distribution(archive_path):
+    """
+    Restore the files of a distribution from an archive created by archive_distribution.
+
+    :param archive_path: the path of the archive
+    :return: Nothing
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        for index, relative_path in manifest['files']:
+            # RECORD paths are relative to the site directory, and can point outside of it (e.g. scripts)
+            destination = os.path.normpath(os.path.join(manifest['base_dir'], relative_path))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with archive.open(index) as source, open(destination, 'wb') as target:
+                shutil.copyfileobj(source, target)
+
+
+class InstallTransaction:
+    """
+    A set of installations that is either completed, or rolled back to the previous state.
+
+    The installed versions are recorded when the transaction starts. Before anything is changed, protect() must be
+    called with the distributions that can be removed or replaced: pip distributions are archived from their RECORD,
+    conda packages are restored from the package cache. On rollback, the distributions added by the transaction are
+    removed and the changed ones are restored, without accessing the index.
+
+    Can be used as a context manager, rolling back if an exception is raised.
+    """
+
+    def __init__(self, package_manager, python_executable=None):
+        """
+        Initialize the transaction.
+
+        :param package_manager: the package manager, a member of PackageManagers
+        :param python_executable: the interpreter of the environment to manage. Default: the current one
+        """
+        self.backend = get_backend(package_manager, python_executable)
+        self.snapshot = {}
+        self.archives = {}
+
+    def __enter__(self):
+        """Start the transaction."""
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Roll back the transaction if an exception was raised."""
+        if exc_type is not None:
+            self.rollback()
+        return False
+
+    def begin(self):
+        """
+        Record the installed versions.
+
+        :return: Nothing
+        """
+        self.snapshot = self.backend.query_installed()
+        self.archives = {}
+
+    def protect(self, packages, removed_packages=(), resolve=True, install_local=False, extra_command_line=''):
+        """
+        Save the installed distributions that an installation can remove or replace.
+
+        :param packages: the packages that will be installed
+        :param removed_packages: the packages that will be uninstalled
+        :param resolve: if True, the installation of the packages is resolved to find the installed dependencies that
+            would be upgraded or downgraded
+        :param install_local: whether to install locally, for the resolution
+        :param extra_command_line: extra command line parameters, for the resolution
+        :return: Nothing
+        """
+        names = {base_package_name(package) for package in list(packages) + list(removed_packages)}
+        if resolve and packages:
+            try:
+                resolved = self.backend.dry_run(list(packages), install_local, extra_command_line)
+            except NotImplementedError:
+                resolved = None
+            for distribution in resolved or []:
+                name = base_package_name(distribution['name'])
+                if self.snapshot.get(name) not in (None, distribution['version']):
+                    names.add(name)
+
+        if not self.backend.supports_requirements_file:
+            # conda packages are restored from the package cache, nothing needs to be saved
+            return
+
+        for name in names:
+            if name in self.snapshot and name not in self.archives:
+                archive_path = archive_distribution(name, self.snapshot[name], self.backend.python_executable)
+                if archive_path is not None:
+                    self.archives[name] = archive_path
+
+    def rollback(self):
+        """
+        Restore the distributions recorded when the transaction started.
+
+        :return: True if everything was restored
+        """
+        current = self.backend.query_installed()
+        added = [name for name in current if name not in self.snapshot]
+        changed = [name for name, version in self.snapshot.items() if current.get(name) != version]
+        if not added and not changed:
+            return True
+
+        print(f'Rolling back: removing {", ".join(added) or "nothing"}, restoring {", ".join(changed) or "nothing"}')
+        success = self.backend.uninstall(added + [name for name in changed if name in current])
+
+        if self.backend.supports_requirements_file:
+            for name in changed:
+                if name not in self.archives:
+                    print(f'Cannot restore {name}: it was not saved')
+                    success = False
+                    continue
+                restore_distribution(self.archives[name])
+        elif changed:
+            success = self.backend.install_offline([f'{name}=={self.snapshot[name]}' for name in changed]) and success
+
+        importlib.invalidate_caches()
+        return success
@@ -1,15 +1,93 @@
 """Utilities for the environment."""
 
+import email.utils
 import os
 import sys
+import urllib.error
 import urllib.request
 import json
+import importlib
 import importlib.metadata as metadata
 import re
-from urllib.error import HTTPError
+import threading
+import time
+from collections import OrderedDict, deque
 from packaging import version
 
-from tqdm import tqdm
+# versions of the packages on PyPI (canonical name: (time of the query, versions)), kept for PYPI_CACHE_SECONDS
+_pypi_versions_cache = {}
+PYPI_CACHE_SECONDS = 3600
+
+# base urls of the json API of the index and of its mirrors, tried in this order (a failing mirror is tried last)
+PYPI_MIRRORS = ['https://pypi.org/pypi']
+# timeout of an index request in seconds. Once enough answers were received, the synchronous queries use
+# PYPI_TIMEOUT_FACTOR times the 95th percentile of the recent latencies, at least PYPI_MIN_TIMEOUT, instead
+PYPI_TIMEOUT = 5
+PYPI_MIN_TIMEOUT = 1
+PYPI_TIMEOUT_FACTOR = 4
+# a mirror failing this many times in a row is not queried by the synchronous queries for PYPI_MIRROR_COOLDOWN seconds
+PYPI_MAX_FAILURES = 3
+PYPI_MIRROR_COOLDOWN = 60
+# number of attempts of a query before its result is unknown, and delay before the second one in seconds (doubled at
+# each attempt)
+PYPI_MAX_ATTEMPTS = 3
+PYPI_RETRY_DELAY = 0.5
+# longest wait requested by a Retry-After header that is honored, in seconds
+PYPI_MAX_RETRY_AFTER = 60
+
+UPGRADE_POLICIES = ('latest', 'minor', 'patch')
+
+
+class LatencyTracker:
+    """The latencies of the recent requests."""
+
+    def __init__(self, size=200):
+        """
+        Initialize the tracker.
+
+        :param size: the number of recent latencies kept
+        """
+        self._latencies = deque(maxlen=size)
+
+    def __len__(self):
+        """Return the number of latencies kept."""
+        return len(self._latencies)
+
+    def add(self, latency):
+        """
+        Add the latency of a request.
+
+        :param latency: the latency in seconds
+        :return: Nothing
+        """
+        self._latencies.append(latency)
+
+    def clear(self):
+        """
+        Forget the latencies.
+
+        :return: Nothing
+        """
+        self._latencies.clear()
+
+    def quantile(self, fraction):
+        """
+        Get a quantile of the recent latencies.
+
+        :param fraction: the fraction, e.g. 0.95 for the 95th percentile
+        :return: the latency in seconds, or None if no latency was recorded
+        """
+        if not self._latencies:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+
+# state of the index and of its mirrors, shared by the synchronous queries of all the threads: the latencies of the
+# recent answers, and for each mirror the number of failures in a row and the time of the last one
+_pypi_latencies = LatencyTracker()
+_pypi_mirror_failures = {}
+_pypi_state_lock = threading.Lock()
 
 class PackageDict(dict):
     def __init__(self):
@@ -35,15 +113,119 @@ def is_frozen():
     """Check if the current environment is a frozen (pyinstaller) environment."""
     return getattr(sys, 'frozen', False)
 
-def get_pypi_available_versions(package_name):
-    """Return a list of available versions for a package on PyPI."""
-    #print("Processing", package_name)
-    url = f"https://pypi.org/pypi/{package_name}/json"
+def parse_retry_after(value, default=None):
+    """
+    Get the delay requested by a Retry-After header.
+
+    :param value: the header value: a number of seconds or an HTTP date
+    :param default: the value returned if the header is missing or invalid
+    :return: the delay in seconds, at most PYPI_MAX_RETRY_AFTER
+    """
+    if not value:
+        return default
     try:
-        with urllib.request.urlopen(url, timeout=1) as response:
-            data = json.load(response)
-    except (HTTPError, json.JSONDecodeError, UnicodeDecodeError):
-        return []
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(delay, 0.0), PYPI_MAX_RETRY_AFTER)
+
+def _pypi_query_timeout():
+    """Return the timeout of the next synchronous query, adapted to the recent latencies of the index."""
+    with _pypi_state_lock:
+        if len(_pypi_latencies) < 10:
+            return PYPI_TIMEOUT
+        return min(PYPI_TIMEOUT, max(PYPI_MIN_TIMEOUT, PYPI_TIMEOUT_FACTOR * _pypi_latencies.quantile(0.95)))
+
+def _pypi_mirror_order(mirrors):
+    """
+    Return the mirrors to query, the ones with the fewest failures in a row first. The mirrors that failed
+    PYPI_MAX_FAILURES times in a row are left out until PYPI_MIRROR_COOLDOWN seconds after their last failure.
+    """
+    now = time.monotonic()
+    with _pypi_state_lock:
+        failures = {mirror: _pypi_mirror_failures.get(mirror, (0, 0.0)) for mirror in mirrors}
+    available = [
+        mirror
+        for mirror in mirrors
+        if failures[mirror][0] < PYPI_MAX_FAILURES or now - failures[mirror][1] >= PYPI_MIRROR_COOLDOWN
+    ]
+    return sorted(available, key=lambda mirror: failures[mirror][0])
+
+def _pypi_mirror_failed(mirror):
+    """Count a failure of a mirror."""
+    with _pypi_state_lock:
+        count = _pypi_mirror_failures.get(mirror, (0, 0.0))[0]
+        _pypi_mirror_failures[mirror] = (count + 1, time.monotonic())
+
+def _pypi_mirror_answered(mirror, latency):
+    """Record an answer of a mirror."""
+    with _pypi_state_lock:
+        _pypi_mirror_failures.pop(mirror, None)
+        _pypi_latencies.add(latency)
+
+def get_pypi_available_versions(package_name, mirrors=None, timeout=None):
+    """
+    Return a list of available versions for a package on PyPI. The results are cached for PYPI_CACHE_SECONDS.
+
+    Each attempt tries the mirrors, the ones that failed least recently first, and the failed attempts are repeated
+    after a delay, or after the delay requested by the index when it limits the rate of the requests (429 or 503 with
+    Retry-After). The timeout follows the latencies of the previous answers, and the mirrors that keep failing are
+    skipped for a while, so that an unreachable index does not slow down a scan of many packages.
+    :param package_name: the package name
+    :param mirrors: the base urls of the json API of the index and of its mirrors. Default: PYPI_MIRRORS
+    :param timeout: the timeout of each request in seconds. Default: adapted to the recent latencies, at most
+        PYPI_TIMEOUT
+    :return: a list of versions from the latest to the oldest (empty if the package is not on the index), or None if
+        the versions are unknown because the index could not be queried
+    """
+    cached = _pypi_versions_cache.get(_pypi_canonical_name(package_name))
+    if cached is not None and time.monotonic() - cached[0] < PYPI_CACHE_SECONDS:
+        return list(cached[1])
+    mirrors = [mirror.rstrip('/') for mirror in (mirrors or PYPI_MIRRORS)]
+    for attempt in range(PYPI_MAX_ATTEMPTS):
+        retry_delay = PYPI_RETRY_DELAY * 2 ** attempt
+        mirror_order = _pypi_mirror_order(mirrors)
+        if not mirror_order:
+            # all the mirrors keep failing: do not wait for them
+            break
+        for mirror in mirror_order:
+            url = f"{mirror}/{package_name}/json"
+            start_time = time.monotonic()
+            try:
+                with urllib.request.urlopen(url, timeout=timeout or _pypi_query_timeout()) as response:
+                    releases = _parse_pypi_releases(json.load(response))
+            except urllib.error.HTTPError as e:
+                if e.code == 404:
+                    releases = []
+                elif e.code == 429 or (e.code == 503 and e.headers.get('Retry-After') is not None):
+                    # the mirror is alive, but limits the rate of the requests
+                    retry_delay = max(retry_delay, parse_retry_after(e.headers.get('Retry-After'), 0))
+                    continue
+                else:
+                    _pypi_mirror_failed(mirror)
+                    continue
+            except (OSError, ValueError, KeyError):  # timeouts, connection errors, invalid answers
+                _pypi_mirror_failed(mirror)
+                continue
+            _pypi_mirror_answered(mirror, time.monotonic() - start_time)
+            _pypi_versions_cache[_pypi_canonical_name(package_name)] = (time.monotonic(), releases)
+            return list(releases)
+        if attempt < PYPI_MAX_ATTEMPTS - 1:
+            time.sleep(retry_delay)
+    return None
+
+def clear_pypi_cache():
+    """Forget the versions queried from PyPI, the failures of the mirrors and the latencies of the index."""
+    _pypi_versions_cache.clear()
+    with _pypi_state_lock:
+        _pypi_mirror_failures.clear()
+        _pypi_latencies.clear()
+
+def _parse_pypi_releases(data):
+    """Return the sorted list of versions in the PyPI json data of a package, from latest to oldest."""
     releases = []
     for version_raw in data['releases'].keys():
         try:
@@ -67,6 +249,9 @@ def get_installed_packages_with_available_versions(package_list = None, callback
     :param callback: optional callback function that accepts two integer values: current package and total packages
     :return:
     """
+    # imported here, so that importing flexidep stays fast
+    from tqdm import tqdm
+
     installed_packages = get_installed_packages()
     if package_list is None:
         package_list = installed_packages.keys()
@@ -77,6 +262,7 @@ def get_installed_packages_with_available_versions(package_list = None, callback
         package_list = [_pypi_canonical_name(package) for package in package_list] #convert packages to canonical names
         package_list = list(filter(lambda package: package in installed_packages, package_list))
     output_dict = PackageDict()
+    unknown_packages = []
     total_packages = len(package_list)
     for current_package_number, package_name in enumerate(tqdm(package_list)):
         if callback is not None:
@@ -88,6 +274,9 @@ def get_installed_packages_with_available_versions(package_list = None, callback
         output_element = {}
         output_element['installed_version'] = current_version
         available_versions = get_pypi_available_versions(package_name)
+        if available_versions is None:
+            unknown_packages.append(package_name)
+            continue
         if not available_versions:
             continue # this package is not available on PyPI
         if current_version >= available_versions[0]:
@@ -96,29 +285,154 @@ def get_installed_packages_with_available_versions(package_list = None, callback
             output_element['latest'] = False
         output_element['available_versions'] = available_versions
         output_dict[package_name] = output_element
+    if unknown_packages:
+        print(f'Warning: cannot query the index for {", ".join(unknown_packages)}')
     return output_dict
 
 
 
+def upgrade_target_version(installed_version, available_versions, policy='latest'):
+    """
+    Choose the version to upgrade a package to.
+
+    :param installed_version: the installed version
+    :param available_versions: the available versions
+    :param policy: 'latest' for the latest version, 'minor' for the latest version with the same major version,
+        'patch' for the latest version with the same major and minor versions
+    :return: the target version, or None if there is no newer version for the policy. Pre-releases are only chosen if
+        the installed version is a pre-release
+    """
+    if policy not in UPGRADE_POLICIES:
+        raise ValueError(f'Invalid upgrade policy {policy}')
+    candidates = [
+        available_version
+        for available_version in available_versions
+        if available_version > installed_version
+        and (installed_version.is_prerelease or not available_version.is_prerelease)
+        and (policy == 'latest' or available_version.major == installed_version.major)
+        and (policy != 'patch' or available_version.minor == installed_version.minor)
+    ]
+    return max(candidates) if candidates else None
+
+def upgrade_outdated(packages=None, policy='latest', package_manager=None, install_local=False, extra_command_line='',
+                     versions=None, dry_run=False):
+    """
+    Upgrade the outdated packages in a single package manager transaction.
+
+    The target versions are computed from the available versions (queried from PyPI, or cached), then the whole set
+    of upgrades is resolved once and installed with one package manager command.
+    :param packages: optional list of packages to upgrade. Default: all the installed packages
+    :param policy: one of UPGRADE_POLICIES (see upgrade_target_version)
+    :param package_manager: the package manager to use. Default: pip
+    :param install_local: whether to install locally
+    :param extra_command_line: extra command line parameters
+    :param versions: the output of get_installed_packages_with_available_versions, if already available
+    :param dry_run: if True, the upgrades are only resolved
+    :return: an OrderedDict (package name: (installed version, new version)) of the distributions changed by the
+        upgrade, including the dependencies changed by the resolution
+    """
+    from .config import PackageManagers
+    from .exceptions import SetupFailedError
+    from .installers import get_backend
+
+    if policy not in UPGRADE_POLICIES:
+        raise ValueError(f'Invalid upgrade policy {policy}')
+    if package_manager is None:
+        package_manager = PackageManagers.pip
+    if versions is None:
+        versions = get_installed_packages_with_available_versions(packages)
+    elif packages is not None:
+        if isinstance(packages, str):
+            packages = [packages]
+        package_names = {_pypi_canonical_name(package) for package in packages}
+        versions = {name: info for name, info in versions.items() if _pypi_canonical_name(name) in package_names}
+
+    targets = OrderedDict()
+    for package_name, info in versions.items():
+        target = upgrade_target_version(info['installed_version'], info['available_versions'], policy)
+        if target is not None:
+            targets[_pypi_canonical_name(package_name)] = target
+    if not targets:
+        return OrderedDict()
+
+    backend = get_backend(package_manager)
+    requirements = [f'{package_name}=={target}' for package_name, target in targets.items()]
+    installed_packages = get_installed_packages()
+    try:
+        resolved = backend.dry_run(requirements, install_local, extra_command_line)
+    except NotImplementedError:
+        resolved = [{'name': package_name, 'version': str(target)} for package_name, target in targets.items()]
+    if resolved is None:
+        raise SetupFailedError('The upgrades cannot be installed together: ' + ' '.join(requirements))
+
+    changes = OrderedDict()
+    for distribution in resolved:
+        package_name = _pypi_canonical_name(distribution['name'])
+        old_version = installed_packages.get(package_name)
+        changes[package_name] = (str(old_version) if old_version is not None else None, distribution['version'])
+    if dry_run:
+        return changes
+
+    if not backend.install(requirements, install_local, extra_command_line):
+        raise SetupFailedError('Error upgrading the packages: ' + ' '.join(requirements))
+    importlib.invalidate_caches()
+    return changes
+
+
+
 def standard_install_from_resource(resource_module, configuration_file_name, interactive=True):
     """
     Install packages from a resource using importlib.resources.
+
+    If a parent process already verified the same configuration and the environment has not changed since (e.g. in
+    the workers of multiprocessing with the spawn start method, which re-import the main module), nothing is done.
+
     :param resource_module: module containing the resource file. Can be the module itself or the module name.
     :param configuration_file_name: configuration file name
     :param interactive: (Default value = True) whether to install interactively
     :return: Nothing
     """
+    standard_install_from_resources([(resource_module, configuration_file_name)], interactive, batch=False)
+
+
+def standard_install_from_resources(resources, interactive=True, batch=True):
+    """
+    Install packages from several configuration files, merged into a single installation.
+
+    If a parent process already verified the same configurations and the environment has not changed since, nothing
+    is done: the configurations are read, but not parsed.
+
+    :param resources: a list of (resource_module, configuration_file_name) tuples
+    :param interactive: (Default value = True) whether to install interactively
+    :param batch: (Default value = True) whether the automatic installation tries a single transaction first
+    :return: Nothing
+    """
     if sys.version_info.minor < 10:
         import importlib_resources as pkg_resources
     else:
         import importlib.resources as pkg_resources
 
     from .DependencyManager import DependencyManager
+    from .verified_state import configuration_source_hash, is_verified, publish_verified_state
 
-    if not is_frozen():
-        with pkg_resources.files(resource_module).joinpath(configuration_file_name).open() as f:
-            dm = DependencyManager(config_file=f)
-        if interactive:
-            dm.install_interactive()
-        else:
-            dm.install_auto()
\ No newline at end of file
+    if is_frozen():
+        return
+
+    config_strings = [
+        pkg_resources.files(resource_module).joinpath(configuration_file_name).read_text()
+        for resource_module, configuration_file_name in resources
+    ]
+    source_hash = configuration_source_hash(config_strings)
+    if is_verified(source_hash, 'interactive' if interactive else 'required'):
+        return
+
+    managers = [DependencyManager(config_string=config_string) for config_string in config_strings]
+    dm = managers[0] if len(managers) == 1 else DependencyManager.merge(managers)
+    if interactive:
+        dm.install_interactive()
+        scopes = ('required', 'interactive')
+    else:
+        dm.install_auto(batch=batch)
+        scopes = ('required',)
+    if dm.use_verified_state:
+        publish_verified_state(source_hash, scopes)
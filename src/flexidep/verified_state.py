@@ -0,0 +1,97 @@
+"""
+Verified-state tokens, inherited by child processes through an environment variable.
+
+After a successful run, the dependency manager publishes a token for its configuration and for the fingerprint of the
+environment. Child processes (e.g. the workers of multiprocessing with the spawn start method, which re-import the
+main module) find the token in their environment and skip the configuration parsing and the module probes, as long as
+the environment has not changed since.
+"""
+
+import hashlib
+import os
+
+from .environment import environment_fingerprint
+from .ownership import environment_key
+
+VERIFIED_STATE_VARIABLE = 'FLEXIDEP_VERIFIED_STATE'
+
+# what a run guarantees: the required packages are installed (required), the optional ones too (optional), or they
+# were installed or declined by the user (interactive)
+VERIFIED_SCOPES = ('required', 'optional', 'interactive')
+
+
+def configuration_source_hash(config_strings):
+    """
+    Compute a hash of the text of one or more configurations, without parsing them.
+
+    :param config_strings: a list of configuration strings
+    :return: a hexadecimal string
+    """
+    digest = hashlib.sha256()
+    for config_string in config_strings:
+        digest.update(hashlib.sha256(config_string.encode('utf-8')).digest())
+    return digest.hexdigest()
+
+
+def verified_state_token(config_hash, scope, python_executable=None):
+    """
+    Compute the token of a configuration verified in the current state of an environment.
+
+    :param config_hash: a hash of the configuration (DependencyManager.config_hash or configuration_source_hash)
+    :param scope: one of VERIFIED_SCOPES
+    :param python_executable: the interpreter of the environment. Default: the current one
+    :return: a hexadecimal string
+    """
+    state = '\n'.join(
+        [
+            config_hash,
+            scope,
+            environment_key(python_executable),
+            environment_fingerprint(python_executable, site_packages_only=True),
+        ]
+    )
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()
+
+
+def _published_tokens():
+    """Return the tokens in the environment variable."""
+    return [token for token in os.environ.get(VERIFIED_STATE_VARIABLE, '').split(',') if token]
+
+
+def is_verified(config_hash, scope, python_executable=None):
+    """
+    Check if a configuration was verified by this process or by a parent process in the current environment state.
+
+    :param config_hash: a hash of the configuration (DependencyManager.config_hash or configuration_source_hash)
+    :param scope: one of VERIFIED_SCOPES
+    :param python_executable: the interpreter of the environment. Default: the current one
+    :return: True if a matching token was published
+    """
+    tokens = _published_tokens()
+    if not tokens:
+        return False
+    return verified_state_token(config_hash, scope, python_executable) in tokens
+
+
+def publish_verified_state(config_hash, scopes, python_executable=None):
+    """
+    Publish the tokens of a verified configuration in the environment variable, inherited by the child processes
+    started afterwards.
+
+    :param config_hash: a hash of the configuration (DependencyManager.config_hash or configuration_source_hash)
+    :param scopes: the scopes guaranteed by the run, a subset of VERIFIED_SCOPES
+    :param python_executable: the interpreter of the environment. Default: the current one
+    :return: Nothing
+    """
+    tokens = _published_tokens()
+    tokens += [verified_state_token(config_hash, scope, python_executable) for scope in scopes]
+    os.environ[VERIFIED_STATE_VARIABLE] = ','.join(dict.fromkeys(tokens))
+
+
+def clear_verified_state():
+    """
+    Remove the published tokens, so that this process and its future children verify the configurations again.
+
+    :return: Nothing
+    """
+    os.environ.pop(VERIFIED_STATE_VARIABLE, None)
@@ -0,0 +1,251 @@
+"""
+Watching the environment for installed or removed packages, for long-running processes.
+
+On Linux, the directories are watched with inotify (through ctypes). On other systems, or if inotify is not available,
+their modification times are polled.
+"""
+
+import ctypes
+import ctypes.util
+import importlib
+import os
+import select
+import struct
+import sys
+import threading
+
+from .environment import directory_state, invalidate_environment_caches
+
+# inotify constants, from sys/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# names whose changes do not mean that packages were installed or removed
+_IGNORED_NAMES = ('__pycache__',)
+
+
+def watched_directories():
+    """
+    Get the directories whose changes mean that packages were installed or removed.
+
+    :return: a list of paths: the site-packages directories in sys.path, and the conda-meta directory if present
+    """
+    directories = [
+        path
+        for path in sys.path
+        if os.path.basename(path) in ('site-packages', 'dist-packages') and os.path.isdir(path)
+    ]
+    conda_meta = os.path.join(sys.prefix, 'conda-meta')
+    if os.path.isdir(conda_meta):
+        directories.append(conda_meta)
+    return list(dict.fromkeys(directories))
+
+
+class _Inotify:
+    """A minimal wrapper of the inotify API."""
+
+    def __init__(self):
+        """Create the inotify instance. Raises OSError if inotify is not available."""
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+
+    def add_watch(self, path):
+        """Watch a directory."""
+        watch_descriptor = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if watch_descriptor < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {path}')
+        self.watches[watch_descriptor] = path
+
+    def read_events(self, timeout):
+        """
+        Wait for events.
+
+        :param timeout: the maximum waiting time in seconds
+        :return: a list of changed paths. If events were lost, all the watched directories are returned
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buffer = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        changed = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            watch_descriptor, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                return list(self.watches.values())
+            if name in _IGNORED_NAMES or watch_descriptor not in self.watches:
+                continue
+            changed.append(os.path.join(self.watches[watch_descriptor], name))
+        return changed
+
+    def close(self):
+        """Close the inotify instance."""
+        os.close(self.fd)
+
+
+class EnvironmentWatcher:
+    """
+    Watch the environment, invalidating the caches that depend on the installed packages when it changes.
+
+    The callbacks are called from the watcher thread with the list of changed paths, once per burst of changes (an
+    installation changes many files: the changes are collected for the debounce time before being reported).
+
+    Can be used as a context manager.
+    """
+
+    def __init__(self, directories=None, callback=None, use_inotify=True, poll_interval=2.0, debounce=0.5):
+        """
+        Initialize the watcher.
+
+        :param directories: the directories to watch. Default: watched_directories()
+        :param callback: optional function called with the list of changed paths when the environment changes
+        :param use_inotify: if False, the directories are always polled
+        :param poll_interval: the interval between two checks in seconds, when polling
+        :param debounce: the time in seconds during which changes are collected before being reported
+        """
+        self.directories = list(directories) if directories is not None else watched_directories()
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.use_inotify = use_inotify
+        self.method = None
+        self._callbacks = [callback] if callback is not None else []
+        self._callbacks_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        """Start watching."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop watching."""
+        self.stop()
+        return False
+
+    def add_callback(self, callback):
+        """
+        Add a function called with the list of changed paths when the environment changes.
+
+        :param callback: the function
+        :return: Nothing
+        """
+        with self._callbacks_lock:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """
+        Remove a callback.
+
+        :param callback: the function
+        :return: Nothing
+        """
+        with self._callbacks_lock:
+            self._callbacks.remove(callback)
+
+    def start(self):
+        """
+        Start watching in a background thread.
+
+        :return: Nothing
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = _Inotify()
+                for directory in self.directories:
+                    inotify.add_watch(directory)
+            except (OSError, AttributeError) as e:
+                print(f'Warning: inotify not available ({e}), polling the environment')
+                if inotify is not None:
+                    inotify.close()
+                inotify = None
+        self.method = 'polling' if inotify is None else 'inotify'
+        self._thread = threading.Thread(target=self._run, args=(inotify,), name='flexidep-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop watching.
+
+        :return: Nothing
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, inotify):
+        """Body of the watcher thread."""
+        try:
+            if inotify is None:
+                self._poll()
+            else:
+                self._watch_inotify(inotify)
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _watch_inotify(self, inotify):
+        """Wait for inotify events until stopped."""
+        while not self._stop_event.is_set():
+            changed = inotify.read_events(self.poll_interval)
+            if not changed:
+                continue
+            # collect the rest of the burst
+            while not self._stop_event.is_set():
+                more_changes = inotify.read_events(self.debounce)
+                if not more_changes:
+                    break
+                changed += more_changes
+            self._notify(changed)
+
+    def _poll(self):
+        """Check the modification times of the directories until stopped."""
+        states = {directory: directory_state(directory) for directory in self.directories}
+        while not self._stop_event.wait(self.poll_interval):
+            new_states = {directory: directory_state(directory) for directory in self.directories}
+            changed = [directory for directory in self.directories if new_states[directory] != states[directory]]
+            states = new_states
+            if changed:
+                self._notify(changed)
+
+    def _notify(self, changed):
+        """Invalidate the caches and call the callbacks."""
+        changed = list(dict.fromkeys(changed))
+        invalidate_environment_caches()
+        importlib.invalidate_caches()
+        with self._callbacks_lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(changed)
+            except Exception as e:  # pylint: disable=broad-except
+                print(f'Error in environment watcher callback: {e}')
@@ -0,0 +1,69 @@
+"""Common fixtures of the tests."""
+
+import json
+import os
+import stat
+import sys
+import tempfile
+
+# the configuration directory of flexidep (history, caches, records) is created at import time: use a temporary one
+os.environ['XDG_CONFIG_HOME'] = tempfile.mkdtemp(prefix='flexidep-tests-')
+
+import pytest  # noqa: E402 pylint: disable=wrong-import-position
+
+STUB_SCRIPT = '''#!{python}
+import json, os, sys
+with open(os.environ['FLEXIDEP_STUB_LOG'], 'a', encoding='utf-8') as fd:
+    fd.write(json.dumps([os.path.basename(sys.argv[0])] + sys.argv[1:]) + '\\n')
+if sys.argv[1:2] == ['-c']:
+    # the prefix query of the conda backends
+    print(os.path.dirname(os.path.abspath(sys.argv[0])))
+'''
+
+
+class StubExecutables:
+    """A directory of stub executables recording their command lines."""
+
+    def __init__(self, directory):
+        """
+        Initialize the stubs.
+
+        :param directory: the directory of the stubs, added to PATH
+        """
+        self.directory = str(directory)
+        self.log_file = os.path.join(self.directory, 'commands.log')
+
+    def create(self, name):
+        """
+        Create a stub executable.
+
+        :param name: the name of the executable
+        :return: its path
+        """
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as fd:
+            fd.write(STUB_SCRIPT.format(python=sys.executable))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        return path
+
+    def commands(self):
+        """
+        Get the recorded command lines.
+
+        :return: a list of lists of strings, the first one being the name of the stub
+        """
+        try:
+            with open(self.log_file, encoding='utf-8') as fd:
+                return [json.loads(line) for line in fd]
+        except FileNotFoundError:
+            return []
+
+
+@pytest.fixture
+def stubs(tmp_path, monkeypatch):
+    """Stub executables in a directory put first in PATH."""
+    stub_executables = StubExecutables(tmp_path)
+    monkeypatch.setenv('PATH', stub_executables.directory + os.pathsep + os.environ.get('PATH', ''))
+    monkeypatch.setenv('FLEXIDEP_STUB_LOG', stub_executables.log_file)
+    monkeypatch.delenv('UV', raising=False)
+    return stub_executables
@@ -0,0 +1,147 @@
+"""Tests of the asyncio installation."""
+
+import asyncio
+import sys
+import threading
+
+from flexidep import DependencyManager, PackageManagers, installers
+from flexidep.aio import AsyncHTTPClient, ensure_async, iter_install_alternative, iter_install_auto
+from flexidep.core import process_alternatives
+
+
+async def _collect(iterator):
+    return [event async for event in iterator]
+
+
+def test_iter_install_auto_uses_constraints(stubs, monkeypatch, tmp_path):
+    python = stubs.create('python')
+    monkeypatch.setattr(installers.PipBackend, 'pip_command', lambda self: [python, '-m', 'pip'])
+    constraints = str(tmp_path / 'constraints.txt')
+    dm = DependencyManager(
+        config_string=(
+            '[Global]\nid = flexidep-tests-aio\nconstraints = yes\nrelax constraints = relaxed_stub_module\n'
+            '[Packages]\nflexidep_stub_module = flexidep-stub-package\n'
+            'relaxed_stub_module = relaxed-stub-package\n'
+        ),
+        interactive_initialization=False,
+    )
+    dm.record_history = False
+    monkeypatch.setattr(dm, 'get_constraints_file', lambda: constraints)
+
+    events = asyncio.run(_collect(iter_install_auto(dm)))
+    assert [event.text for event in events if event.kind == 'status'] == [
+        'installing flexidep-stub-package',
+        'installed',
+        'installing relaxed-stub-package',
+        'installed',
+    ]
+    installs = [command for command in stubs.commands() if command[1:4] == ['-m', 'pip', 'install']]
+    assert installs == [
+        ['python', '-m', 'pip', 'install', '-c', constraints, 'flexidep-stub-package'],
+        ['python', '-m', 'pip', 'install', 'relaxed-stub-package'],
+    ]
+
+
+def test_install_checks_run_outside_the_event_loop(stubs, monkeypatch):
+    python = stubs.create('python')
+    monkeypatch.setattr(installers.PipBackend, 'pip_command', lambda self: [python, '-m', 'pip'])
+    check_threads = []
+
+    def plan_install(self, packages, extra_command_line=''):
+        check_threads.append(threading.current_thread())
+        return list(packages)
+
+    monkeypatch.setattr(installers.PipBackend, 'plan_install', plan_install)
+    dependencies = process_alternatives('flexidep-stub-package ++extra-stub-package')['flexidep-stub-package']
+    backend = installers.get_backend(PackageManagers.pip)
+    events = asyncio.run(_collect(iter_install_alternative(backend, 'stub', 'flexidep-stub-package', dependencies)))
+    assert events[-1].text == 'installed'
+    assert len(check_threads) == 2
+    assert threading.main_thread() not in check_threads
+
+
+def test_ensure_async_does_not_block_the_loop(monkeypatch, tmp_path):
+    (tmp_path / 'flexidep_slow_module.py').write_text('import time\ntime.sleep(1)\nVALUE = 42\n', encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'flexidep_slow_module', raising=False)
+
+    async def run():
+        ticks = 0
+        task = asyncio.ensure_future(ensure_async('flexidep_slow_module'))
+        while not task.done():
+            await asyncio.sleep(0.05)
+            ticks += 1
+        return task.result(), ticks
+
+    module, ticks = asyncio.run(run())
+    sys.modules.pop('flexidep_slow_module', None)
+    assert module.VALUE == 42
+    # the loop kept running during the import of about one second
+    assert ticks >= 10
+
+
+class RawServer:
+    """A server sending fixed raw responses, one per connection, and counting the connections."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        while self.responses:
+            request = await reader.readuntil(b'\r\n\r\n')
+            if not request:
+                break
+            response, close = self.responses.pop(0)
+            writer.write(response)
+            await writer.drain()
+            if close:
+                break
+        writer.close()
+
+
+async def _raw_requests(responses, count):
+    raw_server = RawServer(responses)
+    server = await asyncio.start_server(raw_server.handle, '127.0.0.1', 0)
+    url = f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}/pypi/demo/json'
+    try:
+        async with AsyncHTTPClient() as client:
+            results = [await client.request(url) for _ in range(count)]
+    finally:
+        server.close()
+        await server.wait_closed()
+    return results, raw_server.connections
+
+
+def test_body_until_connection_close():
+    body = b'{"releases": {}}'
+    results, connections = asyncio.run(
+        _raw_requests(
+            [
+                (b'HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n' + body, True),
+                (b'HTTP/1.1 200 OK\r\nConnection: close\r\n\r\n' + body, True),
+            ],
+            2,
+        )
+    )
+    assert [(status, response_body) for status, _, response_body in results] == [(200, body), (200, body)]
+    # the connections without framing are not reused
+    assert connections == 2
+
+
+def test_responses_without_body():
+    body = b'{}'
+    results, connections = asyncio.run(
+        _raw_requests(
+            [
+                (b'HTTP/1.1 103 Early Hints\r\nLink: </style.css>\r\n\r\nHTTP/1.1 204 No Content\r\n\r\n', False),
+                (b'HTTP/1.1 304 Not Modified\r\nETag: "x"\r\n\r\n', False),
+                (b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n' + body, False),
+            ],
+            3,
+        )
+    )
+    assert [(status, response_body) for status, _, response_body in results] == [(204, b''), (304, b''), (200, body)]
+    # the connection is kept for the next requests
+    assert connections == 1
@@ -0,0 +1,37 @@
+"""Tests of the configuration processing helpers."""
+
+from flexidep.core import PackageList, plan_alternatives_matrix, target_environment
+
+
+def test_plan_matrix_drops_uninstalled_alternatives():
+    packages = {
+        'cv2': ['opencv-python-headless, opencv-python; sys_platform == "win32"'],
+        'PIL': ['pillow'],
+    }
+    environments = {'linux': target_environment(sys_platform='linux'), 'win': target_environment(sys_platform='win32')}
+    matrix = plan_alternatives_matrix(packages, environments, ['opencv_python_headless'])
+    assert list(matrix['linux']['cv2']) == ['opencv-python-headless']
+    assert list(matrix['win']['cv2']) == ['opencv-python']
+    assert list(matrix['win']['PIL']) == ['pillow']
+
+
+def test_package_list_extend_with_itself():
+    packages = PackageList(['numpy', 'scipy'])
+    assert 'numpy' in packages
+    packages.extend(packages)
+    assert packages == ['numpy', 'scipy', 'numpy', 'scipy']
+    packages += packages
+    assert len(packages) == 8
+    assert packages.position('scipy') == 1
+
+
+def test_package_list_index_follows_changes():
+    packages = PackageList(['numpy'])
+    assert packages.position('numpy') == 0
+    packages.extend(iter(['scipy', 'numpy', 'torch']))
+    assert packages.position('torch') == 3
+    packages.insert(0, 'torch')
+    assert packages.position('torch') == 0
+    del packages[0]
+    assert packages.position('torch') == 3
+    assert 'pandas' not in packages
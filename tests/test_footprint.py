@@ -0,0 +1,56 @@
+"""Tests of the download sizes of the alternatives."""
+
+import sys
+
+import pytest
+
+from flexidep import footprint
+from flexidep.core import process_alternatives
+from flexidep.footprint import alternatives_footprint, interpreter_tags, select_distribution_file
+
+PROJECT = {
+    'releases': {
+        '1.0': [
+            {'filename': 'demo-1.0-cp39-cp39-win_amd64.whl', 'size': 100, 'packagetype': 'bdist_wheel'},
+            {'filename': 'demo-1.0-py3-none-any.whl', 'size': 300, 'packagetype': 'bdist_wheel'},
+            {'filename': 'demo-1.0.tar.gz', 'size': 500, 'packagetype': 'sdist'},
+        ]
+    }
+}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(footprint, 'FOOTPRINT_CACHE_FILE', str(tmp_path / 'footprint.json'))
+    footprint.clear_footprint_cache()
+
+
+def test_failed_lookups_cached_for_the_session(monkeypatch):
+    requests = []
+
+    def fetch_project(name):
+        requests.append(name)
+        raise OSError('unreachable')
+
+    monkeypatch.setattr(footprint, '_fetch_project', fetch_project)
+    alternatives = process_alternatives('demo, Demo>=1.0')
+    assert alternatives_footprint(alternatives, max_workers=1) == {'demo': None, 'Demo>=1.0': None}
+    assert alternatives_footprint(alternatives, max_workers=1) == {'demo': None, 'Demo>=1.0': None}
+    assert requests == ['demo']
+
+    footprint.clear_footprint_cache()
+    alternatives_footprint(alternatives, max_workers=1)
+    assert requests == ['demo', 'demo']
+
+
+def test_target_interpreter_tags(monkeypatch):
+    windows_tags = ('cp39-cp39-win_amd64', 'cp39-none-win_amd64', 'py3-none-any')
+    monkeypatch.setattr(footprint, 'interpreter_tags', lambda python_executable=None: windows_tags)
+    selected = select_distribution_file(PROJECT, footprint.Requirement('demo'), '/windows/python.exe')
+    assert selected['filename'] == 'demo-1.0-cp39-cp39-win_amd64.whl'
+
+
+def test_current_interpreter_tags():
+    assert interpreter_tags(sys.executable) == interpreter_tags()
+    selected = select_distribution_file(PROJECT, footprint.Requirement('demo'))
+    assert selected['filename'] == 'demo-1.0-py3-none-any.whl'
@@ -0,0 +1,42 @@
+"""Tests of the installation history."""
+
+import sys
+from collections import OrderedDict
+
+from flexidep import history
+from flexidep.history import order_alternatives_by_cost, platform_key
+
+
+def _record(attempts, successes, durations):
+    return {'attempts': attempts, 'successes': successes, 'durations': durations}
+
+
+def test_successful_alternatives_first():
+    alternatives = OrderedDict((alternative, None) for alternative in ['a', 'b', 'c', 'd', 'e'])
+    saved_history = {
+        platform_key(): {
+            'pkg': {
+                'b': _record(2, 0, []),
+                'c': _record(2, 2, [10.0, 10.0]),
+                'e': _record(2, 1, [2.0]),
+            }
+        }
+    }
+    ordered = order_alternatives_by_cost('pkg', alternatives, saved_history)
+    assert list(ordered) == ['e', 'c', 'a', 'd', 'b']
+
+
+def test_history_keyed_by_target_platform(monkeypatch, tmp_path):
+    markers = {'sys_platform': 'win32', 'platform_machine': 'AMD64', 'python_version': '3.9'}
+    monkeypatch.setattr(history, 'target_marker_environment', lambda python_executable: markers)
+    monkeypatch.setattr(history, 'HISTORY_FILE', str(tmp_path / 'history.json'))
+    assert platform_key('/other/python') == 'win32-AMD64-py3.9'
+
+    history.record_install_outcome('pkg', 'b', True, 1.0, '/other/python')
+    assert list(history.load_history()) == ['win32-AMD64-py3.9']
+    alternatives = OrderedDict([('a', None), ('b', None)])
+    assert list(order_alternatives_by_cost('pkg', alternatives, python_executable='/other/python')) == ['b', 'a']
+
+
+def test_current_platform_key():
+    assert platform_key(sys.executable) == platform_key()
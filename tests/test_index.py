@@ -0,0 +1,255 @@
+"""Tests of the index queries, against a local stub of the json API of the index."""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from packaging.version import Version
+
+from flexidep import utils
+from flexidep.aio import IndexClient
+from flexidep.utils import clear_pypi_cache, get_pypi_available_versions
+
+RELEASES = {'1.0': [], '1.1': [], '2.0rc1': []}
+EXPECTED_VERSIONS = [Version('2.0rc1'), Version('1.1'), Version('1.0')]
+
+
+class StubIndex(ThreadingHTTPServer):
+    """
+    A stub of the json API of the index, answering /pypi/<name>/json according to the name: missing-* projects are
+    not found, slow-* projects answer after a delay, limited-* projects answer 429 with Retry-After to their first
+    request, and the other ones answer immediately.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', slow_delay=0.5, retry_after='0.3'):
+        super().__init__((host, 0), StubIndexHandler)
+        self.slow_delay = slow_delay
+        self.retry_after = retry_after
+        self.requests = []
+        self.hosts = set()
+        self.concurrency = 0
+        self.max_concurrency = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url(self):
+        host = self.server_address[0]
+        if ':' in host:
+            host = f'[{host}]'
+        return f'http://{host}:{self.server_address[1]}/pypi'
+
+    def requested(self, name):
+        """Return the number of requests for a project."""
+        with self.lock:
+            return sum(1 for requested_name in self.requests if requested_name == name)
+
+
+class StubIndexHandler(BaseHTTPRequestHandler):
+    """The handler of the requests of the stub index."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        name = self.path.split('/')[2]
+        server = self.server
+        with server.lock:
+            first_request = name not in server.requests
+            server.requests.append(name)
+            server.hosts.add(self.headers['Host'])
+            server.concurrency += 1
+            server.max_concurrency = max(server.max_concurrency, server.concurrency)
+        try:
+            if name.startswith('slow-'):
+                time.sleep(server.slow_delay)
+            if name.startswith('missing-'):
+                self._answer(404, b'{"message": "Not Found"}')
+            elif name.startswith('limited-') and first_request:
+                self._answer(429, b'{}', {'Retry-After': server.retry_after})
+            else:
+                self._answer(200, json.dumps({'info': {'name': name}, 'releases': RELEASES}).encode())
+        finally:
+            with server.lock:
+                server.concurrency -= 1
+
+    def _answer(self, status, body, headers=None):
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up, e.g. the loser of a duplicated request
+            pass
+
+
+def _start_index(**kwargs):
+    index = StubIndex(**kwargs)
+    index.thread.start()
+    return index
+
+
+@pytest.fixture
+def index():
+    stub_index = _start_index()
+    yield stub_index
+    stub_index.shutdown()
+    stub_index.server_close()
+
+
+@pytest.fixture
+def dead_mirror():
+    """The url of a mirror refusing the connections."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/pypi'
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Forget the cached answers and the state of the mirrors, and shorten the delays."""
+    monkeypatch.setattr(utils, 'PYPI_RETRY_DELAY', 0.05)
+    clear_pypi_cache()
+    yield
+    clear_pypi_cache()
+
+
+def test_sync_versions(index):
+    assert get_pypi_available_versions('demo', [index.url]) == EXPECTED_VERSIONS
+    assert get_pypi_available_versions('missing-demo', [index.url]) == []
+    # cached, including the projects that are not on the index
+    assert get_pypi_available_versions('demo', [index.url]) == EXPECTED_VERSIONS
+    assert get_pypi_available_versions('missing-demo', [index.url]) == []
+    assert index.requests == ['demo', 'missing-demo']
+
+
+def test_sync_retry_after(index):
+    start_time = time.monotonic()
+    assert get_pypi_available_versions('limited-demo', [index.url]) == EXPECTED_VERSIONS
+    assert time.monotonic() - start_time >= 0.3
+    assert index.requested('limited-demo') == 2
+    # a rate limitation is not a failure of the mirror
+    assert not utils._pypi_mirror_failures  # pylint: disable=protected-access
+
+
+def test_sync_failing_mirror_is_demoted(index, dead_mirror):
+    assert get_pypi_available_versions('first', [dead_mirror, index.url]) == EXPECTED_VERSIONS
+    # the dead mirror is now tried after the working one
+    start_time = time.monotonic()
+    for number in range(20):
+        assert get_pypi_available_versions(f'package-{number}', [dead_mirror, index.url]) == EXPECTED_VERSIONS
+    assert time.monotonic() - start_time < 2
+    assert len(index.requests) == 21
+    assert utils._pypi_mirror_failures[dead_mirror][0] == 1  # pylint: disable=protected-access
+
+
+def test_sync_unreachable_index_is_skipped(dead_mirror):
+    assert get_pypi_available_versions('first', [dead_mirror]) is None
+    assert utils._pypi_mirror_failures[dead_mirror][0] == utils.PYPI_MAX_ATTEMPTS  # pylint: disable=protected-access
+    # the next queries do not wait for the index until the cooldown has passed
+    start_time = time.monotonic()
+    assert all(get_pypi_available_versions(f'package-{number}', [dead_mirror]) is None for number in range(100))
+    assert time.monotonic() - start_time < 0.1
+
+
+def test_sync_timeout_follows_latencies(monkeypatch):
+    slow_index = _start_index(slow_delay=3)
+    try:
+        for number in range(10):
+            get_pypi_available_versions(f'package-{number}', [slow_index.url])
+        assert utils._pypi_query_timeout() == utils.PYPI_MIN_TIMEOUT  # pylint: disable=protected-access
+        monkeypatch.setattr(utils, 'PYPI_MAX_ATTEMPTS', 1)
+        start_time = time.monotonic()
+        assert get_pypi_available_versions('slow-package', [slow_index.url]) is None
+        assert time.monotonic() - start_time < utils.PYPI_MIN_TIMEOUT + 1
+    finally:
+        slow_index.shutdown()
+        slow_index.server_close()
+
+
+async def _query(packages, **client_options):
+    async with IndexClient(**client_options) as client:
+        results = await asyncio.gather(*(client.get_versions(package) for package in packages))
+    return dict(zip(packages, results)), client.statistics
+
+
+def test_async_results_and_statistics(index):
+    packages = ['demo', 'missing-demo', 'limited-demo']
+    results, statistics = asyncio.run(_query(packages, mirrors=[index.url], hedge_delay=None))
+    assert results == {'demo': EXPECTED_VERSIONS, 'missing-demo': [], 'limited-demo': EXPECTED_VERSIONS}
+    assert statistics['requests'] == 4
+    assert statistics['rate_limited'] == 1
+    assert statistics['failed'] == 0
+    assert statistics['unknown'] == 0
+
+
+def test_async_dead_mirror(index, dead_mirror):
+    packages = [f'package-{number}' for number in range(30)]
+    results, statistics = asyncio.run(_query(packages, mirrors=[dead_mirror, index.url], hedge_delay=None))
+    assert all(versions == EXPECTED_VERSIONS for versions in results.values())
+    assert statistics['unknown'] == 0
+    assert 0 < statistics['failed'] < len(packages)
+    assert len(index.requests) == len(packages)
+
+
+def test_async_unreachable_index(dead_mirror):
+    results, statistics = asyncio.run(_query(['demo'], mirrors=[dead_mirror], hedge_delay=None, max_attempts=2))
+    assert results == {'demo': None}
+    assert statistics['failed'] == 2
+    assert statistics['unknown'] == 1
+
+
+def test_async_slow_answers_are_hedged(index):
+    packages = ['slow-demo'] + [f'package-{number}' for number in range(5)]
+    results, statistics = asyncio.run(_query(packages, mirrors=[index.url], hedge_delay=0.1))
+    assert all(versions == EXPECTED_VERSIONS for versions in results.values())
+    assert statistics['hedged'] >= 1
+    assert index.requested('slow-demo') == 2
+
+
+def test_async_rate_limit_bounds_concurrency(index):
+    index.retry_after = '0.2'
+    packages = [f'limited-{number}' for number in range(40)]
+    results, statistics = asyncio.run(_query(packages, mirrors=[index.url], max_connections=8, hedge_delay=None))
+    assert all(versions == EXPECTED_VERSIONS for versions in results.values())
+    assert statistics['rate_limited'] >= 1
+    assert index.max_concurrency <= 8
+
+
+def test_host_header(index):
+    asyncio.run(_query(['demo'], mirrors=[index.url], hedge_delay=None))
+    assert index.hosts == {f'127.0.0.1:{index.server_address[1]}'}
+
+
+def test_host_header_ipv6():
+    if not socket.has_ipv6:
+        pytest.skip('IPv6 is not supported')
+
+    class StubIndex6(StubIndex):
+        address_family = socket.AF_INET6
+
+    try:
+        index6 = StubIndex6(host='::1')
+    except OSError:
+        pytest.skip('IPv6 loopback is not available')
+    index6.thread.start()
+    try:
+        results, _ = asyncio.run(_query(['demo'], mirrors=[index6.url], hedge_delay=None))
+        assert results == {'demo': EXPECTED_VERSIONS}
+        assert index6.hosts == {f'[::1]:{index6.server_address[1]}'}
+    finally:
+        index6.shutdown()
+        index6.server_close()
@@ -0,0 +1,139 @@
+"""Tests of the package manager backends, with stub executables."""
+
+import sys
+from collections import OrderedDict
+
+import pytest
+
+from flexidep import DependencyManager, PackageManagers, installers
+from flexidep.installers import (
+    ExternalPackageManager,
+    InstallerBackend,
+    get_backend,
+    get_registered_package_managers,
+    register_backend,
+    resolve_package_manager,
+)
+
+PACKAGE = 'flexidep-stub-package'
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Restore the backend registry after the test."""
+    monkeypatch.setattr(installers, '_backends', OrderedDict(installers._backends))
+
+
+def test_pip_commands(stubs):
+    python = stubs.create('python')
+    backend = get_backend(PackageManagers.pip, python)
+    assert backend.install([PACKAGE], install_local=True, extra_command_line='--no-deps')
+    assert backend.uninstall([PACKAGE])
+    assert stubs.commands() == [
+        ['python', '-m', 'pip', 'install', '--user', '--no-deps', PACKAGE],
+        ['python', '-m', 'pip', 'uninstall', '-y', PACKAGE],
+    ]
+
+
+def test_uv_commands(stubs):
+    python = stubs.create('python')
+    stubs.create('uv')
+    backend = get_backend(PackageManagers.uv, python)
+    assert backend.install([PACKAGE])
+    assert backend.uninstall([PACKAGE])
+    assert stubs.commands() == [
+        ['uv', 'pip', 'install', '--python', python, PACKAGE],
+        ['uv', 'pip', 'uninstall', '--python', python, PACKAGE],
+    ]
+
+
+def test_conda_commands(stubs, monkeypatch):
+    python = stubs.create('python')
+    monkeypatch.setenv('CONDA_EXE', stubs.create('conda'))
+    backend = get_backend(PackageManagers.conda, python)
+    assert backend.install([PACKAGE], extra_command_line='-c conda-forge')
+    assert backend.is_installed(PACKAGE) is None
+    assert get_backend(PackageManagers.conda, python).uninstall([PACKAGE])
+    # the prefix of the environment is queried once
+    assert [command for command in stubs.commands() if command[0] == 'python'] == [
+        ['python', '-c', 'import sys; print(sys.prefix)']
+    ]
+    # the environment is changed by the current conda, with its prefix
+    assert [command for command in stubs.commands() if command[0] == 'conda'] == [
+        ['conda', 'install', '-y', '-p', stubs.directory, '-c', 'conda-forge', PACKAGE],
+        ['conda', 'remove', '-y', '-p', stubs.directory, PACKAGE],
+    ]
+
+
+def test_conda_current_environment():
+    backend = get_backend(PackageManagers.conda)
+    assert backend.install_command([PACKAGE]) == [sys.executable, '-m', 'conda', 'install', '-y', PACKAGE]
+    assert backend.prefix() == sys.prefix
+
+
+def test_mamba_commands(stubs):
+    python = stubs.create('python')
+    stubs.create('micromamba')
+    backend = get_backend(PackageManagers.mamba, python)
+    assert backend.is_available()
+    assert backend.install([PACKAGE])
+    assert backend.uninstall([PACKAGE])
+    commands = [command for command in stubs.commands() if command[0] == 'micromamba']
+    assert commands == [
+        ['micromamba', 'install', '-y', '-p', stubs.directory, PACKAGE],
+        ['micromamba', 'remove', '-y', '-p', stubs.directory, PACKAGE],
+    ]
+
+
+def test_failing_command(stubs):
+    backend = get_backend(PackageManagers.pip, stubs.create('python'))
+    backend.pip_command = lambda: ['false']
+    assert not backend.install([PACKAGE])
+
+
+def test_aliases():
+    assert resolve_package_manager(' Micromamba ') is PackageManagers.mamba
+    assert resolve_package_manager('PIP') is PackageManagers.pip
+    with pytest.raises(KeyError):
+        resolve_package_manager('unknown')
+
+
+class StubToolBackend(InstallerBackend):
+    """A third-party backend running a stub tool."""
+
+    aliases = ('stubtool2',)
+
+    def install_command(self, packages, install_local=False, extra_command_line=''):
+        return ['stubtool', 'add'] + list(packages)
+
+    def uninstall_command(self, packages):
+        return ['stubtool', 'remove'] + list(packages)
+
+
+def test_register_new_package_manager(stubs, registry):
+    stubs.create('stubtool')
+    package_manager = register_backend('stubtool', StubToolBackend)
+    assert package_manager == ExternalPackageManager('stubtool')
+    assert package_manager in get_registered_package_managers()
+    assert resolve_package_manager('stubtool2') == package_manager
+    assert isinstance(get_backend('stubtool'), StubToolBackend)
+    assert get_backend(package_manager).install([PACKAGE])
+    assert stubs.commands() == [['stubtool', 'add', PACKAGE]]
+
+    dm = DependencyManager(
+        config_string=(
+            '[Global]\npackage manager = stubtool\n'
+            '[Packages]\ncommon_module = common-package\n'
+            '[Stubtool]\nstub_module = stub-package\n'
+            '[Pip]\npip_module = pip-package\n'
+        ),
+        interactive_initialization=False,
+    )
+    assert dm.package_manager == package_manager
+    assert list(dm.get_packages_to_install()) == ['common_module', 'stub_module']
+
+
+def test_register_builtin_by_name(registry):
+    assert register_backend('pip', installers.PipBackend) is PackageManagers.pip
+    with pytest.raises(ValueError):
+        register_backend('common', installers.PipBackend)
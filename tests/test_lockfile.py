@@ -0,0 +1,23 @@
+"""Tests of the lock files."""
+
+from flexidep.lockfile import distribution_closure
+
+DISTRIBUTIONS = [
+    {
+        'name': 'App',
+        'version': '1.0',
+        'requires': ['colorama; sys_platform == "win32"', 'six', 'extra-dep; extra == "x"'],
+    },
+    {'name': 'colorama', 'version': '0.4', 'requires': []},
+    {'name': 'six', 'version': '1.16', 'requires': []},
+    {'name': 'extra-dep', 'version': '2.0', 'requires': []},
+]
+
+
+def test_closure_uses_target_environment():
+    assert distribution_closure(['app'], DISTRIBUTIONS, {'sys_platform': 'linux'}) == ['app', 'six']
+    assert distribution_closure(['app'], DISTRIBUTIONS, {'sys_platform': 'win32'}) == ['app', 'colorama', 'six']
+
+
+def test_closure_extras():
+    assert distribution_closure(['app[x]'], DISTRIBUTIONS, {'sys_platform': 'linux'}) == ['app', 'six', 'extra-dep']
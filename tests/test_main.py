@@ -0,0 +1,47 @@
+"""Tests of the command line interface."""
+
+import pytest
+
+from flexidep import DependencyManager
+from flexidep.__main__ import EXIT_CONFIG_ERROR, EXIT_OK, main
+from flexidep.exceptions import ConfigurationError
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'dependencies.cfg'
+    path.write_text('[Global]\nid = flexidep-tests\n[Packages]\nos = os-package\n', encoding='utf-8')
+    return str(path)
+
+
+def test_check(config_file):
+    assert main(['check', config_file]) == EXIT_OK
+
+
+def test_unknown_package_manager(config_file, capsys):
+    assert main(['check', config_file, '--package-manager', 'unknown']) == EXIT_CONFIG_ERROR
+    assert 'Unknown package manager unknown' in capsys.readouterr().err
+
+
+def test_missing_configuration(tmp_path):
+    assert main(['check', str(tmp_path / 'missing.cfg')]) == EXIT_CONFIG_ERROR
+
+
+def test_invalid_configuration(tmp_path):
+    path = tmp_path / 'invalid.cfg'
+    path.write_text('[Packages]\nno section header\n', encoding='utf-8')
+    assert main(['check', str(path)]) == EXIT_CONFIG_ERROR
+
+
+def test_unknown_package_manager_argument():
+    with pytest.raises(ConfigurationError):
+        DependencyManager(package_manager='unknown')
+
+
+def test_internal_errors_are_not_configuration_errors(config_file, monkeypatch):
+    def command_check(args):
+        raise KeyError('bug')
+
+    monkeypatch.setattr('flexidep.__main__.command_check', command_check)
+    with pytest.raises(KeyError):
+        main(['check', config_file])
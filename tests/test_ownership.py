@@ -0,0 +1,56 @@
+"""Tests of the record of the installed distributions and of prune."""
+
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+from flexidep import DependencyManager, ownership
+from flexidep.exceptions import ConfigurationError
+from flexidep.ownership import environment_ownership, record_installed
+
+# the module, shadowed by the class in the flexidep package
+dependency_manager_module = importlib.import_module('flexidep.DependencyManager')
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch, tmp_path):
+    """An empty record, and an environment where pkg-a, pkg-b and shared-dep are installed."""
+    monkeypatch.setattr(ownership, 'OWNERSHIP_FILE', str(tmp_path / 'installed_distributions.json'))
+    distributions = {
+        'pkg-a': SimpleNamespace(requires=['shared-dep']),
+        'pkg-b': SimpleNamespace(requires=['shared-dep']),
+        'shared-dep': SimpleNamespace(requires=[]),
+    }
+    monkeypatch.setattr(dependency_manager_module, 'installed_distributions', lambda python_executable: distributions)
+
+
+def _manager(unique_id, packages):
+    config = f'[Global]\nid = {unique_id}\n' if unique_id else ''
+    config += '[Packages]\n' + ''.join(f'{module} = {package}\n' for module, package in packages.items())
+    return DependencyManager(config_string=config, interactive_initialization=False)
+
+
+def test_configurations_sharing_an_environment():
+    record_installed('config-a', 'mod_a', 'pkg-a', ['pkg-a', 'shared-dep'])
+    record_installed('config-b', 'mod_b', 'pkg-b', ['pkg-b', 'shared-dep'])
+
+    # mod_a was removed from the first configuration: its distributions go, except the dependency of mod_b
+    assert _manager('config-a', {'other': 'other-package'}).prune(dry_run=True) == ['pkg-a']
+    # the second configuration still needs mod_b
+    assert _manager('config-b', {'mod_b': 'pkg-b'}).prune(dry_run=True) == []
+    assert _manager('config-b', {}).prune(dry_run=True) == ['pkg-b']
+
+
+def test_prune_requires_unique_id():
+    record_installed('config-a', 'mod_a', 'pkg-a', ['pkg-a'])
+    with pytest.raises(ConfigurationError):
+        _manager(None, {'other': 'other-package'}).prune(dry_run=True)
+
+
+def test_recording_requires_unique_id():
+    with pytest.raises(ConfigurationError):
+        record_installed(None, 'mod_a', 'pkg-a', ['pkg-a'])
+    assert environment_ownership() == {}
+    dm = _manager(None, {'mod_a': 'pkg-a'})
+    assert dm._installed_snapshot() is None  # pylint: disable=protected-access
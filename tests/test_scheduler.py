@@ -0,0 +1,125 @@
+"""Tests of the scheduling of the parallel installations."""
+
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+from flexidep.core import process_alternatives
+from flexidep.scheduler import build_install_graph, run_install_schedule
+
+
+class FakeInstaller:
+    """Fake prepare/commit functions recording the events in order."""
+
+    def __init__(self, prepare_delays=None, failing=()):
+        self.prepare_delays = prepare_delays or {}
+        self.failing = set(failing)
+        self.events = []
+        self.committed = set()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def _log(self, *event):
+        with self.lock:
+            self.events.append(event)
+
+    def prepare(self, package):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            committed_before = set(self.committed)
+        self._log('start', package, frozenset(committed_before))
+        try:
+            time.sleep(self.prepare_delays.get(package, 0.01))
+            if package in self.failing:
+                raise OSError(f'cannot download {package}')
+            return f'prepared {package}'
+        finally:
+            with self.lock:
+                self.running -= 1
+            self._log('prepared', package)
+
+    def commit(self, package, prepared):
+        self._log('commit', package, prepared, threading.current_thread() is threading.main_thread())
+        with self.lock:
+            self.committed.add(package)
+
+    def commits(self):
+        return [event[1:] for event in self.events if event[0] == 'commit']
+
+    def started_after(self, package):
+        """Return the packages committed when the preparation of a package started."""
+        return next(event[2] for event in self.events if event[0] == 'start' and event[1] == package)
+
+
+ORDER = ['a', 'b', 'c', 'd', 'e']
+PREDECESSORS = {'a': set(), 'b': set(), 'c': {'a'}, 'd': set(), 'e': {'b', 'c'}}
+
+
+def test_commit_order_and_predecessors():
+    # the first packages are the slowest to prepare, so that the later ones are ready first
+    installer = FakeInstaller(prepare_delays={'a': 0.3, 'b': 0.2})
+    run_install_schedule(ORDER, PREDECESSORS, installer.prepare, installer.commit, max_workers=4)
+
+    # strictly in order, in the calling thread, with the result of the preparation
+    assert installer.commits() == [(package, f'prepared {package}', True) for package in ORDER]
+    # no preparation starts before its predecessors are installed
+    for package in ORDER:
+        assert PREDECESSORS[package] <= installer.started_after(package)
+    # the independent packages are prepared in parallel
+    assert installer.max_running >= 3
+    # each package is prepared before it is installed
+    for package in ORDER:
+        assert installer.events.index(('prepared', package)) < [event[:2] for event in installer.events].index(
+            ('commit', package)
+        )
+
+
+def test_failed_preparation_falls_back_to_commit(capsys):
+    installer = FakeInstaller(failing={'b'})
+    run_install_schedule(ORDER, PREDECESSORS, installer.prepare, installer.commit, max_workers=2)
+    assert installer.commits() == [
+        ('a', 'prepared a', True),
+        ('b', None, True),
+        ('c', 'prepared c', True),
+        ('d', 'prepared d', True),
+        ('e', 'prepared e', True),
+    ]
+    assert 'Error preparing b: cannot download b' in capsys.readouterr().out
+
+
+def test_failed_commit_stops_the_schedule():
+    installer = FakeInstaller()
+
+    def commit(package, prepared):
+        if package == 'c':
+            raise RuntimeError('installation failed')
+        installer.commit(package, prepared)
+
+    with pytest.raises(RuntimeError):
+        run_install_schedule(ORDER, PREDECESSORS, installer.prepare, commit, max_workers=2)
+    assert [commit_event[0] for commit_event in installer.commits()] == ['a', 'b']
+    # e waits for c, which was never installed
+    assert ('start', 'e') not in [event[:2] for event in installer.events]
+
+
+def test_install_graph():
+    pkg_to_install = OrderedDict(
+        (package, process_alternatives(alternatives))
+        for package, alternatives in [
+            ('first', 'first-package'),
+            ('cv2', 'opencv-python-headless --opencv-python'),
+            ('gui', 'opencv-python'),
+            ('other', 'other-package'),
+        ]
+    )
+    assert build_install_graph(pkg_to_install, []) == {
+        'first': set(),
+        'cv2': set(),
+        'gui': {'cv2'},
+        'other': set(),
+    }
+    assert build_install_graph(pkg_to_install, ['first'])['other'] == {'first'}